@@ -8,4 +8,5 @@ in module app.py, passing it the contents of sys.argv EXCEPT for the application
 
 """
 import sys, app
-app.execute(sys.argv[1:])
+if __name__ == '__main__': # Worker processes import this file too
+    app.execute(sys.argv[1:])
@@ -11,25 +11,493 @@ functions in modules and we only want script code in the file __main__.py
 Author: Christian M. Fulton
 Date: 29/08/2021    
 """
+import sys
+import glob
+import array
+import itertools
 import utils
 import tests
+import cache
+import checkpoint
+import instrument
+import resolver
+import pilots
 import os.path
+import concurrent.futures
 import violations
+import endorsements
+import inspections
 
-# Uncomment for the extra credit
-#import endorsements
-#import inspections
+try:
+    from lessons import LessonTable
+except ImportError: # The module lessons requires NumPy
+    LessonTable = None
+
+
+# VIOLATIONS
+# The reasons a lesson may be flagged, in the order they are reported in summaries
+REASONS = ('Unknown', 'Visibility', 'Winds', 'Ceiling', 'Weather',
+           'Solo', 'Endorsement', 'IFR', 'Credentials',
+           'Annual', 'Inspection', 'Grounded', 'Maintenance')
+# The file summarizing an audit of several datasets
+SUMMARY = 'summary.csv'
+# The files of a dataset directory
+SOURCES = (violations.STUDENTS, endorsements.TEACHERS, endorsements.PLANES, violations.WEATHER,
+           violations.DAYCYCLE, violations.MINIMUMS, violations.LESSONS, inspections.REPAIRS)
+# The files that the tables of a dataset are parsed from (see Dataset)
+TABLE_SOURCES = (violations.STUDENTS, endorsements.TEACHERS, endorsements.PLANES,
+                 violations.WEATHER, violations.DAYCYCLE, violations.MINIMUMS)
+# The files that the lesson data of a dataset is parsed from (see Dataset)
+LESSON_SOURCES = (violations.LESSONS, endorsements.PLANES, inspections.REPAIRS)
+# The number of fields in each row of lessons.csv
+LESSON_FIELDS = 7
+
+# COMMAND LINE
+# The usage message for a single dataset
+USAGE = 'Usage: python auditor dataset [output.csv]'
+# The usage message for several datasets
+BATCH_USAGE = 'Usage: python auditor --batch dataset ... [--output folder] [--jobs n]'
+# The usage message for an incremental audit
+INCREMENTAL_USAGE = 'Usage: python auditor dataset output.csv --incremental'
+# The options that are followed by a value
+VALUE_OPTIONS = ('--output', '--jobs', '--profile-json', '--profile-out')
+# The options that are a switch on their own
+SWITCH_OPTIONS = ('--batch', '--incremental', '--profile')
+# The options that profile any command (see the module instrument)
+PROFILE_OPTIONS = ('--profile', '--profile-json', '--profile-out')
+
+# ENGINE
+# The number of lessons whose weather is checked at once (see iter_audits)
+BATCH = 4096
+
+# PROFILING
+# Count every timestamp parsed, and every lesson matched to its minimums
+instrument.count_calls(utils, 'str_to_time')
+instrument.count_calls(violations, 'get_lesson_minimums', 'minimums')
+
+
+class Dataset(object):
+    """
+    A class representing a dataset directory, loaded for an audit.
+    
+    Every file other than lessons.csv is read once, when the dataset is created, and 
+    kept in the indexed form used by the audits.  The lessons are never held in memory.
+    The method iter_lessons streams them one row at a time, as the audit goes.  The 
+    exception is the inspection audit, which has to see the lessons of each plane in 
+    time order.  So the lessons are streamed once up front for a single sweep per plane,
+    and only the inspection violation of each lesson is kept.  When NumPy is available,
+    that pass reads the lessons into a LessonTable (see the module lessons), and the 
+    sweep is done on its columns.
+    
+    The takeoff time of every lesson is also parsed in that pass, and kept as numbers.
+    
+    All of this parsing (but not the lessons) is saved in the compiled cache of the 
+    directory (see the module cache).  The tables are saved apart from the data that 
+    depends on the lessons (the header, inspections and takeoffs), since lessons.csv 
+    changes far more often than the other files.  So auditing the same dataset again 
+    only has to load the cache, and auditing it after new lessons are added only parses
+    the lessons.  An incremental audit instead gives the lessons to audit itself, so 
+    only the tables come from the cache.
+    
+    Attribute directory: The dataset directory
+    Invariant: directory is a string naming a directory
+    
+    Attribute students: The registered students
+    Invariant: students is an IndexedTable for students.csv
+    
+    Attribute records: The credentials of each student
+    Invariant: records is a dictionary mapping each student id to the StudentRecord of
+    its (first) row in students
+    
+    Attribute teachers: The certified instructors
+    Invariant: teachers is an IndexedTable for instructors.csv
+    
+    Attribute planes: The planes in the flight school
+    Invariant: planes is an IndexedTable for fleet.csv
+    
+    Attribute weather: The hourly weather reports
+    Invariant: weather is a compact WeatherIndex for weather.json
+    
+    Attribute daycycle: The sunrise and sunset times
+    Invariant: daycycle is a Daycycle for daycycle.json (in any format, see resolver)
+    
+    Attribute minimums: The table of allowed minimums
+    Invariant: minimums is a MinimumsTable for minimums.csv
+    
+    Attribute header: The header of the lessons file
+    Invariant: header is a list of strings
+    
+    Attribute inspections: The inspection violation for each lesson
+    Invariant: inspections is a list of strings, with an element for each lesson of
+    iter_lessons (in the same order)
+    
+    Attribute takeoffs: The takeoff time of each lesson, in seconds since the epoch
+    Invariant: takeoffs is an array of ints, parallel to inspections
+    
+    Attribute offsets: The UTC offset of each takeoff time, in seconds
+    Invariant: offsets is an array of ints, parallel to inspections
+    """
+    
+    def __init__(self, directory, cached=True, lessons=None):
+        """
+        Initializes the dataset by loading the files in directory.
+        
+        If cached is True, the tables are loaded from the compiled cache when it is 
+        current, and otherwise they are parsed and then saved to the cache.
+        
+        If lessons is not None, those lessons are audited instead of the ones in 
+        lessons.csv, and only the tables (not the lesson data) use the compiled cache.
+        
+        Parameter directory: The directory of files to audit
+        Precondition: directory is the name of a directory containing the files 
+        'daycycle.json', 'weather.json', 'minimums.csv', 'students.csv', 
+        'instructors.csv', 'lessons.csv', 'fleet.csv', and 'repairs.csv'.
+        
+        Parameter cached: Whether to use the compiled cache
+        Precondition: cached is a bool
+        
+        Parameter lessons: The lessons to audit (None for those in lessons.csv)
+        Precondition: lessons is None or a 2d-list (table) in the format of lessons.csv, 
+        including the header
+        """
+        self.directory = directory
+        self._lessons = None if lessons is None else lessons[1:]
+        with instrument.stage('load'):
+            tables = self._load(cache.CACHE, TABLE_SOURCES, cached, self._parse_tables)
+            for name in tables:
+                setattr(self, name, tables[name])
+            tables = self._load(cache.LESSON_CACHE, LESSON_SOURCES, cached and lessons is None,
+                                self._parse_lessons, lessons)
+            for name in tables:
+                setattr(self, name, tables[name])
+    
+    def _load(self, name, sources, cached, parse, *args):
+        """
+        Returns a dictionary of tables, loaded from the cache file name or parsed.
+        
+        If cached is True and the cache file name is current for the given sources, the
+        tables are rebuilt from it.  Otherwise, the result is parse(*args), which is then
+        saved to that cache file (if cached is True).
+        
+        Parameter name: The name of the cache file
+        Precondition: name is cache.CACHE or cache.LESSON_CACHE
+        
+        Parameter sources: The logical names of the files the tables are parsed from
+        Precondition: sources is a tuple of strings (see resolver.resolve_sources)
+        
+        Parameter cached: Whether to use the compiled cache
+        Precondition: cached is a bool
+        
+        Parameter parse: The method that parses the tables
+        Precondition: parse is _parse_tables or _parse_lessons
+        """
+        sources = resolver.resolve_sources(self.directory, sources)
+        tables = self._from_cache(cache.load_cache(self.directory, sources, name)) if cached else None
+        if cached:
+            instrument.count('cache.miss' if tables is None else 'cache.hit')
+        if tables is None:
+            # Stamp the sources before parsing, in case they change while they are parsed
+            stamps = cache.get_stamps(self.directory, sources) if cached else None
+            tables = parse(*args)
+            if cached:
+                with instrument.stage('load.save_cache'):
+                    cache.save_cache(self.directory, stamps, self._to_cache(tables), name)
+        return tables
+    
+    def _parse_tables(self):
+        """
+        Returns a dictionary of the tables of this dataset, parsed from the source files.
+        
+        The keys are the names of the attributes of this class for the files in 
+        TABLE_SOURCES.
+        """
+        tables = {}
+        with instrument.stage('load.tables'):
+            tables['students'] = utils.IndexedTable(self._read_csv(violations.STUDENTS))
+            tables['teachers'] = utils.IndexedTable(self._read_csv(endorsements.TEACHERS))
+            tables['planes'] = utils.IndexedTable(self._read_csv(endorsements.PLANES))
+            tables['minimums'] = pilots.MinimumsTable(self._read_csv(violations.MINIMUMS))
+            tables['records'] = {}
+            for row in tables['students'][1:]:
+                if row[0] not in tables['records']:
+                    tables['records'][row[0]] = pilots.get_record(row)
+        with instrument.stage('load.weather'):
+            tables['weather'] = violations.read_weather(self._path(violations.WEATHER))
+        with instrument.stage('load.daycycle'):
+            tables['daycycle'] = resolver.read_daycycle(self._path(violations.DAYCYCLE))
+        return tables
+    
+    def _parse_lessons(self, lessons=None):
+        """
+        Returns a dictionary of the data of this dataset that depends on the lessons.
+        
+        The keys are 'header', 'inspections', 'takeoffs' and 'offsets', the attributes of
+        this class.  The lessons are streamed once (and the planes must already be loaded).
+        With NumPy, they are read into a LessonTable, which is dropped once the sweep is
+        done.  Otherwise, only the times of each lesson are kept for the sweep.
+        
+        Parameter lessons: The lessons to audit (None for those in lessons.csv)
+        Precondition: lessons is None or a 2d-list (table) in the format of lessons.csv, 
+        including the header
+        """
+        tables = {'takeoffs': array.array('q'), 'offsets': array.array('i')}
+        if lessons is None:
+            tables['header'] = next(utils.iter_csv(self._path(violations.LESSONS)), [])
+        else:
+            tables['header'] = lessons[0]
+        with instrument.stage('load.inspections'):
+            repairs = self._read_csv(inspections.REPAIRS)
+            if LessonTable is not None:
+                table = LessonTable(itertools.chain([tables['header']], self.iter_lessons()))
+                tables['takeoffs'].extend(table.takeoff.tolist())
+                tables['offsets'].extend(table.takeoff_offset.tolist())
+            else:
+                table = self._iter_timed(tables['takeoffs'], tables['offsets'])
+            tables['inspections'] = inspections.get_inspection_violations(table, self.planes, repairs)
+        return tables
+    
+    def _iter_timed(self, takeoffs, offsets):
+        """
+        Returns an iterator over the lessons of this dataset, recording each takeoff time.
+        
+        As each lesson is produced, its takeoff time is appended to takeoffs (in seconds 
+        since the epoch) and its UTC offset to offsets (in seconds).
+        
+        Parameter takeoffs: The takeoff times so far
+        Precondition: takeoffs is an array of ints
+        
+        Parameter offsets: The UTC offsets so far
+        Precondition: offsets is an array of ints
+        """
+        for lesson in self.iter_lessons():
+            takeoff = utils.str_to_time(lesson[3])
+            takeoffs.append(int(takeoff.timestamp()))
+            offsets.append(int(takeoff.utcoffset().total_seconds()))
+            yield lesson
+    
+    def _to_cache(self, tables):
+        """
+        Returns the tables of this dataset as JSON data, to save in the compiled cache.
+        
+        The indexed tables are saved as their rows, the weather as the time and normalized
+        record for each key (see violations.WeatherRecord), the daycycle in its compiled form 
+        (see utils.Daycycle), and the student records as their credential times (see 
+        pilots.StudentRecord).  Everything else is saved as a list.
+        
+        Parameter tables: The tables of this dataset
+        Precondition: tables is a dictionary returned by _parse_tables or _parse_lessons
+        """
+        data = {}
+        for name, table in tables.items():
+            if name == 'weather':
+                data[name] = [[key, table.times[pos], table.records[pos].tolist()]
+                              for key, pos in table.positions.items()]
+            elif name == 'daycycle':
+                data[name] = table.to_dict()
+            elif name == 'minimums':
+                data[name] = table.table
+            elif name == 'records':
+                data[name] = dict((id, record.epochs()) for id, record in table.items())
+            else:
+                data[name] = list(table)
+        return data
+    
+    def _from_cache(self, data):
+        """
+        Returns the tables of this dataset rebuilt from the JSON data in its cache.
+        
+        This function returns None if data is None (no cache), or if it is not in the
+        format of _to_cache (so the cache is simply not used).  The student records are
+        rebuilt from the students in data (so those must be in the same cache).
+        
+        Parameter data: The cached tables
+        Precondition: data is None or the JSON data returned by _to_cache
+        """
+        if data is None:
+            return None
+        try:
+            tables = {}
+            for name, table in data.items():
+                if name in ('students', 'teachers', 'planes'):
+                    tables[name] = utils.IndexedTable(table)
+                elif name == 'minimums':
+                    tables[name] = pilots.MinimumsTable(table)
+                elif name == 'daycycle':
+                    tables[name] = utils.Daycycle(table)
+                elif name == 'weather':
+                    times = dict((item[0], item[1]) for item in table)
+                    records = ((item[0], violations.WeatherRecord(item[2])) for item in table)
+                    tables[name] = violations.WeatherIndex(records, True, times)
+                elif name == 'takeoffs':
+                    tables[name] = array.array('q', table)
+                elif name == 'offsets':
+                    tables[name] = array.array('i', table)
+                elif name != 'records':
+                    tables[name] = table
+            if 'records' in data:
+                students = tables['students'].index
+                tables['records'] = dict((id, pilots.StudentRecord(students[id], epochs))
+                                         for id, epochs in data['records'].items())
+        except (KeyError, IndexError, TypeError, ValueError, OverflowError):
+            return None
+        return tables
+    
+    def get_takeoff(self, pos):
+        """
+        Returns the takeoff time of the lesson at position pos.
+        
+        Parameter pos: The position of the lesson
+        Precondition: pos is an int and a valid index of inspections
+        """
+        return utils.epoch_to_time(self.takeoffs[pos], self.offsets[pos])
+    
+    def iter_lessons(self):
+        """
+        Returns an iterator over the lessons of this dataset, WITHOUT the header.
+        
+        The lessons of lessons.csv are read one row at a time (see utils.iter_csv), so
+        they are never all held in memory.  Every call starts again at the first lesson.
+        """
+        if self._lessons is not None:
+            return iter(self._lessons)
+        lessons = utils.iter_csv(self._path(violations.LESSONS))
+        next(lessons, None) # Skip the header
+        return lessons
+    
+    def _read_csv(self, name):
+        """
+        Returns the contents of the CSV file name in this dataset.
+        
+        Parameter name: The file name
+        Precondition: name is a string naming a CSV file in the dataset directory
+        """
+        return utils.read_csv(self._path(name))
+    
+    def _path(self, name):
+        """
+        Returns the path of the file for the logical name in this dataset.
+        
+        Parameter name: The logical file name
+        Precondition: name is a string naming a file of the dataset (see resolver)
+        """
+        return resolver.resolve_file(self.directory, name)
+
+
+def audit_lesson(pos, lesson, dataset, weather=None, takeoff=None):
+    """
+    Returns the list of all reasons that the lesson violates regulations.
+    
+    This is the heart of the audit engine.  The takeoff time, student, instructor and
+    plane for the lesson are looked up once, and then every check is made against them.
+    The reasons are in audit order: the weather violation (if any), the endorsement 
+    violation (if any), and then the inspection violation (if any).  If the lesson is
+    okay, the list is empty.
+    
+    If the weather of the lesson was already checked (as in iter_audits), the result 
+    can be given as weather, and it is not checked again.  Likewise, the takeoff time 
+    can be given as takeoff if it was already looked up.
+    
+    Parameter pos: The position of the lesson
+    Precondition: pos is an int and a valid index of dataset.inspections
+    
+    Parameter lesson: The flight lesson
+    Precondition: lesson is the lesson at position pos of dataset.iter_lessons()
+    
+    Parameter dataset: The dataset containing the lesson
+    Precondition: dataset is a Dataset object
+    
+    Parameter weather: The weather violation of the lesson (None to check it here)
+    Precondition: weather is None or a string returned by violations.get_lesson_violation
+    
+    Parameter takeoff: The takeoff time of the lesson (None to look it up here)
+    Precondition: takeoff is None or the result of dataset.get_takeoff(pos)
+    """
+    if takeoff is None:
+        takeoff = dataset.get_takeoff(pos)
+    student = dataset.records.get(lesson[0])
+    instructor = utils.get_for_id(lesson[2], dataset.teachers)
+    plane = utils.get_for_id(lesson[1], dataset.planes)
+    
+    reasons = []
+    reason = weather
+    if reason is None:
+        reason = violations.get_lesson_violation(lesson, takeoff, student, dataset.weather,
+                                                 dataset.daycycle, dataset.minimums)
+    if reason != '':
+        reasons.append(reason)
+    reason = endorsements.get_lesson_violation(lesson, takeoff, student, instructor, plane)
+    if reason != '':
+        reasons.append(reason)
+    if dataset.inspections[pos] != '':
+        reasons.append(dataset.inspections[pos])
+    return reasons
+
+
+def iter_audits(lessons, dataset, start=0):
+    """
+    Returns an iterator over the pair (lesson, reasons) for each lesson in lessons.
+    
+    The value reasons is the result of audit_lesson for that lesson.  The lessons are
+    at positions start, start+1, and so on of the dataset.
+    
+    When NumPy is available, the lessons are read BATCH at a time, and the weather of 
+    each batch is checked at once with violations.check_lessons (which gives the same
+    results as checking one lesson at a time).  Otherwise the lessons are audited one 
+    at a time.  Either way, only one batch of lessons is held in memory.
+    
+    Parameter lessons: The lessons to audit
+    Precondition: lessons is an iterable of lessons in the format of lessons.csv, 
+    WITHOUT the header, and is the lessons of the dataset from position start on
+    
+    Parameter dataset: The dataset containing the lessons
+    Precondition: dataset is a Dataset object
+    
+    Parameter start: The position of the first lesson
+    Precondition: start is an int >= 0
+    """
+    lessons = iter(lessons)
+    size = BATCH if violations.numpy is not None else 1
+    tables = (dataset.records, dataset.weather, dataset.daycycle, dataset.minimums)
+    pos = start
+    batch = list(itertools.islice(lessons, size))
+    while batch:
+        takeoffs = [dataset.get_takeoff(pos+step) for step in range(len(batch))]
+        if size > 1:
+            weather = violations.check_lessons(batch, tables, takeoffs)
+        else:
+            weather = [None]*len(batch)
+        for lesson, reason, takeoff in zip(batch, weather, takeoffs):
+            yield (lesson, audit_lesson(pos, lesson, dataset, reason, takeoff))
+            pos += 1
+        batch = list(itertools.islice(lessons, size))
+
+
+def iter_violations(dataset):
+    """
+    Returns an iterator over all of the (annotated) violations in the dataset.
+    
+    The lessons are streamed in a single pass (see iter_audits), and every check is
+    applied to each lesson in turn.  A lesson that violates more than one type of 
+    regulation is produced once for each violation (with that reason appended), in the
+    order of audit_lesson.
+    
+    Parameter dataset: The dataset to audit
+    Precondition: dataset is a Dataset object
+    """
+    for lesson, reasons in iter_audits(dataset.iter_lessons(), dataset):
+        for reason in reasons:
+            yield lesson+[reason]
 
 
 def discover_violations(directory,output):
     """
     Searches the dataset directory for any flight lessons the violation regulations.
     
-    This function will call list_weather_violations() to get the list of weather violations.
-    If list_endorsment_violations (optional) is completed, it will call that too, as
-    well as list_inspection_violations.  It will concatenate all of these 2d lists
-    into a single 2d list of violations (so a flight may be listed more than once for
-    each of the three types of violations).
+    This function loads the dataset once and audits every lesson in a single pass with 
+    iter_violations, checking the weather, endorsement and inspection regulations together
+    (as in list_weather_violations, list_endorsement_violations and 
+    list_inspection_violations).  A flight is listed once for each type of violation, 
+    in that order.
     
     If the parameter output is not None, it will create the CSV file with name output
     and write the 2d list of violations to this file.  This CSV file should have the
@@ -51,20 +519,272 @@ def discover_violations(directory,output):
     'weather.json', 'minimums.csv', 'students.csv', 'teachers.csv', 'lessons.csv',
     'fleet.csv', and 'repairs.csv'.
     
+    Violations are written to output as they are found, so the full list of violations
+    is never held in memory.
+    
+    Parameter output: The CSV file to store the results
+    Precondition: output is None or a string that is a valid file name
+    """
+    count = sum(audit_dataset(directory, output).values())
+    print(count_message(count))
+
+
+def audit_dataset(directory, output):
+    """
+    Returns the number of violations of each type in the dataset directory.
+    
+    This function does the work of discover_violations (without printing anything).
+    The result is a dictionary mapping each reason (e.g. 'Winds') to the number of 
+    violations with that reason.  If output is not None, the violations are written
+    to that CSV file as they are found, so the full list is never held in memory (an
+    output ending in '.gz' is compressed; see utils.CSVWriter).
+    
+    This function only takes file names, so that it may be run in a worker process.
+    
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the dataset files
+    
     Parameter output: The CSV file to store the results
     Precondition: output is None or a string that is a valid file name
     """
-    data = violations.list_weather_violations(directory)
-    if len(data) == 0:
-        print('No violations found.')
-    elif len(data) == 1:
-        print(f'{len(data)} violation found.')
+    dataset = Dataset(directory)
+    counts = {}
+    with instrument.stage('audit'):
+        if output is None:
+            for lesson in iter_violations(dataset):
+                counts[lesson[-1]] = counts.get(lesson[-1], 0)+1
+        else:
+            with utils.CSVWriter(output) as wrap:
+                wrap.writerow(dataset.header+['REASON'])
+                for lesson in iter_violations(dataset):
+                    wrap.writerow(lesson)
+                    counts[lesson[-1]] = counts.get(lesson[-1], 0)+1
+    instrument.count('lessons', len(dataset.inspections))
+    instrument.count('violations', sum(counts.values()))
+    return counts
+
+
+def discover_new_violations(directory, output):
+    """
+    Searches the dataset directory for violations in the lessons added since the last audit.
+    
+    This function is the incremental version of discover_violations.  It only audits 
+    the lessons appended to lessons.csv since the last time this function audited the
+    same dataset into the same output file, and appends their violations to output (see
+    audit_incremental).  The result is the same file that discover_violations would
+    make.  It prints the total number of violations in output, as discover_violations 
+    does.
+    
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the dataset files
+    
+    Parameter output: The CSV file to store the results
+    Precondition: output is a string that is a valid file name
+    """
+    count = sum(audit_incremental(directory, output).values())
+    print(count_message(count))
+
+
+def audit_incremental(directory, output):
+    """
+    Returns the number of violations of each type in the dataset, auditing only new lessons.
+    
+    The result is the same as for audit_dataset, and so is the file output.  But this
+    function saves a checkpoint next to output (see the module checkpoint).  If there
+    is a checkpoint for this dataset, and lessons.csv has only had lessons appended
+    since then, only the new lessons are audited, and their violations are appended to
+    output.  Otherwise, every lesson is audited and output is written from scratch.
+    
+    The inspection audit depends on the earlier flights of each plane, so the checkpoint
+    carries the lessons that still count towards the hours of each plane (see the 
+    function get_carried_lessons in inspections).  These are audited again along with the
+    new lessons, but their violations are not written twice.  New lessons should take off
+    after the ones already audited.  Lessons that were already audited are never checked
+    again, even if the other files of the dataset have changed since.
+    
+    Only complete lines of lessons.csv are audited (see checkpoint.read_appended), so a
+    lesson that is still being written is left for the next audit.  The other tables are
+    loaded from the compiled cache when it is current (see Dataset), so only the carried
+    and new lessons are parsed.
+    
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the dataset files
+    
+    Parameter output: The CSV file to store the results
+    Precondition: output is a string that is a valid file name
+    """
+    filename = resolver.resolve_file(directory, violations.LESSONS)
+    state = checkpoint.load_checkpoint(output)
+    if state is not None and checkpoint.is_current(state, directory, output):
+        rows, offset = checkpoint.read_appended(filename, state['offset'], LESSON_FIELDS)
+        carried = state['carried']
+        lessons = [state['header']]+carried+rows
+        counts = dict(state['counts'])
+        append = True
     else:
-        print(f'{len(data)} violations found.')
-    if output is not None:
-        lessons = utils.read_csv(os.path.join(directory, 'lessons.csv'))
-        data = [lessons[0]+['REASON']] + data
-        utils.write_csv(data, output)
+        lessons, offset = checkpoint.read_appended(filename, 0, LESSON_FIELDS)
+        carried = []
+        counts = {}
+        append = False
+    
+    dataset = Dataset(directory, lessons=lessons)
+    found = 0
+    with instrument.stage('audit'):
+        with utils.CSVWriter(output, append) as wrap:
+            if not append:
+                wrap.writerow(dataset.header+['REASON'])
+            # The first row of lessons is the header
+            audits = iter_audits(lessons[len(carried)+1:], dataset, len(carried))
+            for lesson, reasons in audits:
+                for reason in reasons:
+                    wrap.writerow(lesson+[reason])
+                    counts[reason] = counts.get(reason, 0)+1
+                    found += 1
+    instrument.count('lessons', len(lessons)-1-len(carried))
+    instrument.count('violations', found)
+    
+    repairs = utils.read_csv(resolver.resolve_file(directory, inspections.REPAIRS))
+    state = {'directory': os.path.abspath(directory), 'lessons': os.path.basename(filename),
+             'offset': offset, 'digest': checkpoint.hash_prefix(filename, offset),
+             'written': os.path.getsize(output), 'header': dataset.header, 'counts': counts,
+             'carried': inspections.get_carried_lessons(lessons[1:], repairs)}
+    checkpoint.save_checkpoint(output, state)
+    return counts
+
+
+def count_message(count):
+    """
+    Returns the message reporting count violations (e.g. '23 violations found.')
+    
+    Parameter count: The number of violations
+    Precondition: count is an int >= 0
+    """
+    if count == 0:
+        return 'No violations found.'
+    elif count == 1:
+        return f'{count} violation found.'
+    return f'{count} violations found.'
+
+
+def discover_all_violations(directories, folder, jobs=None):
+    """
+    Audits several dataset directories at once, printing the number of violations in each.
+    
+    Each dataset is audited by audit_dataset in a separate worker process (workers are 
+    given nothing but the file names), and its violations are written to the CSV file 
+    folder/NAME.csv, where NAME is the name of the dataset directory.  When all of the 
+    audits are done, this function writes a summary of the counts for every dataset, 
+    in the order given, to folder/summary.csv and prints a line for each dataset.
+    
+    The results are the same as auditing each dataset with discover_violations.  If jobs
+    is 1, the datasets are audited one at a time in this process.
+    
+    Parameter directories: The directories of files to audit
+    Precondition: directories is a non-empty list of dataset directory names
+    
+    Parameter folder: The folder for the output files
+    Precondition: folder is a string that is a valid directory name (it may not exist)
+    
+    Parameter jobs: The number of worker processes (None for one per CPU)
+    Precondition: jobs is None or an int > 0
+    """
+    os.makedirs(folder, exist_ok=True)
+    names = get_output_names(directories)
+    outputs = [os.path.join(folder, name+'.csv') for name in names]
+    
+    if jobs == 1:
+        results = list(map(audit_dataset, directories, outputs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(audit_dataset, directories, outputs))
+    
+    reasons = list(REASONS)
+    for counts in results:
+        reasons.extend(sorted(r for r in counts if r not in reasons))
+    
+    summary = [['DATASET', 'OUTPUT', 'VIOLATIONS']+[r.upper() for r in reasons]]
+    for pos in range(len(directories)):
+        counts = results[pos]
+        total = sum(counts.values())
+        summary.append([directories[pos], outputs[pos], total]+[counts.get(r, 0) for r in reasons])
+        print(f'{names[pos]}: {count_message(total)}')
+    utils.write_csv(summary, os.path.join(folder, SUMMARY))
+
+
+def get_output_names(directories):
+    """
+    Returns a list of distinct output names, one for each dataset directory.
+    
+    The name is the last part of the directory path (e.g. 'KITH-2017').  If two datasets
+    have the same name, the later ones get a suffix '-2', '-3' and so on.
+    
+    Parameter directories: The dataset directories
+    Precondition: directories is a list of strings
+    """
+    result = []
+    for directory in directories:
+        base = os.path.basename(os.path.normpath(directory))
+        name = base
+        copy = 1
+        while name in result or name+'.csv' == SUMMARY:
+            copy += 1
+            name = f'{base}-{copy}'
+        result.append(name)
+    return result
+
+
+def expand_datasets(patterns):
+    """
+    Returns the list of dataset directories named by patterns.
+    
+    A pattern with a wildcard (e.g. 'KITH-*') is replaced by the directories that it 
+    matches, in sorted order.  Any other pattern is kept as is.  Duplicates are removed.
+    
+    Parameter patterns: The dataset names or glob patterns
+    Precondition: patterns is a list of strings
+    """
+    result = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            found = sorted(p for p in glob.glob(pattern) if os.path.isdir(p))
+        else:
+            found = [pattern]
+        for directory in found:
+            if directory not in result:
+                result.append(directory)
+    return result
+
+
+def parse_options(args):
+    """
+    Returns the pair (positional, options) for the command line arguments args.
+    
+    Options are the arguments in VALUE_OPTIONS (which take the argument after them as a
+    value) and SWITCH_OPTIONS (which are True when present).  The result options is a
+    dictionary from option to value.  All other arguments are positional, in order.
+    This function returns None if an option is repeated or is missing its value.
+    
+    Parameter args: The command line arguments for the application
+    Precondition: args is a list of strings
+    """
+    positional = []
+    options = {}
+    pos = 0
+    while pos < len(args):
+        arg = args[pos]
+        if arg in options:
+            return None
+        elif arg in VALUE_OPTIONS:
+            if pos+1 == len(args):
+                return None
+            options[arg] = args[pos+1]
+            pos += 1
+        elif arg in SWITCH_OPTIONS:
+            options[arg] = True
+        else:
+            positional.append(arg)
+        pos += 1
+    return (positional, options)
 
 
 def execute(args):
@@ -77,24 +797,114 @@ def execute(args):
     there are two elements, the first should be the data set folder and the second
     should be the name of a CSV file (for output of the results).
     
+    Alternatively, the arguments may contain the option '--batch', followed by any 
+    number of data set folders.  In that case, the arguments are handled by the function
+    execute_batch, which audits the data sets in parallel.
+    
+    With the option '--incremental', there must be both a data set folder and a CSV 
+    file, and only the lessons added since the last audit into that file are audited 
+    (see discover_new_violations).  If it is used incorrectly, this function prints:
+    
+        Usage: python auditor dataset output.csv --incremental
+    
     If the user calls this script incorrectly (with the wrong number of arguments), this
     function prints:
     
         Usage: python auditor dataset [output.csv]
     
+    Any of these commands may also have the option '--profile', which prints a table of
+    the time of each stage of the audit (and counters such as the number of lessons per
+    second) when it is done, or '--profile-json' followed by a file name, which writes 
+    the same profile to that JSON file (see the module instrument).  The option 
+    '--profile-out' followed by a file name runs the command under cProfile, saves the
+    statistics to that file, and prints the functions that took the most time.  Only 
+    this process is profiled, so a batch audit should be run with '--jobs 1' to profile it.
+    These reports are printed to stderr, so that they never mix with (or break on) the
+    output of the command when it is piped to another program.
+    
     This function does not do much error checking beyond counting the number of arguments.
     
     Parameter args: The command line arguments for the application (minus the application name)
     Precondition: args is a list of strings
     """
-    err = 'Usage: python auditor dataset [output.csv]'
-    if len(args) < 1 or len(args) >2:
-        print(err)
+    parsed = parse_options(args)
+    if parsed is None:
+        print(USAGE)
+        return
+    args, options = parsed
+    profiled = dict((name, options.pop(name)) for name in PROFILE_OPTIONS if name in options)
+    if not profiled:
+        execute_command(args, options)
+        return
+    
+    # Only count when asked, as counting adds noise to the statistics of cProfile
+    measured = '--profile' in profiled or '--profile-json' in profiled
+    profile = instrument.start() if measured else None
+    try:
+        if '--profile-out' in profiled:
+            instrument.profile_call(profiled['--profile-out'], execute_command, args, options)
+        else:
+            execute_command(args, options)
+    finally:
+        instrument.stop()
+    if '--profile' in profiled and (profile.stages or profile.counters):
+        print(profile.summary(), file=sys.stderr)
+    if '--profile-json' in profiled:
+        profile.save(profiled['--profile-json'])
+    if '--profile-out' in profiled:
+        print(instrument.get_report(profiled['--profile-out']), file=sys.stderr)
+
+
+def execute_command(args, options):
+    """
+    Executes the command given by the parsed command line (see execute).
+    
+    Parameter args: The positional command line arguments
+    Precondition: args is a list of strings
+    
+    Parameter options: The command line options (other than PROFILE_OPTIONS)
+    Precondition: options is a dictionary returned by parse_options
+    """
+    if '--batch' in options:
+        execute_batch(args, options)
+    elif '--incremental' in options:
+        if len(options) > 1 or len(args) != 2 or '--test' in args:
+            print(INCREMENTAL_USAGE)
+        else:
+            discover_new_violations(args[0], args[1])
+    elif len(options) > 0 or len(args) < 1 or len(args) > 2:
+        print(USAGE)
     elif len(args) == 1:
         if args[0] == '--test':
             tests.test_all()
+        else:
+            discover_violations(args[0], None)
     elif len(args) == 2:
         if '--test' not in args:
             discover_violations(args[0], args[1])
         else:
-            print(err)
\ No newline at end of file
+            print(USAGE)
+
+
+def execute_batch(args, options):
+    """
+    Executes an audit of several datasets, or prints an error message if executed incorrectly.
+    
+    The positional arguments are the dataset directories (or glob patterns for them).
+    The option '--output' names the folder for the results (the current folder if it is
+    missing) and '--jobs' is the number of worker processes.  See discover_all_violations.
+    
+    Parameter args: The positional command line arguments
+    Precondition: args is a list of strings
+    
+    Parameter options: The command line options
+    Precondition: options is a dictionary returned by parse_options
+    """
+    directories = expand_datasets(args)
+    jobs = options.get('--jobs')
+    if jobs is not None:
+        jobs = int(jobs) if jobs.isdigit() else 0
+    if len(directories) == 0 or '--test' in directories or jobs == 0:
+        print(BATCH_USAGE)
+    else:
+        discover_all_violations(directories, options.get('--output', '.'), jobs)
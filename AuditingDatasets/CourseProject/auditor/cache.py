@@ -0,0 +1,198 @@
+"""
+Module for the compiled cache of a dataset directory.
+
+Every audit has to parse the CSV and JSON files of a dataset, and then parse every
+timestamp inside of them.  That is most of the work of an audit.  This module saves
+the parsed data in cache files inside the dataset directory, so that the next audit
+of the same dataset can load it instead.
+
+There are two cache files.  The file '.auditcache' holds the tables that do not depend
+on the lessons (the students with their credential times, the instructors, the fleet, 
+the weather with the time of each report, the daycycle and the minimums).  The file '.auditcache-lessons' holds the
+data parsed from the lessons: the inspection violations and the takeoff time of each 
+lesson (as numbers).  Lessons are added to a dataset far more often than anything else
+changes, and that only invalidates the second file.  The rows of lessons.csv are still
+read by every audit (the violations are copies of them), but none of their timestamps
+are parsed when the lesson cache is current.
+
+Each cache file remembers the size, modification time and hash of every source file it
+was made from.  A source file with the same size and modification time is assumed 
+unchanged.  If either one changed (say the file was copied or touched), its contents 
+are hashed, and the cache is only used if the hash still matches.  So the cache 
+invalidates itself automatically whenever a source file changes.
+
+The tables are stored as JSON, so a cache file is only data: loading one never runs
+any code, whoever wrote it.  The tables must be converted to JSON data (lists, 
+dictionaries, strings, numbers and booleans) before they are saved, and rebuilt after
+they are loaded.
+"""
+import os
+import os.path
+import json
+import hashlib
+
+
+# CACHE FILE
+# The name of the cache file for the tables in a dataset directory
+CACHE = '.auditcache'
+# The name of the cache file for the lesson data in a dataset directory
+LESSON_CACHE = '.auditcache-lessons'
+# The first bytes of every cache file
+MAGIC = b'AUDITCACHE'
+# The format of the cache (change this whenever the cached tables change)
+VERSION = 8
+
+
+def hash_file(filename):
+    """
+    Returns the hash (a hex string) of the contents of the file filename.
+
+    Parameter filename: The file to hash
+    Precondition: filename is a string, referring to a file that exists
+    """
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        block = f.read(1 << 20)
+        while block:
+            digest.update(block)
+            block = f.read(1 << 20)
+    return digest.hexdigest()
+
+
+def get_stamp(filename):
+    """
+    Returns the stamp (size, mtime, hash) identifying the contents of filename.
+
+    The modification time is in nanoseconds.
+
+    Parameter filename: The source file
+    Precondition: filename is a string, referring to a file that exists
+    """
+    info = os.stat(filename)
+    return (info.st_size, info.st_mtime_ns, hash_file(filename))
+
+
+def get_stamps(directory, sources):
+    """
+    Returns a dictionary of the stamp of each source file in directory.
+
+    The stamps must be taken BEFORE the source files are parsed, and then passed to
+    save_cache.  That way, a file that changes while it is parsed no longer matches its
+    stamp, and the cache made from the old contents is never used.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+
+    Parameter sources: The names of the source files in directory
+    Precondition: sources is a list of strings naming files that exist
+    """
+    stamps = {}
+    for name in sources:
+        stamps[name] = get_stamp(os.path.join(directory, name))
+    return stamps
+
+
+def is_current(filename, stamp):
+    """
+    Returns True if the file filename still matches stamp; False otherwise.
+
+    The file matches if it has the same size and modification time as the stamp, or
+    the same size and hash (so a file that is copied or touched is still current).
+    A file that does not exist does not match.
+
+    Parameter filename: The source file
+    Precondition: filename is a string
+
+    Parameter stamp: The stamp for the file when the cache was made
+    Precondition: stamp is a tuple returned by get_stamp (or a list of its elements)
+    """
+    try:
+        info = os.stat(filename)
+    except OSError:
+        return False
+    if info.st_size != stamp[0]:
+        return False
+    return info.st_mtime_ns == stamp[1] or hash_file(filename) == stamp[2]
+
+
+def load_cache(directory, sources, name=CACHE):
+    """
+    Returns the tables cached for directory, or None if there is no current cache.
+
+    The result is the dictionary passed to save_cache (as loaded from JSON, so any tuples
+    are now lists).  It is None if there is no cache file, if the file is from another 
+    version of this module, if it was made from a different list of sources, or if any 
+    source file has changed since.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+
+    Parameter sources: The names of the source files in directory
+    Precondition: sources is a list of strings
+    
+    Parameter name: The name of the cache file (OPTIONAL)
+    Precondition: name is CACHE or LESSON_CACHE
+    """
+    try:
+        with open(os.path.join(directory, name), 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            data = json.loads(f.read().decode('utf-8'))
+        version, stamps, tables = data['version'], data['stamps'], data['tables']
+        if version != VERSION or sorted(stamps) != sorted(sources):
+            return None
+        for name in sources:
+            if not is_current(os.path.join(directory, name), stamps[name]):
+                return None
+    except Exception:
+        # A missing, partial, damaged or outdated cache is simply a cache miss
+        return None
+    return tables
+
+
+def save_cache(directory, stamps, tables, name=CACHE):
+    """
+    Saves tables as the cache for directory, returning True if it succeeded.
+
+    The cache is written to a temporary file and then moved into place, so that an
+    audit running at the same time never sees a partial cache.  If the directory is
+    not writable, there is simply no cache (and the result is False).
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+
+    Parameter stamps: The stamps of the source files when they were parsed
+    Precondition: stamps is a dictionary returned by get_stamps
+
+    Parameter tables: The tables to cache
+    Precondition: tables is a dictionary of JSON data
+    
+    Parameter name: The name of the cache file (OPTIONAL)
+    Precondition: name is CACHE or LESSON_CACHE
+    """
+    filename = os.path.join(directory, name)
+    partial = '%s.%d' % (filename, os.getpid())
+    try:
+        data = {'version': VERSION, 'stamps': stamps, 'tables': tables}
+        with open(partial, 'wb') as f:
+            f.write(MAGIC)
+            f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        os.replace(partial, filename)
+    except OSError:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    return True
+
+
+def clear_cache(directory):
+    """
+    Removes the cache files for directory (if there are any).
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+    """
+    for name in (CACHE, LESSON_CACHE):
+        filename = os.path.join(directory, name)
+        if os.path.exists(filename):
+            os.remove(filename)
@@ -0,0 +1,196 @@
+"""
+Module for the checkpoint of an incremental audit.
+
+The file lessons.csv of a dataset grows every day, as new lessons are appended to the
+end.  An incremental audit only checks the lessons added since the last audit, and
+appends their violations to the output of the last audit.  To do that, it saves a
+checkpoint next to the output file (the output name followed by '.checkpoint').
+
+The checkpoint remembers how many bytes of lessons.csv were audited, and a hash of
+those bytes, so that the next audit can tell if the file was only appended to (and
+read it from that offset) or was changed some other way (and audit it from scratch).
+It also remembers the size of the output, the counts of each violation so far, and
+the lessons that still matter to the inspection audit (see get_carried_lessons in the
+module inspections), so that the hours flown by each plane carry over between audits.
+
+New lessons may be appended while an audit reads them.  So an audit only reads up to
+the end of the last complete line, and leaves a row that is still being written for 
+the next audit.
+
+The checkpoint is stored as JSON, like the compiled cache (see the module cache).
+"""
+import io
+import os
+import os.path
+import csv
+import json
+import hashlib
+
+
+# CHECKPOINT FILE
+# The suffix added to the output file name
+CHECKPOINT = '.checkpoint'
+# The first bytes of every checkpoint file
+MAGIC = b'AUDITCHECKPOINT'
+# The format of the checkpoint (change this whenever the state changes)
+VERSION = 2
+
+
+def get_checkpoint_file(output):
+    """
+    Returns the name of the checkpoint file for the output file output.
+
+    Parameter output: The CSV file with the results of an audit
+    Precondition: output is a string that is a valid file name
+    """
+    return output+CHECKPOINT
+
+
+def hash_prefix(filename, size):
+    """
+    Returns the hash (a hex string) of the first size bytes of the file filename.
+
+    The result is None if the file is shorter than size bytes (or does not exist).
+
+    Parameter filename: The file to hash
+    Precondition: filename is a string
+
+    Parameter size: The number of bytes to hash
+    Precondition: size is an int >= 0
+    """
+    digest = hashlib.sha1()
+    try:
+        with open(filename, 'rb') as f:
+            left = size
+            while left > 0:
+                block = f.read(min(left, 1 << 20))
+                if not block:
+                    return None
+                digest.update(block)
+                left -= len(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def read_appended(filename, offset, width=None):
+    """
+    Returns the pair (rows, end) for the CSV rows of filename after byte offset.
+
+    The value rows is a 2d-list of the complete rows that start at offset (if offset is
+    0, this includes the header).  Blank lines are skipped.  The value end is the byte
+    offset just after the last line ending, where the next audit should continue.  Any
+    bytes after that are a row that is still being written (or a last row without a 
+    line ending), so they are left for the next audit.
+
+    If width is not None, every row must have that many fields, and this function 
+    raises a ValueError for any row that does not.
+
+    Parameter filename: The CSV file to read
+    Precondition: filename is a string, referring to a file at least offset bytes long
+
+    Parameter offset: The position to read from
+    Precondition: offset is an int >= 0, at the end of a row of filename (or 0)
+
+    Parameter width: The number of fields in each row (OPTIONAL)
+    Precondition: width is None or an int > 0
+    """
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    data = data[:data.rfind(b'\n')+1]
+    text = io.StringIO(data.decode('utf-8'), newline='')
+    rows = [row for row in csv.reader(text) if row]
+    if width is not None:
+        for row in rows:
+            if len(row) != width:
+                raise ValueError('%s has a row with %d fields, not %d: %s' %
+                                 (filename, len(row), width, ','.join(row)))
+    return (rows, offset+len(data))
+
+
+def is_current(state, directory, output):
+    """
+    Returns True if the checkpoint state can continue the audit of directory into output.
+
+    The checkpoint must be for the same dataset directory, the output must not have
+    changed since it was written, and the audited part of lessons.csv must be unchanged
+    (new lessons may only have been appended).
+
+    Parameter state: The checkpoint state
+    Precondition: state is a dictionary returned by load_checkpoint
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+
+    Parameter output: The CSV file with the results of the last audit
+    Precondition: output is a string that is a valid file name
+    """
+    if state['directory'] != os.path.abspath(directory):
+        return False
+    try:
+        if os.path.getsize(output) != state['written']:
+            return False
+    except OSError:
+        return False
+    lessons = os.path.join(directory, state['lessons'])
+    return hash_prefix(lessons, state['offset']) == state['digest']
+
+
+def load_checkpoint(output):
+    """
+    Returns the checkpoint state saved for output, or None if there is none.
+
+    The result is the dictionary passed to save_checkpoint (as loaded from JSON, so any
+    tuples are now lists).  It is None if there is no checkpoint file, or if the file is
+    damaged or from another version of this module.
+
+    Parameter output: The CSV file with the results of the last audit
+    Precondition: output is a string that is a valid file name
+    """
+    try:
+        with open(get_checkpoint_file(output), 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            data = json.loads(f.read().decode('utf-8'))
+        version, state = data['version'], data['state']
+    except Exception:
+        # A missing or damaged checkpoint just means a full audit
+        return None
+    return state if version == VERSION else None
+
+
+def save_checkpoint(output, state):
+    """
+    Saves state as the checkpoint for output, returning True if it succeeded.
+
+    The state is a dictionary with (at least) the following keys:
+
+        'directory': the absolute path of the dataset directory
+        'lessons':   the name of the lessons file in that directory
+        'offset':    the number of bytes of the lessons file that were audited
+        'digest':    the hash of those bytes (see hash_prefix)
+        'written':   the size of output after the audit
+
+    The checkpoint is written to a temporary file and then moved into place, so a
+    checkpoint is never partial.
+
+    Parameter output: The CSV file with the results of the audit
+    Precondition: output is a string that is a valid file name
+
+    Parameter state: The state to save
+    Precondition: state is a dictionary (as above) of JSON data
+    """
+    filename = get_checkpoint_file(output)
+    partial = '%s.%d' % (filename, os.getpid())
+    try:
+        with open(partial, 'wb') as f:
+            f.write(MAGIC)
+            data = {'version': VERSION, 'state': state}
+            f.write(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        os.replace(partial, filename)
+    except OSError:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    return True
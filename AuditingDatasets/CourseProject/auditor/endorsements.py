@@ -41,6 +41,7 @@ Date: THE DATE HERE
 """
 import pilots
 import utils
+import resolver
 import os.path
 import datetime
 
@@ -53,7 +54,7 @@ def teaches_multiengine(instructor):
     Parameter instructor: The flight instructor
     Precondition: instructor is a 6-element list of strings representing an instructor
     """
-    pass                    # Implement this function
+    return instructor[5] == 'Yes'
 
 
 def teaches_instrument(instructor):
@@ -64,7 +65,7 @@ def teaches_instrument(instructor):
     Parameter instructor: The flight instructor
     Precondition: instructor is a 6-element list of strings representing an instructor
     """
-    pass                    # Implement this function
+    return instructor[4] == 'Yes'
 
 
 def is_advanced(plane):
@@ -74,7 +75,7 @@ def is_advanced(plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    pass                    # Implement this function
+    return plane[3] == 'Yes'
 
 
 def is_multiengine(plane):
@@ -84,7 +85,7 @@ def is_multiengine(plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    pass                    # Implement this function
+    return plane[4] == 'Yes'
 
 
 def is_ifr_capable(plane):
@@ -97,7 +98,7 @@ def is_ifr_capable(plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    pass                    # Implement this function
+    return plane[2] == 'IFR'
 
 
 def bad_endorsement(takeoff,student,instructor,plane):
@@ -124,7 +125,11 @@ def bad_endorsement(takeoff,student,instructor,plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    pass                    # Implement this function
+    if instructor is not None:
+        return is_multiengine(plane) and not teaches_multiengine(instructor)
+    if is_advanced(plane) and not pilots.has_advanced_endorsement(takeoff, student):
+        return True
+    return is_multiengine(plane) and not pilots.has_multiengine_endorsement(takeoff, student)
 
 
 def bad_ifr(takeoff,student,instructor,plane):
@@ -151,7 +156,11 @@ def bad_ifr(takeoff,student,instructor,plane):
     Parameter plane: The school airplane
     Precondition: plane is a 7-element list of strings representing an airplane
     """
-    pass                    # Implement this function
+    if not is_ifr_capable(plane):
+        return True
+    if instructor is not None:
+        return not teaches_instrument(instructor)
+    return not pilots.has_instrument_rating(takeoff, student)
 
 
 # FILENAMES
@@ -206,10 +215,60 @@ def list_endorsement_violations(directory):
     'lessons.csv'
     """
     # Load in all of the files
+    students = utils.IndexedTable(utils.read_csv(resolver.resolve_file(directory, STUDENTS)))
+    teachers = utils.IndexedTable(utils.read_csv(resolver.resolve_file(directory, TEACHERS)))
+    planes = utils.IndexedTable(utils.read_csv(resolver.resolve_file(directory, PLANES)))
     
-    # For each of the lessons
-        # Check if the student is allowed to fly by themselves
-        # Check if pilot/instructor is endorsed for the plane
-        # Check if pilot/instructor is permitted to fly IFR in this plane
-        # Add any violations to the result
-    pass
+    result = []
+    lessons = utils.iter_csv(resolver.resolve_file(directory, LESSONS))
+    next(lessons, None) # Skip the header
+    for lesson in lessons:
+        takeoff = utils.str_to_time(lesson[3])
+        student = pilots.get_record(utils.get_for_id(lesson[0], students))
+        instructor = utils.get_for_id(lesson[2], teachers)
+        plane = utils.get_for_id(lesson[1], planes)
+        violation = get_lesson_violation(lesson, takeoff, student, instructor, plane)
+        if violation != '':
+            lesson.append(violation)
+            result.append(lesson)
+    return result
+
+
+def get_lesson_violation(lesson, takeoff, student, instructor, plane):
+    """
+    Returns the endorsement violation for a single flight lesson (empty string if it is ok)
+    
+    The violation is one of 'Solo', 'Endorsement', 'IFR' or 'Credentials', as described 
+    in list_endorsement_violations.  Only IFR lessons can have an IFR violation.  The
+    takeoff time and the people/plane are looked up by the caller, so that other audits
+    of the same lesson can share them.
+    
+    Parameter lesson: The flight lesson
+    Precondition: lesson is a 7-element list of strings, in the format of lessons.csv
+    
+    Parameter takeoff: The takeoff time of this lesson
+    Precondition: takeoff is a datetime object
+    
+    Parameter student: The student pilot
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
+    
+    Parameter instructor: The flight instructor (None if there is no instructor)
+    Precondition: instructor is None or a 6-element list of strings representing an instructor
+    
+    Parameter plane: The school airplane
+    Precondition: plane is a 7-element list of strings representing an airplane
+    """
+    found = []
+    if instructor is None and pilots.get_certification(takeoff, student) < pilots.PILOT_STUDENT:
+        found.append('Solo')
+    if bad_endorsement(takeoff, student, instructor, plane):
+        found.append('Endorsement')
+    if lesson[5] == 'IFR' and bad_ifr(takeoff, student, instructor, plane):
+        found.append('IFR')
+    
+    if len(found) == 0:
+        return ''
+    elif len(found) == 1:
+        return found[0]
+    return 'Credentials'
@@ -0,0 +1,407 @@
+"""
+Module to check inspection violations for a flight lesson (OPTIONAL)
+
+There are three kinds of inspection violations. (1) A plane has gone more than
+a year since its annual inspection. (2) A plane has accrued 100 hours of flight
+time since its last regular inspection. (3) A plane is used for a lesson despite
+the repair logs claiming that it is in the shop for maintenance.
+
+This module is MUCH more difficult than the others.  In the other modules, we
+provided specifications for all of the helper functions, to make the main
+function (listing all violations) easier.  We do not do that at all here.
+You have one specification for one function.  Any additional functions (which
+we do recommend) are up to you.
+
+The other tricky part is keeping track of the hours since the last inspection
+for each plane.  It is possible to do this with a nested loop, but the result
+will be very slow (the application will take several minutes to complete).
+To speed it up, you have to figure out how to "interleave" lessons with repairs.
+This is a very advanced programming problem.
+
+To implement this module, you need to familiarize yourself with two files
+beyond what you have used already.
+
+First of all, recall that fleet.py is a CSV file with the following header:
+
+    TAILNO  TYPE  CAPABILITY  ADVANCED  MULTIENGINE ANNUAL  HOURS
+
+This lists the planes at the flight school.  For this module you need the
+last two columns, which are strings representing a date and an number,
+respectively.  The date is the last annual inspection for that plane as of
+the beginning of the year (e.g. the start of the audit).  The number is
+the number of hours since the last 100 hour inspection.
+
+In addition, repairs.csv is a CSV file with the following header:
+
+    TAILNO  IN-DATE  OUT-DATE  DESCRIPTION
+
+The first column is the string identifying the plane.  The next two columns are
+strings representing dates, for when the plane enters and leaves the shop (so
+it should not fly during this time).  The last column is the type of repair.
+A plane must be inspected/repaired every 100 hours.  In addition, it must have
+an annual inspection once a year.  Other repairs happen as needed.  ANY repair
+resets the number of hours on the plane.
+
+The preconditions for many of these functions are quite messy.  While this
+makes writing the functions simpler (because the preconditions ensure we have
+less to worry about), enforcing these preconditions can be quite hard. That is
+why it is not necessary to enforce any of the preconditions in this module.
+
+Author: YOUR NAME HERE
+Date: THE DATE HERE
+"""
+import os.path
+import datetime
+import utils
+import resolver
+
+try:
+    import numpy
+except ImportError: # Only needed for a LessonTable
+    numpy = None
+
+# FILENAMES
+# Sunrise and sunset (mainly useful for timezones, since repairs do not have them)
+DAYCYCLE = 'daycycle.json'
+# The list of all take-offs (and landings)
+LESSONS  = 'lessons.csv'
+# The list of all planes in the flight school
+PLANES   = 'fleet.csv'
+# The list of all repairs made to planes over the past year
+REPAIRS  = 'repairs.csv'
+
+# REPAIRS
+# The description of an annual inspection in repairs.csv
+ANNUAL = 'annual inspection'
+# The most hours a plane may fly between repairs or inspections
+MAX_HOURS = 100
+# The most days a plane may fly after its annual inspection
+MAX_DAYS  = 365
+
+
+def get_flight_hours(takeoff, landing):
+    """
+    Returns the number of hours (as a float) flown between takeoff and landing.
+    
+    Parameter takeoff: The takeoff time of the flight
+    Precondition: takeoff is a datetime object
+    
+    Parameter landing: The landing time of the flight
+    Precondition: landing is a datetime object comparable to takeoff
+    """
+    return (landing-takeoff).total_seconds()/(60*60)
+
+
+def get_local_time(timestamp):
+    """
+    Returns the local (naive) datetime for the given timestamp.
+    
+    Repair and annual dates have no timezone; they are dates in the local time of
+    the flight school.  Lesson timestamps are local times with an offset, so dropping
+    the offset makes them comparable to the repair dates.
+    
+    Parameter timestamp: The time stamp to convert
+    Precondition: timestamp is a string in ISO format
+    """
+    return utils.str_to_time(timestamp).replace(tzinfo=None)
+
+
+def get_inspection_violations(lessons, planes, repairs):
+    """
+    Returns the list of inspection violations for each lesson, in the order of lessons.
+    
+    Each element of the list is one of 'Annual', 'Inspection', 'Grounded' or 
+    'Maintenance' as described in list_inspection_violations, or the empty string if 
+    that lesson is okay.
+    
+    This function "interleaves" lessons with repairs.  It groups the lessons and the
+    repairs by plane, sorts each group by time, and then sweeps through each plane's
+    history once (see _sweep_plane).  So it never needs a nested loop over the lessons.
+    Lessons for planes not in the fleet have no violations.
+    
+    The lessons are only visited once, so they may come from an iterator (such as the 
+    one returned by utils.iter_csv).  Only the times of each flight are kept for the
+    sweep, not the lessons themselves.
+    
+    If lessons is a LessonTable (see the module lessons), the sweep is done on all of the
+    lessons of a plane at once with NumPy instead (see _sweep_table).  The result is 
+    the same.
+    
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons in the format of lessons.csv, WITHOUT
+    the header, an iterator over such lessons, or a LessonTable
+    
+    Parameter planes: The planes in the flight school
+    Precondition: planes is a 2d-list (table) in the format of fleet.csv
+    
+    Parameter repairs: The repairs made to the planes
+    Precondition: repairs is a 2d-list (table) in the format of repairs.csv
+    """
+    if hasattr(lessons, 'local_takeoff'):
+        return _sweep_table(lessons, planes, repairs)
+    
+    # Group the lessons and repairs by plane
+    flights = {}
+    pos = 0
+    for lesson in lessons:
+        flight = (get_local_time(lesson[3]), get_local_time(lesson[4]), pos)
+        flights.setdefault(lesson[1], []).append(flight)
+        pos += 1
+    result = ['']*pos
+    
+    shop = {}
+    for repair in repairs[1:]:
+        visit = (get_local_time(repair[1]), get_local_time(repair[2]), repair[3] == ANNUAL)
+        shop.setdefault(repair[0], []).append(visit)
+    
+    for plane in planes[1:]:
+        if plane[0] in flights:
+            _sweep_plane(plane, flights[plane[0]], shop.get(plane[0], []), result)
+    return result
+
+
+def _sweep_plane(plane, flights, repairs, result):
+    """
+    Sweeps through the history of a single plane, recording its violations in result.
+    
+    The flights and repairs are sorted by time and visited in order.  Before each 
+    takeoff, every repair that began by then is applied: it resets the hours, it 
+    updates the annual if it is an annual inspection, and it grounds the plane until 
+    it is out of the shop.  Flights with the same takeoff do not count towards each 
+    other's hours.
+    
+    Parameter plane: The plane to audit
+    Precondition: plane is a 7-element list of strings representing an airplane
+    
+    Parameter flights: The flights of this plane
+    Precondition: flights is a list of tuples (takeoff, landing, pos) where takeoff and
+    landing are local datetimes and pos is the position of the lesson in result
+    
+    Parameter repairs: The repairs of this plane
+    Precondition: repairs is a list of tuples (timein, timeout, annual) where timein and
+    timeout are local datetimes and annual is a bool
+    
+    Parameter result: The list of violations to update
+    Precondition: result is a list of strings with an element for each lesson
+    """
+    flights = sorted(flights, key=lambda flight: flight[0])
+    repairs = sorted(repairs)
+    
+    annual = get_local_time(plane[5])
+    hours = float(plane[6])
+    released = None # The time the plane was last out of the shop
+    
+    nextrepair = 0
+    pos = 0
+    while pos < len(flights):
+        takeoff = flights[pos][0]
+        while nextrepair < len(repairs) and repairs[nextrepair][0] <= takeoff:
+            timein, timeout, inspected = repairs[nextrepair]
+            hours = 0
+            if inspected and annual < timein:
+                annual = timein
+            if released is None or released < timeout:
+                released = timeout
+            nextrepair += 1
+        
+        grounded = released is not None and takeoff < released
+        overdue = (takeoff-annual).days > MAX_DAYS
+        
+        # Check every flight with this takeoff before adding their hours
+        stop = pos
+        while stop < len(flights) and flights[stop][0] == takeoff:
+            stop += 1
+        flown = 0
+        for flight in flights[pos:stop]:
+            length = get_flight_hours(flight[0], flight[1])
+            flown += length
+            found = []
+            if overdue:
+                found.append('Annual')
+            if hours+length > MAX_HOURS:
+                found.append('Inspection')
+            if grounded:
+                found.append('Grounded')
+            if len(found) == 1:
+                result[flight[2]] = found[0]
+            elif len(found) > 1:
+                result[flight[2]] = 'Maintenance'
+        hours += flown
+        pos = stop
+
+
+def get_carried_lessons(lessons, repairs):
+    """
+    Returns the lessons that can still count towards the hours of a later flight.
+    
+    The hours of a plane are reset by each repair, so a flight only counts towards the
+    hours of later flights until the plane goes into the shop again.  The result is the
+    lessons (in their original order) that take off no earlier than the last repair of
+    their plane begun before the plane's last takeoff in lessons.  If a plane has had 
+    no repair yet, all of its lessons are kept (as its hours still count from fleet.csv).
+    
+    So get_inspection_violations gives the same result for a lesson appended after 
+    lessons, whether it is given all of lessons or just these ones.  This is what lets
+    an incremental audit carry the inspection hours from one audit to the next.
+    
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons in the format of lessons.csv, WITHOUT
+    the header
+    
+    Parameter repairs: The repairs made to the planes
+    Precondition: repairs is a 2d-list (table) in the format of repairs.csv
+    """
+    times = [get_local_time(lesson[3]) for lesson in lessons]
+    last = {}
+    for pos in range(len(lessons)):
+        tailno = lessons[pos][1]
+        if tailno not in last or last[tailno] < times[pos]:
+            last[tailno] = times[pos]
+    
+    reset = {}
+    for repair in repairs[1:]:
+        timein = get_local_time(repair[1])
+        if repair[0] in last and timein <= last[repair[0]]:
+            if repair[0] not in reset or reset[repair[0]] < timein:
+                reset[repair[0]] = timein
+    
+    return [lessons[pos] for pos in range(len(lessons)) 
+            if lessons[pos][1] not in reset or reset[lessons[pos][1]] <= times[pos]]
+
+
+def _sweep_table(table, planes, repairs):
+    """
+    Returns the list of inspection violations for each lesson in the LessonTable table.
+    
+    This is the same sweep as _sweep_plane, but for all flights of a plane at once.
+    Times are local (wall clock) epoch seconds.  With the flights and repairs of a plane
+    sorted by time, a binary search finds the number of repairs begun by each takeoff.
+    That number splits the flights into segments between repairs, so the hours before a
+    flight are a difference of cumulative sums within its segment (stopping at the 
+    first flight with the same takeoff).  A cumulative maximum of the out-dates tells 
+    whether the plane is still in the shop.
+    
+    Parameter table: The flight lessons
+    Precondition: table is a LessonTable
+    
+    Parameter planes: The planes in the flight school
+    Precondition: planes is a 2d-list (table) in the format of fleet.csv
+    
+    Parameter repairs: The repairs made to the planes
+    Precondition: repairs is a 2d-list (table) in the format of repairs.csv
+    """
+    takeoffs = table.local_takeoff()
+    lengths = table.local_landing()-takeoffs
+    order = numpy.lexsort((takeoffs, table.plane))
+    bounds = numpy.searchsorted(table.plane[order], numpy.arange(len(table.planes)+1))
+    
+    shop = {}
+    for repair in repairs[1:]:
+        visit = (_local_seconds(repair[1]), _local_seconds(repair[2]), repair[3] == ANNUAL)
+        shop.setdefault(repair[0], []).append(visit)
+    
+    codes = numpy.zeros(len(table), dtype=numpy.int8)
+    for code in range(len(table.planes)):
+        plane = utils.get_for_id(table.planes[code], planes)
+        if plane is None:
+            continue
+        flights = order[bounds[code]:bounds[code+1]]
+        visits = sorted(shop.get(plane[0], []))
+        timein = numpy.array([v[0] for v in visits], dtype=numpy.int64)
+        timeout = numpy.array([v[1] for v in visits], dtype=numpy.int64)
+        annuals = numpy.array([v[0] for v in visits if v[2]], dtype=numpy.int64)
+        
+        takeoff = takeoffs[flights]
+        length = lengths[flights]
+        begun = numpy.searchsorted(timein, takeoff, 'right')
+        
+        # Overdue if the latest annual is more than MAX_DAYS old
+        annual = numpy.full(len(flights), _local_seconds(plane[5]), dtype=numpy.int64)
+        done = numpy.searchsorted(annuals, takeoff, 'right')
+        if len(annuals) > 0:
+            annual = numpy.maximum(annual, numpy.where(done > 0, annuals[done-1], annual))
+        overdue = (takeoff-annual)//(24*60*60) > MAX_DAYS
+        
+        # Grounded until the latest out-date of the repairs begun so far
+        grounded = numpy.zeros(len(flights), dtype=bool)
+        if len(visits) > 0:
+            released = numpy.maximum.accumulate(timeout)
+            grounded = (begun > 0) & (takeoff < released[begun-1])
+        
+        # The hours since the last repair (only the carried over hours before the first)
+        sums = numpy.concatenate(([0], numpy.cumsum(length)))
+        segment = numpy.searchsorted(begun, begun, 'left')
+        ties = numpy.searchsorted(takeoff, takeoff, 'left')
+        carried = numpy.where(begun == 0, float(plane[6])*60*60, 0)
+        over = carried+(sums[ties]-sums[segment])+length > MAX_HOURS*60*60
+        
+        codes[flights] = overdue*1+over*2+grounded*4
+    
+    # Codes are bit sets of (Annual, Inspection, Grounded)
+    names = ['', 'Annual', 'Inspection', 'Maintenance', 'Grounded', 'Maintenance', 
+             'Maintenance', 'Maintenance']
+    return [names[code] for code in codes.tolist()]
+
+
+def _local_seconds(timestamp):
+    """
+    Returns the local time of timestamp as (wall clock) seconds since the epoch.
+    
+    Parameter timestamp: The time stamp to convert
+    Precondition: timestamp is a string in ISO format
+    """
+    return int((get_local_time(timestamp)-datetime.datetime(1970, 1, 1)).total_seconds())
+
+
+def list_inspection_violations(directory):
+    """
+    Returns the (annotated) list of flight lessons that violate inspection
+    or repair requirements.
+    
+    This function reads the data files in the given directory (the data files
+    are all identified by the constants defined above in this module).  It loops
+    through the list of flight lessons (in lessons.csv), identifying those
+    takeoffs for which (1) a plane has gone MORE than a year since its annual
+    inspection, (2) a plane has accrued OVER 100 hours of flight time since its
+    last repair or inspection, and (3) a plane is used for a lesson despite
+    the repair logs claiming that it is in the shop for maintenance.
+    
+    Note that a plane landing with exactly 100 hours used is not a violation.
+    Nor is a plane that has flown with 365 days since its last inspection. This
+    school likes to cut things close to safe money, but these are technically
+    not violations.
+    
+    This function returns a list that contains a copy of each violating lesson,
+    together with the violation appended to the lesson.  Violation of type (1)
+    is annotated 'Annual'.  Violation of type (2) is annotated 'Inspection'.
+    Violations of type (3) is annotated 'Grounded'.  If more than one is
+    violated, it should be annotated 'Maintenance'.
+    
+    Example: Suppose that the lessons
+    
+        S00898  811AX  I072  2017-01-27T13:00:00-05:00  2017-01-27T15:00:00-05:00  VFR  Pattern
+        S00681  684TM  I072  2017-02-26T14:00:00-05:00  2017-02-26T17:00:00-05:00  VFR  Practice Area
+        S01031  738GG  I010  2017-03-19T13:00:00-04:00  2017-03-19T15:00:00-04:00  VFR  Pattern
+    
+    violate for reasons of 'Annual', 'Inspection', and 'Grounded', respectively
+    (and are the only violations).  Then this function will return the 2d list
+    
+        [['S00898', '811AX', 'I072', '2017-01-27T13:00:00-05:00', '2017-01-27T15:00:00-05:00', 'VFR', 'Pattern', 'Annual'],
+         ['S00681', '684TM', 'I072', '2017-02-26T14:00:00-05:00', '2017-02-26T17:00:00-05:00', 'VFR', 'Practice Area', 'Inspection'],
+         ['S01031', '738GG', 'I010', '2017-03-19T13:00:00-04:00', '2017-03-19T15:00:00-04:00', 'VFR', 'Pattern', 'Grounded']]
+    
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the files
+    'daycycle.json', 'fleet.csv', 'repairs.csv' and 'lessons.csv'
+    """
+    # Load in all of the files
+    lessons = utils.read_csv(resolver.resolve_file(directory, LESSONS))[1:]
+    planes = utils.read_csv(resolver.resolve_file(directory, PLANES))
+    repairs = utils.read_csv(resolver.resolve_file(directory, REPAIRS))
+    
+    result = []
+    reasons = get_inspection_violations(lessons, planes, repairs)
+    for pos in range(len(lessons)):
+        if reasons[pos] != '':
+            result.append(lessons[pos]+[reasons[pos]])
+    return result
@@ -0,0 +1,394 @@
+"""
+Module for measuring where the time of an audit goes.
+
+When an audit slows down, it is hard to tell whether the time goes to parsing, to
+searching the weather, or to checking minimums.  This module records the wall time of
+each stage of an audit, and counters for the events that matter to its speed, such as
+weather lookups that miss an exact key and must fall back to a search.
+
+Profiling is off unless it is started, and then the functions stage and count do almost
+nothing.  To profile a piece of code, start a profile and stop it when done:
+
+    profile = instrument.start()
+    app.audit_dataset('KITH-2017', None)
+    instrument.stop()
+    print(profile.summary())
+
+The application does this with the option --profile.  Stages may be nested, and their
+names use dots for nesting (so 'load.weather' is part of 'load').
+
+Calls to a function can be counted without touching its module (or slowing it down
+when profiling is off) with count_calls.  While a profile is recorded, the function is
+replaced in its module by a wrapper that counts each call, so every caller that looks it
+up in the module is counted.  The application counts the timestamps it parses this way:
+
+    instrument.count_calls(utils, 'str_to_time')
+
+Other code can also follow the stages as they finish with add_hook.  A hook is called
+with the name and seconds of every stage that ends (whether a profile is started or
+not), so it can forward the timings somewhere else, like a log.
+
+Stages only show which part of an audit is slow.  To find the functions that are slow
+(such as the timestamp parser, or the lookups of pilots), profile_call runs a function
+under cProfile and saves the statistics, and get_report summarizes the functions that
+took the most time.  The application does this with the option --profile-out.  The
+saved file can be read with pstats or tools like snakeviz.  A sampling profiler like
+py-spy needs no support from this module, as it attaches to the process from outside:
+
+    py-spy record -o audit.svg -- python auditor KITH-2017
+
+Only the current process is profiled, so the work of worker processes (as in a batch
+audit with more than one job) is not counted.
+"""
+import io
+import json
+import time
+import pstats
+import cProfile
+import functools
+
+
+# The profile being recorded (None when profiling is off)
+_ACTIVE = None
+# The functions called whenever a stage ends
+_HOOKS = []
+# The functions whose calls are counted, as lists [module, name, counter, original]
+_COUNTED = []
+
+# The rates in a summary, as (name, counter, stage): the counter per second of the stage
+RATES = (('lessons/sec', 'lessons', 'audit'),)
+# The number of functions in a report of a cProfile run
+TOP_FUNCTIONS = 25
+
+
+class Profile(object):
+    """
+    A class representing the stage times and counters recorded for an audit.
+
+    Attribute stages: The total time of each stage
+    Invariant: stages is a dictionary from stage names to seconds (floats), in the
+    order that the stages first ended
+
+    Attribute calls: The number of times each stage ran
+    Invariant: calls is a dictionary from stage names to ints, with the same keys as stages
+
+    Attribute counters: The total of each counter
+    Invariant: counters is a dictionary from counter names to ints (or floats)
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty profile.
+        """
+        self.stages = {}
+        self.calls = {}
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        """
+        Adds the given time to the stage name.
+
+        Parameter name: The stage name
+        Precondition: name is a string
+
+        Parameter seconds: The time the stage took
+        Precondition: seconds is a float >= 0
+        """
+        self.stages[name] = self.stages.get(name, 0.0)+seconds
+        self.calls[name] = self.calls.get(name, 0)+1
+
+    def add_count(self, name, amount=1):
+        """
+        Adds amount to the counter name.
+
+        Parameter name: The counter name
+        Precondition: name is a string
+
+        Parameter amount: The amount to add
+        Precondition: amount is a number
+        """
+        self.counters[name] = self.counters.get(name, 0)+amount
+
+    def rates(self):
+        """
+        Returns a dictionary of the rates in RATES that this profile has recorded.
+        """
+        result = {}
+        for name, counter, stage in RATES:
+            if counter in self.counters and self.stages.get(stage):
+                result[name] = self.counters[counter]/self.stages[stage]
+        return result
+
+    def to_dict(self):
+        """
+        Returns this profile as a dictionary (suitable for JSON).
+
+        The dictionary has the keys 'stages' (each stage with its 'seconds' and 'calls'),
+        'counters' and 'rates'.
+        """
+        stages = dict((name, {'seconds': self.stages[name], 'calls': self.calls[name]})
+                      for name in self.stages)
+        return {'stages': stages, 'counters': dict(self.counters), 'rates': self.rates()}
+
+    def save(self, filename):
+        """
+        Writes this profile to the JSON file filename.
+
+        Parameter filename: The file to write
+        Precondition: filename is a string that is a valid file name
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        """
+        Returns a table (as a string) of the stages, counters and rates of this profile.
+
+        Stages are sorted by name, so that nested stages follow the stage they are part
+        of (and are indented under it).
+        """
+        lines = ['%-32s %8s %12s' % ('STAGE', 'CALLS', 'SECONDS')]
+        for name in sorted(self.stages):
+            label = '  '*name.count('.')+name.split('.')[-1]
+            lines.append('%-32s %8d %12.3f' % (label, self.calls[name], self.stages[name]))
+        if self.counters:
+            lines.append('')
+            lines.append('%-32s %21s' % ('COUNTER', 'VALUE'))
+            for name in sorted(self.counters):
+                lines.append('%-32s %21s' % (name, self.counters[name]))
+        rates = self.rates()
+        if rates:
+            lines.append('')
+            for name in rates:
+                lines.append('%-32s %21.1f' % (name, rates[name]))
+        return '\n'.join(lines)
+
+
+class _Stage(object):
+    """
+    A class representing a stage that is running, for use in a with statement.
+
+    Attribute name: The stage name
+    Invariant: name is a string
+
+    Attribute start: The time the stage started (None if it is not timed)
+    Invariant: start is None or a float from time.perf_counter
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        """
+        Initializes a stage that has not started.
+
+        Parameter name: The stage name
+        Precondition: name is a string
+        """
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        """
+        Starts timing the stage (if anything is listening).
+        """
+        if _ACTIVE is not None or _HOOKS:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, value, trace):
+        """
+        Records the time of the stage (even if it raised an exception).
+        """
+        if self.start is not None:
+            seconds = time.perf_counter()-self.start
+            if _ACTIVE is not None:
+                _ACTIVE.add_time(self.name, seconds)
+            for hook in list(_HOOKS):
+                hook(self.name, seconds)
+        return False
+
+
+def start(profile=None):
+    """
+    Starts profiling, returning the profile that will be recorded.
+
+    Parameter profile: The profile to add to (None for a new one)
+    Precondition: profile is None or a Profile object
+    """
+    global _ACTIVE
+    _ACTIVE = Profile() if profile is None else profile
+    for item in _COUNTED:
+        _wrap(item)
+    return _ACTIVE
+
+
+def stop():
+    """
+    Stops profiling, returning the profile that was recorded (None if there was none).
+    """
+    global _ACTIVE
+    profile = _ACTIVE
+    _ACTIVE = None
+    for item in _COUNTED:
+        _unwrap(item)
+    return profile
+
+
+def is_active():
+    """
+    Returns True if a profile is being recorded.
+    """
+    return _ACTIVE is not None
+
+
+def stage(name):
+    """
+    Returns a context manager that times the stage name.
+
+    Use it in a with statement around the code of the stage:
+
+        with instrument.stage('load'):
+            ...
+
+    Parameter name: The stage name (use dots for nested stages)
+    Precondition: name is a string
+    """
+    return _Stage(name)
+
+
+def count(name, amount=1):
+    """
+    Adds amount to the counter name (if profiling is on).
+
+    Parameter name: The counter name
+    Precondition: name is a string
+
+    Parameter amount: The amount to add
+    Precondition: amount is a number
+    """
+    if _ACTIVE is not None:
+        _ACTIVE.add_count(name, amount)
+
+
+def count_calls(module, name, counter=None):
+    """
+    Counts the calls to the function name in module whenever a profile is recorded.
+
+    The calls are added to the counter with the given name (the function name if it is
+    None).  Only calls that look the function up in module (as module.name, or by name
+    inside module) are counted.  Counting the same function twice has no effect.
+
+    Parameter module: The module of the function
+    Precondition: module is a module object
+
+    Parameter name: The name of the function
+    Precondition: name is a string naming a function in module
+
+    Parameter counter: The counter name (OPTIONAL)
+    Precondition: counter is None or a string
+    """
+    for item in _COUNTED:
+        if item[0] is module and item[1] == name:
+            return
+    item = [module, name, name if counter is None else counter, None]
+    _COUNTED.append(item)
+    if _ACTIVE is not None:
+        _wrap(item)
+
+
+def _wrap(item):
+    """
+    Replaces the function of item with a wrapper that counts its calls.
+
+    Parameter item: The function to count
+    Precondition: item is an element of _COUNTED
+    """
+    module, name, counter, original = item
+    if original is not None:
+        return
+    original = getattr(module, name)
+
+    @functools.wraps(original)
+    def counted(*args, **kwargs):
+        if _ACTIVE is not None:
+            _ACTIVE.add_count(counter)
+        return original(*args, **kwargs)
+
+    item[3] = original
+    setattr(module, name, counted)
+
+
+def _unwrap(item):
+    """
+    Restores the function of item that was replaced by _wrap.
+
+    Parameter item: The function to count
+    Precondition: item is an element of _COUNTED
+    """
+    if item[3] is not None:
+        setattr(item[0], item[1], item[3])
+        item[3] = None
+
+
+def add_hook(hook):
+    """
+    Adds hook to the functions called whenever a stage ends.
+
+    The hook is called as hook(name, seconds).  It is called for every stage, whether
+    or not a profile has been started.
+
+    Parameter hook: The function to add
+    Precondition: hook is a function of a string and a float
+    """
+    if hook not in _HOOKS:
+        _HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Removes hook from the functions called whenever a stage ends (if it is there).
+
+    Parameter hook: The function to remove
+    Precondition: hook is a function added with add_hook
+    """
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+
+def profile_call(filename, func, *args):
+    """
+    Returns the result of func on args, saving the cProfile statistics to filename.
+
+    The statistics are saved even if func raises an exception, so that a crash can be
+    profiled too.
+
+    Parameter filename: The file for the statistics
+    Precondition: filename is a string that is a valid file name
+
+    Parameter func: The function to profile
+    Precondition: func is callable with the arguments args
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(filename)
+
+
+def get_report(filename, top=TOP_FUNCTIONS):
+    """
+    Returns a report (as a string) of the functions that took the most time in filename.
+
+    The functions are sorted by their own time (not counting the functions they call),
+    which is where the time of a program actually goes.  The report is the table of
+    pstats, without the folders of each function.
+
+    Parameter filename: The statistics to report
+    Precondition: filename is a string naming a file saved by profile_call (or cProfile)
+
+    Parameter top: The number of functions to report
+    Precondition: top is an int > 0
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(filename, stream=stream)
+    stats.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats(top)
+    return stream.getvalue().strip('\n')
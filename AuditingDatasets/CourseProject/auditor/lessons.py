@@ -0,0 +1,278 @@
+"""
+Module for a columnar table of flight lessons.
+
+A lessons.csv file is normally read as a 2d-list, with a list of 7 strings for each
+lesson.  Every audit then has to re-derive the takeoff time, the instructor, the flight
+rules and so on from those strings, one lesson at a time.  The class LessonTable stores
+the same file as typed NumPy columns instead, so that audits can filter, sort and join
+the lessons all at once.
+
+This module requires NumPy (the rest of the application does not).
+"""
+import datetime
+import numpy
+import utils
+import pilots
+
+
+# CODES
+# The flight rules, in the order of their codes
+FILED = ('VFR', 'IFR')
+# The code for a lesson without an instructor
+NO_INSTRUCTOR = -1
+# The code for a row that is missing from a joined table
+MISSING = -1
+
+
+class LessonTable(object):
+    """
+    A class representing the lessons of lessons.csv as typed columns.
+
+    Each column is a NumPy array with one element per lesson, in file order.  Times are
+    seconds since the epoch (UTC), with the UTC offset of the original timestamp kept
+    in a separate column, so takeoff+takeoff_offset is the local (wall clock) time.
+    Strings are interned: the column holds an int code, which is the position of the
+    string in the matching list (e.g. students[table.student[pos]] is the student id
+    of lesson pos).  The areas always start with pilots.AREAS and the flight rules with
+    FILED, so those codes are the same for every table.
+
+    Attribute header: The header of the lessons file
+    Invariant: header is a list of strings
+
+    Attribute takeoff: The takeoff times
+    Invariant: takeoff is an int64 array of epoch seconds
+
+    Attribute takeoff_offset: The UTC offset of each takeoff
+    Invariant: takeoff_offset is an int32 array of seconds
+
+    Attribute landing: The landing times
+    Invariant: landing is an int64 array of epoch seconds
+
+    Attribute landing_offset: The UTC offset of each landing
+    Invariant: landing_offset is an int32 array of seconds
+
+    Attribute student: The student of each lesson
+    Invariant: student is an int32 array of positions in students
+
+    Attribute instructor: The instructor of each lesson
+    Invariant: instructor is an int32 array of positions in instructors, or NO_INSTRUCTOR
+
+    Attribute plane: The plane of each lesson
+    Invariant: plane is an int32 array of positions in planes
+
+    Attribute filed: The flight rules of each lesson
+    Invariant: filed is an int8 array of positions in rules
+
+    Attribute area: The area of each lesson
+    Invariant: area is an int8 array of positions in areas
+
+    Attribute students: The student ids
+    Invariant: students is a list of distinct strings
+
+    Attribute instructors: The instructor ids
+    Invariant: instructors is a list of distinct (non-empty) strings
+
+    Attribute planes: The plane tail numbers
+    Invariant: planes is a list of distinct strings
+
+    Attribute rules: The flight rules
+    Invariant: rules is a list of distinct strings, starting with FILED
+
+    Attribute areas: The flight areas
+    Invariant: areas is a list of distinct strings, starting with pilots.AREAS
+    """
+
+    def __init__(self, table):
+        """
+        Initializes the columns from the rows of table.
+
+        Parameter table: The lessons
+        Precondition: table is a 2d-list (table) in the format of lessons.csv, or an
+        iterator over the rows of such a table (the header first)
+        """
+        rows = iter(table)
+        self.header = list(next(rows))
+        self.students = []
+        self.instructors = []
+        self.planes = []
+        self.rules = list(FILED)
+        self.areas = list(pilots.AREAS)
+
+        codes = [_codes(names) for names in (self.students, self.planes, self.instructors,
+                                            self.rules, self.areas)]
+        students, instructors, planes, rules, areas = [], [], [], [], []
+        takeoffs, toffsets, landings, loffsets = [], [], [], []
+        for row in rows:
+            students.append(_intern(row[0], self.students, codes[0]))
+            planes.append(_intern(row[1], self.planes, codes[1]))
+            if row[2] == '':
+                instructors.append(NO_INSTRUCTOR)
+            else:
+                instructors.append(_intern(row[2], self.instructors, codes[2]))
+            rules.append(_intern(row[5], self.rules, codes[3]))
+            areas.append(_intern(row[6], self.areas, codes[4]))
+
+            time = utils.str_to_time(row[3])
+            takeoffs.append(int(time.timestamp()))
+            toffsets.append(int(time.utcoffset().total_seconds()))
+            time = utils.str_to_time(row[4])
+            landings.append(int(time.timestamp()))
+            loffsets.append(int(time.utcoffset().total_seconds()))
+
+        self.takeoff = numpy.array(takeoffs, dtype=numpy.int64)
+        self.takeoff_offset = numpy.array(toffsets, dtype=numpy.int32)
+        self.landing = numpy.array(landings, dtype=numpy.int64)
+        self.landing_offset = numpy.array(loffsets, dtype=numpy.int32)
+        self.student = numpy.array(students, dtype=numpy.int32)
+        self.instructor = numpy.array(instructors, dtype=numpy.int32)
+        self.plane = numpy.array(planes, dtype=numpy.int32)
+        self.filed = numpy.array(rules, dtype=numpy.int8)
+        self.area = numpy.array(areas, dtype=numpy.int8)
+
+    def __len__(self):
+        """
+        Returns the number of lessons in this table.
+        """
+        return len(self.takeoff)
+
+    def row(self, pos):
+        """
+        Returns the lesson at position pos as a list of 7 strings (as in lessons.csv)
+
+        Timestamps are written in ISO format with their original UTC offset.
+
+        Parameter pos: The position of the lesson
+        Precondition: pos is an int and a valid position in this table
+        """
+        instructor = self.instructor[pos]
+        return [self.students[self.student[pos]], self.planes[self.plane[pos]],
+                '' if instructor == NO_INSTRUCTOR else self.instructors[instructor],
+                _isoformat(self.takeoff[pos], self.takeoff_offset[pos]),
+                _isoformat(self.landing[pos], self.landing_offset[pos]),
+                self.rules[self.filed[pos]], self.areas[self.area[pos]]]
+
+    def local_takeoff(self):
+        """
+        Returns the takeoff times in local time (as epoch seconds of the wall clock)
+        """
+        return self.takeoff+self.takeoff_offset
+
+    def local_landing(self):
+        """
+        Returns the landing times in local time (as epoch seconds of the wall clock)
+        """
+        return self.landing+self.landing_offset
+
+    def is_instructed(self):
+        """
+        Returns a bool array that is True for the lessons with an instructor.
+        """
+        return self.instructor != NO_INSTRUCTOR
+
+    def is_vfr(self):
+        """
+        Returns a bool array that is True for the VFR lessons.
+        """
+        return self.filed == FILED.index('VFR')
+
+    def join(self, column, table):
+        """
+        Returns the position in table of the row for each lesson.
+
+        The column is the name of an id column of this table ('student', 'instructor'
+        or 'plane').  The result is an int array with an element for each lesson, which
+        is the position of the row in table with that id (MISSING if there is none, or
+        if the lesson has no instructor).  Like utils.get_for_id, the first row with a
+        given id is used, and the header is position 0.
+
+        Parameter column: The id column to join on
+        Precondition: column is one of 'student', 'instructor' or 'plane'
+
+        Parameter table: The table to join with
+        Precondition: table is a 2d-list (table) whose first column is an id, or an
+        IndexedTable
+        """
+        names = getattr(self, column+'s')
+        rows = {}
+        for pos in range(len(table)-1, 0, -1):
+            rows[table[pos][0]] = pos
+        lookup = numpy.array([rows.get(name, MISSING) for name in names]+[MISSING], dtype=numpy.int32)
+        # Codes of NO_INSTRUCTOR (-1) pick the last (MISSING) entry
+        return lookup[getattr(self, column)]
+
+    def select(self, positions):
+        """
+        Returns a new LessonTable with only the lessons at the given positions.
+
+        The string lists are shared with this table, so codes are unchanged.
+
+        Parameter positions: The lessons to keep
+        Precondition: positions is an int array (or bool mask) of positions in this table
+        """
+        result = LessonTable.__new__(LessonTable)
+        result.__dict__.update(self.__dict__)
+        for name in COLUMNS:
+            setattr(result, name, getattr(self, name)[positions])
+        return result
+
+
+# The names of the array attributes of a LessonTable
+COLUMNS = ('takeoff', 'takeoff_offset', 'landing', 'landing_offset', 'student',
+           'instructor', 'plane', 'filed', 'area')
+
+
+def read_lessons(filename):
+    """
+    Returns the LessonTable for the lessons in the CSV file filename.
+
+    The file is streamed, so only the columns are held in memory.
+
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a file in the format of lessons.csv
+    """
+    return LessonTable(utils.iter_csv(filename))
+
+
+def _codes(names):
+    """
+    Returns a dictionary from each string in names to its position.
+
+    Parameter names: The interned strings
+    Precondition: names is a list of distinct strings
+    """
+    return dict((names[pos], pos) for pos in range(len(names)))
+
+
+def _intern(value, names, codes):
+    """
+    Returns the code for value in names, adding it to the end of names if it is new.
+
+    Parameter value: The string to intern
+    Precondition: value is a string
+
+    Parameter names: The interned strings
+    Precondition: names is a list of distinct strings
+
+    Parameter codes: The code of each string in names
+    Precondition: codes is a dictionary returned by _codes(names), kept up to date
+    """
+    code = codes.get(value)
+    if code is None:
+        code = len(names)
+        names.append(value)
+        codes[value] = code
+    return code
+
+
+def _isoformat(epoch, offset):
+    """
+    Returns the ISO timestamp for the given epoch seconds and UTC offset.
+
+    Parameter epoch: The time
+    Precondition: epoch is an int of seconds since the epoch
+
+    Parameter offset: The UTC offset
+    Precondition: offset is an int of seconds
+    """
+    zone = datetime.timezone(datetime.timedelta(seconds=int(offset)))
+    return datetime.datetime.fromtimestamp(int(epoch), zone).isoformat()
@@ -38,6 +38,7 @@ enforce any of the preconditions in this module.
 Author: Christian M. Fulton
 Date: 18/08/2021
 """
+import datetime
 import utils
 
 
@@ -54,6 +55,154 @@ PILOT_CERTIFIED = 2
 PILOT_50_HOURS  = 3
 
 
+# FLIGHT AREAS
+# The areas that a lesson may be flown in
+AREAS = ('Pattern', 'Practice Area', 'Cross Country')
+# The areas that match 'Local' in the minimums table
+LOCAL_AREAS = ('Pattern', 'Practice Area')
+
+
+# STUDENT COLUMNS (the timestamps in a student row)
+# The time the student joined the school
+JOINED = 3
+# The time of the first solo
+SOLO = 4
+# The time of the private license
+LICENSE = 5
+# The time of the 50 hours certification
+FIFTY_HOURS = 6
+# The time of the instrument rating
+INSTRUMENT = 7
+# The time of the advanced endorsement
+ADVANCED = 8
+# The time of the multiengine endorsement
+MULTIENGINE = 9
+
+
+# The certification earned with each column, from highest to lowest
+_CERTIFICATIONS = ((FIFTY_HOURS, PILOT_50_HOURS), (LICENSE, PILOT_CERTIFIED),
+                   (SOLO, PILOT_STUDENT), (JOINED, PILOT_NOVICE))
+# The (wall clock) time that credential times are counted from in StudentRecord.epochs
+_EPOCH = datetime.datetime(1970, 1, 1)
+# One second, the unit of StudentRecord.epochs
+_SECOND = datetime.timedelta(seconds=1)
+
+
+class StudentRecord(object):
+    """
+    A class representing the credentials of a student, parsed once.
+    
+    The functions in this module are called for every lesson, but a student flies 
+    dozens of lessons in a year.  This class converts the timestamps of a student row
+    once, so that checking a credential at the time of a takeoff is just a comparison
+    of datetime objects.
+    
+    Credential times are calendar dates with no timezone, so they are compared to the
+    local (wall clock) time of a takeoff.
+    
+    Attribute row: A copy of the student row for this record
+    Invariant: row is a 10-element list of strings representing a pilot
+    
+    Attribute times: The credential times, indexed by column
+    Invariant: times is a 10-element list.  The elements at JOINED through MULTIENGINE
+    are datetime objects without a timezone, or None if the column is empty (or not 
+    a valid timestamp).  The first three elements are None.
+    """
+    
+    def __init__(self, student, epochs=None):
+        """
+        Initializes a credential record for the given student.
+        
+        If epochs is not None, the credential times are made from those numbers instead
+        of parsing the timestamps of student (as when the record comes from a cache).
+        
+        Parameter student: The student pilot
+        Precondition: student is 10-element list of strings representing a pilot
+        
+        Parameter epochs: The credential times of student (OPTIONAL)
+        Precondition: epochs is None or a list returned by the method epochs of a 
+        record for the same student
+        """
+        self.row = list(student)
+        self.times = [None]*len(self.row)
+        for pos in range(JOINED, len(self.row)):
+            if epochs is not None:
+                if epochs[pos] is not None:
+                    self.times[pos] = _EPOCH+epochs[pos]*_SECOND
+            elif self.row[pos] != '':
+                time = utils.str_to_time(self.row[pos])
+                if time is not None:
+                    time = time.replace(tzinfo=None)
+                self.times[pos] = time
+    
+    def epochs(self):
+        """
+        Returns the credential times of this record as (wall clock) seconds since the epoch.
+        
+        The result is a list of ints (or None for a missing time), in the same order as
+        the attribute times.  Times are rounded down to the second.
+        """
+        return [None if time is None else (time-_EPOCH)//_SECOND for time in self.times]
+    
+    def has(self, column, takeoff):
+        """
+        Returns True if the student has the credential column at the time of takeoff.
+        
+        Parameter column: The credential to check
+        Precondition: column is one of JOINED, SOLO, LICENSE, FIFTY_HOURS, INSTRUMENT,
+        ADVANCED, or MULTIENGINE
+        
+        Parameter takeoff: The takeoff time of this flight
+        Precondition: takeoff is a datetime object
+        """
+        time = self.times[column]
+        if takeoff.tzinfo is not None:
+            takeoff = takeoff.replace(tzinfo=None)
+        return time is not None and takeoff >= time
+    
+    def certification(self, takeoff):
+        """
+        Returns the certification classification for this student at the time of takeoff.
+        
+        This method has the same behavior as the function get_certification.
+        
+        Parameter takeoff: The takeoff time of this flight
+        Precondition: takeoff is a datetime object
+        """
+        if takeoff.tzinfo is not None:
+            takeoff = takeoff.replace(tzinfo=None)
+        times = self.times
+        for column, cert in _CERTIFICATIONS:
+            if times[column] is not None and takeoff >= times[column]:
+                return cert
+        return PILOT_INVALID
+
+
+# The student records parsed so far, by student id
+_RECORDS = {}
+
+
+def get_record(student):
+    """
+    Returns the StudentRecord for the given student.
+    
+    Records are cached by student id, so each student row is only parsed once.  If a
+    cached record does not match the row (e.g. the row comes from another dataset), 
+    it is replaced.
+    
+    Parameter student: The student pilot
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
+    """
+    if isinstance(student, StudentRecord):
+        return student
+    record = _RECORDS.get(student[0])
+    if record is None or record.row != student:
+        record = StudentRecord(student)
+        _RECORDS[student[0]] = record
+    return record
+
+
 def get_certification(takeoff, student):
     """
     Returns the certification classification for this student at the time of takeoff.
@@ -76,47 +225,10 @@ def get_certification(takeoff, student):
     Precondition: takeoff is a datetime object
     
     Parameter student: The student pilot
-    Precondition: student is 10-element list of strings representing a pilot
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
     """
-    # ELEMENTS: 0 -> SID, 1 -> LName, 2 -> FName, 3 -> Time Joined school,
-    # 4 -> first solo, 5 -> private license, 6 -> 50hr cert, 7 -> instrument rating,
-    # 8 -> advanced endorsement, 9 -> multiengine endorsement
-    loc = None
-    certs = [utils.str_to_time(n) for n in student[3:7] if n != '']
-    for j in certs:
-        if takeoff >= j:
-            loc = certs.index(j)
-    if loc == 0:
-        return PILOT_NOVICE
-    elif loc == 1:
-        return PILOT_STUDENT
-    elif loc == 2:
-        return PILOT_CERTIFIED
-    elif loc == 3:
-        return PILOT_50_HOURS
-    else:
-        return PILOT_INVALID
-"""
-    keys = ['STUDENT_ID', 'LAST_NAME', 'FIRST_NAME', 'PILOT_NOVICE', 'PILOT_STUDENT', 'PILOT_CERTIFIED',
-        'PILOT_50_HOURS', 'INSTRUMENT_RATING', 'ADVANCED_ENDORSEMENT', 'MULTIENGINE']
-    certs = { k:v for (k,v) in zip(keys, rdata)}
-    for c, v in certs.items():
-        if v != '':
-            # try: take c and datetime(v) store in variable
-            try:
-                cleaned[c]=utils.str_to_time(v)
-            except:
-                print('skipped')
-    for cert in keys[-7:]: # only the certs
-        if cert in certs:
-            if certs[cert] != '':
-                ctime = utils.str_to_time(certs[cert])
-                if takeoff < ctime:
-                    cleaned[cert]=ctime
-    res = dict(reversed(list(cleaned.items())))
-    result = list(res.keys())[0]    
-    return result
-"""
+    return get_record(student).certification(takeoff)
 
 
 def has_instrument_rating(takeoff,student):
@@ -137,17 +249,10 @@ def has_instrument_rating(takeoff,student):
     Precondition: takeoff is a datetime object
     
     Parameter student: The student pilot
-    Precondition: student is 10-element list of strings representing a pilot
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
     """
-    # extract instrument_rating indexed(7)
-    instrument_cert = utils.str_to_time(student[7])
-    try:
-        if takeoff >= instrument_cert:
-            return True
-        else:
-            return False
-    except:
-        return False
+    return get_record(student).has(INSTRUMENT, takeoff)
 
 
 def has_advanced_endorsement(takeoff,student):
@@ -166,16 +271,10 @@ def has_advanced_endorsement(takeoff,student):
     Precondition: takeoff is a datetime object
     
     Parameter student: The student pilot
-    Precondition: student is 10-element list of strings representing a pilot
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
     """
-    adv_endorsement = utils.str_to_time(student[8])
-    try:
-        if takeoff >= adv_endorsement:
-            return True
-        else:
-            return False
-    except:
-        return False
+    return get_record(student).has(ADVANCED, takeoff)
 
 
 def has_multiengine_endorsement(takeoff,student):
@@ -194,16 +293,10 @@ def has_multiengine_endorsement(takeoff,student):
     Precondition: takeoff is a datetime object
     
     Parameter student: The student pilot
-    Precondition: student is 10-element list of strings representing a pilot
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
     """
-    multi_engine = utils.str_to_time(student[9])
-    try:
-        if takeoff >= multi_engine:
-            return True
-        else:
-            return False
-    except:
-        return False
+    return get_record(student).has(MULTIENGINE, takeoff)
 
 
 def get_minimums(cert, area, instructed, vfr, daytime, minimums):
@@ -287,143 +380,132 @@ def get_minimums(cert, area, instructed, vfr, daytime, minimums):
     Precondition: daytime is boolean
     
     Parameter minimums: The table of allowed minimums
-    Precondition: minimums is a 2d-list (table) as described above, including header
+    Precondition: minimums is a 2d-list (table) as described above, including header,
+    or a MinimumsTable for such a table
     """
+    if isinstance(minimums, MinimumsTable):
+        return minimums.lookup(cert, area, instructed, vfr, daytime)
+    
     # Find all rows that can apply to this student
     # Find the best values for each column of the row
-    certifications = {
-                    'Student': PILOT_STUDENT,
-                    'Certified': PILOT_CERTIFIED,
-                    '50 Hours': PILOT_50_HOURS,
-                    'Dual': PILOT_50_HOURS+1,
-                    }
-    result = []
-    # This function first searches the table for rows that match the function parameters. 
-    # It is possible for more than one row to be a match.  A row is a match if ALL four 
-    # of the first four columns match.
-    for m in minimums[1:]:
-        check_cert = False
-        check_area = False
-        check_daytime = False
-        check_vfr = False
-
-        # check certification:
-        # check arg == to 'SOMETHING' against minimums row
-        if cert in certifications and cert >= m[index_cert]:
-            check_cert = True
-
-    #
-
-    #If the value 'Student', it is a match if category is PILOT_STUDENT or higher.
-    #If the value is 'Certified, it is a match if category is PILOT_CERTIFIED or higher.
-    #If it is '50 Hours', it is only a match if category is PILOT_50_HOURS. 
-    #The value 'Dual' only matches if instructed is True.
-
-    #! MEASUREMENTS: Ceiling->ft Visibility->miles Wind/Crosswind->miles !
-
-    #Once the function finds the all matching rows, it searches for the most advantageous
-    #values for CEILING, VISIBILITY, WIND, and CROSSWIND. Lower values of CEILING and
-    #VISIBILITY are better.  Higher values for WIND and CROSSWIND are better.  It then
-    #returns this four values as a list of four floats (in the same order they appear)
-    #in the table.
-
-    #Student,VMC,Pattern,Day,2000,5,20,8
-
-""" possibilities:
-    ('Pattern', 'Practice Area', 'Cross Country')
-('Pattern', 'Cross Country', 'Practice Area')
-('Practice Area', 'Pattern', 'Cross Country')
-('Practice Area', 'Cross Country', 'Pattern')
-('Cross Country', 'Pattern', 'Practice Area')
-('Cross Country', 'Practice Area', 'Pattern')
-('Instructor', 'Alone')
-('Alone', 'Instructor')
-('True', 'False')
-('False', 'True')
-('Day', 'Night')
-('Night', 'Day')
-"""
-    index_category, index_conditions, index_area, index_time, index_ceiling,\
-    index_visibility, index_wind, index_crosswind = 0, 1, 2, 3, 4, 5, 6, 7
-    # translate cert string to global var that is assigned to integer value
-    certifications = {'Student': PILOT_STUDENT,
-                    'Certified': PILOT_CERTIFIED,
-                    '50 Hours': PILOT_50_HOURS,
-                    }
-    matching_areas = ['Pattern', 'Any', 'Local', 'Practice Area']
-    t_alts = {'Day': True,
-              'VMC': True,
-             }
-    f_alts = {'Night': False,
-              'IMC': False,
-            }
-
-    res_rows = []
-    check_cert = False
-    for r in minimums[1:]: # iterate through each row in minimums
-        # reset values to check for each iterations:
-        check_area = False
-        check_daytime = False
-        check_vfr = False
-        
-        if r[index_category] in certifications:
-            current_cert = certifications[r[index_category]]
-        elif r[index_category] == 'Dual':
-            if instructed:
-                current_cert = PILOT_INVALID
-            else:
-                current_cert = PILOT_50_HOURS+1
-        if cert >= current_cert and cert != PILOT_50_HOURS:
-            check_cert = True
-        if check_cert:
-            if r[index_area] == 'Cross Country':
-                check_area = area == r[index_area]
-            elif r[index_area] in matching_areas:
-                check_area = any(area == i for i in matching_areas)
-                
-        if check_cert and check_area:
-            if r[index_time] in t_alts and daytime in t_alts.values():
-                check_daytime = True
-            elif r[index_time] in f_alts and daytime in f_alts.values():
-                check_daytime = True
-                
-        if check_cert and check_area and check_daytime:
-            # if vfr: can only fly 'VMC' elif vfr is False: # can fly 'VMC' or 'IMC'
-            if vfr is True:
-                check_cert = r[index_conditions] == 'VMC'
+    result = None
+    for row in minimums[1:]:
+        if _is_match(row, cert, area, instructed, vfr, daytime):
+            values = [float(value) for value in row[4:8]]
+            if result is None:
+                result = values
             else:
-                check_cert = True
-            #if r[index_conditions] in t_alts and vfr in t_alts.values():
-            #    check_vfr = True
-            #elif r[index_conditions] in f_alts and vfr in f_alts.values():
-            #    check_vfr = True
-
-        # if it all matches append res_rows with row
-        if check_cert and check_area and check_daytime and check_vfr:
-            res_rows.append(r)
-    result = []
-    final_result = []
-    for r in res_rows:
-        result.append(r[4:])
-    vals = {0:[],1:[],2:[],3:[]} # dict to organize values
-    # organize the values to compare:
-    for r in result:
-        for i in r:
-            i_index = r.index(i)
-            if i_index in vals:
-                vals[i_index].append(float(i)) # convert to float
-            r[i_index] = 0
-    if len(result) > 0:
-        for v in vals:
-            if v == 0:
-                final_result.append(min(vals[v]))
-            if v == 1:
-                final_result.append(min(vals[v]))
-            if v == 2:
-                final_result.append(max(vals[v]))
-            if v == 3:
-                final_result.append(max(vals[v]))
-    if len(final_result) > 0:
-        return final_result
+                result = [min(result[0], values[0]), min(result[1], values[1]),
+                          max(result[2], values[2]), max(result[3], values[3])]
+    return result
+
+
+def _is_match(row, cert, area, instructed, vfr, daytime):
+    """
+    Returns True if the row of a minimums table applies to the given flight category.
+    
+    See get_minimums for the rules for matching a row.
+    
+    Parameter row: The row of the minimums table
+    Precondition: row is a list of strings, in the format of a minimums table row
+    
+    The other parameters are the same as those of get_minimums.
+    """
+    category, conditions, place, time = row[0], row[1], row[2], row[3]
+    if category == 'Dual':
+        if not instructed:
+            return False
+    elif category == 'Student':
+        if cert < PILOT_STUDENT:
+            return False
+    elif category == 'Certified':
+        if cert < PILOT_CERTIFIED:
+            return False
+    elif category == '50 Hours':
+        if cert != PILOT_50_HOURS:
+            return False
     else:
-        return None
\ No newline at end of file
+        return False
+    
+    if conditions != ('VMC' if vfr else 'IMC'):
+        return False
+    if time != ('Day' if daytime else 'Night'):
+        return False
+    if place == 'Any':
+        return True
+    if place == 'Local':
+        return area in LOCAL_AREAS
+    return place == area
+
+
+class MinimumsTable(object):
+    """
+    A class representing a minimums table compiled for direct lookup.
+    
+    The answer to get_minimums depends only on its first five arguments, and there
+    are very few possible values for those: five certifications, a handful of areas,
+    and three booleans.  This class computes the answer for every combination once,
+    storing them in a flat list so that a lookup is just an index calculation.
+    
+    Attribute table: The original minimums table
+    Invariant: table is a 2d-list (table) as described in get_minimums, including header
+    
+    Attribute areas: The position of each flight area
+    Invariant: areas is a dictionary mapping area names (strings) to ints in the range
+    0..len(areas)-1.  It includes every area in AREAS and every area named in table
+    except 'Any' and 'Local'.
+    
+    Attribute answers: The minimums for every combination of flight category
+    Invariant: answers is a list of length 5*len(areas)*8.  The answer for a category
+    is at the position computed by the method _position.  Each element is either a
+    list of four floats or None, exactly as returned by get_minimums.
+    """
+    
+    def __init__(self, minimums):
+        """
+        Initializes a compiled minimums table for the given table.
+        
+        Parameter minimums: The table of allowed minimums
+        Precondition: minimums is a 2d-list (table) as described in get_minimums, 
+        including header
+        """
+        self.table = minimums
+        self.areas = {}
+        for area in list(AREAS)+[row[2] for row in minimums[1:]]:
+            if area not in self.areas and area != 'Any' and area != 'Local':
+                self.areas[area] = len(self.areas)
+        
+        self.answers = [None]*(5*len(self.areas)*8)
+        for cert in range(PILOT_INVALID, PILOT_50_HOURS+1):
+            for area in self.areas:
+                for instructed in (False, True):
+                    for vfr in (False, True):
+                        for daytime in (False, True):
+                            pos = self._position(cert, self.areas[area], instructed, vfr, daytime)
+                            self.answers[pos] = get_minimums(cert, area, instructed, vfr, daytime,
+                                                             minimums)
+    
+    def _position(self, cert, area, instructed, vfr, daytime):
+        """
+        Returns the position in answers for the given flight category.
+        
+        Parameter area: The position of the flight area
+        Precondition: area is an int in 0..len(self.areas)-1
+        
+        The other parameters are the same as those of get_minimums.
+        """
+        pos = (cert-PILOT_INVALID)*len(self.areas)+area
+        return pos*8+(4 if instructed else 0)+(2 if vfr else 0)+(1 if daytime else 0)
+    
+    def lookup(self, cert, area, instructed, vfr, daytime):
+        """
+        Returns the most advantageous minimums for the given flight category.
+        
+        This method has the same behavior as the function get_minimums.
+        
+        The parameters are the same as those of get_minimums.
+        """
+        if area not in self.areas or cert < PILOT_INVALID or cert > PILOT_50_HOURS:
+            return get_minimums(cert, area, instructed, vfr, daytime, self.table)
+        answer = self.answers[self._position(cert, self.areas[area], instructed, vfr, daytime)]
+        return None if answer is None else list(answer)
@@ -0,0 +1,165 @@
+"""
+Module for locating the files of a dataset directory.
+
+The audit modules name each file of a dataset with a constant, such as DAYCYCLE
+('daycycle.json') in the module violations.  But the datasets are not consistent about
+file names.  For example, KITH-2018 ships its sunrise and sunset times as the file
+'daycycle.csv', even though the contents are JSON.  So this module treats the constants
+as logical names.  The function resolve_file finds the actual file for a logical name,
+and the format of a file is decided by sniffing its contents, never by its extension.
+
+The function read_daycycle reads a daycycle in any of its formats (a JSON dictionary
+or a CSV table) and compiles it into a utils.Daycycle, so every dataset is checked
+through the same arrays of sunrise and sunset times.
+"""
+import os
+import os.path
+import codecs
+import utils
+
+
+# FORMATS
+# A file with JSON contents
+JSON = 'json'
+# A file with CSV contents
+CSV  = 'csv'
+# The number of bytes read to sniff the format of a file
+SNIFF_SIZE = 512
+
+# DAYCYCLE TABLES
+# The columns of a daycycle table (in any order, and in any case)
+DAYCYCLE_COLUMNS = ('DATE', 'SUNRISE', 'SUNSET', 'TIMEZONE')
+
+
+def sniff_format(filename):
+    """
+    Returns the format (JSON or CSV) of the contents of the file filename.
+
+    A file is JSON if its first character (other than whitespace or a byte order mark)
+    starts an object or a list.  Any other file is assumed to be CSV.
+
+    Parameter filename: The file to sniff
+    Precondition: filename is a string, referring to a file that exists
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+    if head.startswith(codecs.BOM_UTF8):
+        head = head[len(codecs.BOM_UTF8):]
+    return JSON if head.lstrip()[:1] in (b'{', b'[') else CSV
+
+
+def get_format(name):
+    """
+    Returns the format (JSON or CSV) expected for the logical file name.
+
+    Parameter name: The logical file name
+    Precondition: name is a string ending in '.json' or '.csv'
+    """
+    return JSON if name.lower().endswith('.json') else CSV
+
+
+def resolve_file(directory, name):
+    """
+    Returns the path of the file in directory for the logical file name.
+
+    If directory has a file with that exact name, that file is used.  Otherwise the
+    candidates are the files with the same base name and any extension (ignoring case),
+    such as 'daycycle.csv' for 'daycycle.json'.  A candidate whose contents have the
+    expected format (see get_format) is preferred, and ties are broken alphabetically.
+
+    If there is no such file, the result is the path for name anyway, so that opening
+    it fails just as it would without this function.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+
+    Parameter name: The logical file name
+    Precondition: name is a string ending in '.json' or '.csv'
+    """
+    path = os.path.join(directory, name)
+    if os.path.isfile(path):
+        return path
+
+    stem = os.path.splitext(name)[0].lower()
+    try:
+        entries = sorted(os.listdir(directory))
+    except OSError:
+        return path
+    candidates = [os.path.join(directory, entry) for entry in entries
+                  if os.path.splitext(entry)[0].lower() == stem]
+    candidates = [entry for entry in candidates if os.path.isfile(entry)]
+    for entry in candidates:
+        if sniff_format(entry) == get_format(name):
+            return entry
+    return candidates[0] if candidates else path
+
+
+def resolve_sources(directory, names):
+    """
+    Returns the list of actual file names in directory for the logical file names.
+
+    The result has one name for each logical name (in the same order), relative to
+    the directory, as found by resolve_file.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a directory
+
+    Parameter names: The logical file names
+    Precondition: names is a list of strings ending in '.json' or '.csv'
+    """
+    return [os.path.basename(resolve_file(directory, name)) for name in names]
+
+
+def read_daycycle(filename):
+    """
+    Returns the compiled daycycle (a utils.Daycycle) for the file filename.
+
+    The file may be a daycycle dictionary in JSON (as described in utils.daytime), or
+    a CSV table with a row for each day (see get_daycycle_dictionary).  The format is
+    sniffed from the contents, so the extension of filename does not matter.
+
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a daycycle file in either format
+    """
+    if sniff_format(filename) == JSON:
+        return utils.Daycycle(utils.read_json(filename))
+    return utils.Daycycle(get_daycycle_dictionary(utils.read_csv(filename)))
+
+
+def get_daycycle_dictionary(table):
+    """
+    Returns the daycycle dictionary for a daycycle table.
+
+    The table has a header with the columns in DAYCYCLE_COLUMNS (in any order and any
+    case), and then a row for each day.  For example
+
+        DATE,SUNRISE,SUNSET,TIMEZONE
+        2017-01-01,07:35,16:44,America/New_York
+
+    The timezone must be the same for every row.  The result is a dictionary in the
+    format described in utils.daytime.  A ValueError is raised if a column is missing,
+    if the table has no days, or if the rows have different timezones.
+
+    Parameter table: The daycycle table
+    Precondition: table is a 2d-list (table) of strings, including the header
+    """
+    header = [column.strip().upper() for column in table[0]]
+    for column in DAYCYCLE_COLUMNS:
+        if column not in header:
+            raise ValueError('daycycle table is missing the column %s' % repr(column))
+    date, sunrise, sunset, zone = [header.index(column) for column in DAYCYCLE_COLUMNS]
+
+    result = {}
+    for row in table[1:]:
+        if not row:
+            continue
+        timezone = row[zone].strip()
+        if result.setdefault('timezone', timezone) != timezone:
+            raise ValueError('daycycle table has the timezones %s and %s' %
+                             (repr(result['timezone']), repr(timezone)))
+        day = row[date].strip()
+        year = result.setdefault(day[:4], {})
+        year[day[5:10]] = {'sunrise': row[sunrise].strip(), 'sunset': row[sunset].strip()}
+    if not result:
+        raise ValueError('daycycle table has no days')
+    return result
@@ -11,6 +11,10 @@ Date:   June 7, 2019
 from .test_all import test as test_all
 from .test_app import test as test_app
 from .test_utils import test as test_utils
+from .test_cache import test as test_cache
+from .test_instrument import test as test_instrument
+from .test_lessons import test as test_lessons
+from .test_resolver import test as test_resolver
 from .test_pilots import test as test_pilots
 from .test_violations import test as test_violations
 from .test_endorsements import test as test_endorsements
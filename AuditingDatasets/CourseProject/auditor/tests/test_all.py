@@ -13,6 +13,10 @@ if __package__ is None or __package__ == '':
     # Access the module if run from __main__.py (Script visibility)
     import test_app
     import test_utils
+    import test_cache
+    import test_instrument
+    import test_lessons
+    import test_resolver
     import test_pilots
     import test_violations
     import test_endorsements
@@ -21,6 +25,10 @@ else:
     # Access the module if run from __init__.py (Packages visibility)
     from . import test_app
     from . import test_utils
+    from . import test_cache
+    from . import test_instrument
+    from . import test_lessons
+    from . import test_resolver
     from . import test_pilots
     from . import test_violations
     from . import test_endorsements
@@ -35,18 +43,22 @@ TEST_EXTENSION_1 = 1
 TEST_EXTENSION_2 = 2
 
 
-def test(level=TEST_BASIC_APP):
+def test(level=TEST_EXTENSION_2):
     """
     Tests all program features up to the given feature level.
     
-    By default, it only checks the required functionality (weather minimums).
-    A different value for level will include the test cases for the two
-    extensions.
+    By default, it checks all of the functionality, including the two extensions
+    (both are implemented).  A lower value for level will skip the test cases for
+    the extensions.
     
     Parameter level: The assignment level constant.
     Precondition: level is one of TEST_BASIC_APP,TEST_EXTENSION_1,TEST_EXTENSION_2
     """
     test_utils.test()
+    test_cache.test()
+    test_instrument.test()
+    test_lessons.test()
+    test_resolver.test()
     test_pilots.test()
     test_violations.test()
     if level >= TEST_EXTENSION_1:
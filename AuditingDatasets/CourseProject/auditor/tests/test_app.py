@@ -17,7 +17,7 @@ TEST_EXTENSION_1 = 1
 TEST_EXTENSION_2 = 2
 
 
-def test_discover_violations(level=TEST_BASIC_APP):
+def test_discover_violations(level=TEST_EXTENSION_2):
     fcn = 'app.discover_violations'
     file = 'scratch.csv'
     printer = Printer()
@@ -137,6 +137,355 @@ def test_discover_violations(level=TEST_BASIC_APP):
     print('  %s passed all tests' % fcn)
 
 
+def test_iter_violations():
+    """
+    Tests that the single pass audit engine finds the same violations as the audits
+    of the individual modules.
+    """
+    fcn = 'app.iter_violations'
+    violations = load_from_path('violations')
+    endorsements = load_from_path('endorsements')
+    inspections = load_from_path('inspections')
+    
+    parent = os.path.split(__file__)[0]
+    results = list(app.iter_violations(app.Dataset(parent)))
+    correct = violations.list_weather_violations(parent)
+    correct += endorsements.list_endorsement_violations(parent)
+    correct += inspections.list_inspection_violations(parent)
+    
+    assert_equals(len(correct),len(results),
+                  '%s(tests) found %d violations, not %d' % (fcn,len(results),len(correct)))
+    for item in correct:
+        assert_true(item in results,'%s(tests) is missing the violation %s' % (fcn,repr(item)))
+    
+    # Each lesson lists its weather violation before its endorsement violation
+    order = {}
+    for item in results:
+        order.setdefault(item[0]+item[3],[]).append(item[-1])
+    for item in violations.list_weather_violations(parent):
+        reasons = order[item[0]+item[3]]
+        assert_equals(item[-1],reasons[0],
+                      '%s(tests) did not list %s first for flight %s' % (fcn,repr(item[-1]),item[3]))
+    
+    # Checking the weather in batches (of any size) or one lesson at a time is the same
+    batch = app.BATCH
+    try:
+        for size in [1,7]:
+            app.BATCH = size
+            found = list(app.iter_violations(app.Dataset(parent)))
+            assert_equals(results,found,'%s(tests) changed with batches of %d lessons' % (fcn,size))
+    finally:
+        app.BATCH = batch
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_dataset():
+    """
+    Tests that a Dataset streams its lessons, and only keeps their inspection violations.
+    """
+    import shutil
+    import tempfile
+    fcn = 'app.Dataset'
+    cache = load_from_path('cache')
+    pilots = load_from_path('pilots')
+    inspections = load_from_path('inspections')
+    
+    parent = os.path.split(__file__)[0]
+    lessons = utils.read_csv(os.path.join(parent,'lessons.csv'))
+    planes = utils.read_csv(os.path.join(parent,'fleet.csv'))
+    repairs = utils.read_csv(os.path.join(parent,'repairs.csv'))
+    correct = inspections.get_inspection_violations(lessons[1:],planes,repairs)
+    
+    # Parsed, saved to the cache, and loaded from the cache
+    for cached in [False,True,True]:
+        dataset = app.Dataset(parent,cached)
+        assert_true(not hasattr(dataset,'lessons'),'%s kept the lessons in memory' % fcn)
+        assert_equals(lessons[0],dataset.header,'%s has the header %s' % (fcn,repr(dataset.header)))
+        assert_equals(correct,dataset.inspections,'%s has the wrong inspection violations' % fcn)
+        assert_equals(lessons[1:],list(dataset.iter_lessons()),
+                      '%s.iter_lessons did not produce the lessons of lessons.csv' % fcn)
+        assert_equals(lessons[1:],list(dataset.iter_lessons()),
+                      '%s.iter_lessons did not start again at the first lesson' % fcn)
+    
+        takeoffs = [dataset.get_takeoff(pos).isoformat() for pos in range(len(lessons)-1)]
+        assert_equals([lesson[3] for lesson in lessons[1:]],takeoffs,
+                      '%s has the wrong takeoff times' % fcn)
+        students = utils.read_csv(os.path.join(parent,'students.csv'))
+        for row in students[1:]:
+            assert_equals(row,dataset.records[row[0]].row,'%s has the wrong record for %s' % (fcn,row[0]))
+            assert_equals(pilots.StudentRecord(row).times,dataset.records[row[0]].times,
+                          '%s has the wrong credential times for %s' % (fcn,row[0]))
+    
+    tables = cache.load_cache(parent,app.resolver.resolve_sources(parent,app.TABLE_SOURCES))
+    assert_true(tables is not None,'%s did not save the cache' % fcn)
+    assert_true('header' not in tables and 'inspections' not in tables,
+                '%s saved the lesson data with the tables' % fcn)
+    assert_equals(pilots.StudentRecord(students[1]).epochs(),tables['records'][students[1][0]],
+                  '%s did not save the credential times as numbers' % fcn)
+    sources = app.resolver.resolve_sources(parent,app.LESSON_SOURCES)
+    tables = cache.load_cache(parent,sources,cache.LESSON_CACHE)
+    assert_true(tables is not None,'%s did not save the lesson cache' % fcn)
+    assert_true('lessons' not in tables,'%s saved the lessons to the cache' % fcn)
+    assert_equals(len(lessons)-1,len(tables['takeoffs']),'%s did not save the takeoff times' % fcn)
+    
+    # Appending lessons only invalidates the lesson cache
+    folder = tempfile.mkdtemp()
+    try:
+        for name in app.SOURCES:
+            shutil.copy(os.path.join(parent,name),os.path.join(folder,name))
+        utils.write_csv(lessons[:11],os.path.join(folder,'lessons.csv'))
+        app.Dataset(folder)
+        utils.write_csv(lessons,os.path.join(folder,'lessons.csv'))
+        sources = app.resolver.resolve_sources(folder,app.TABLE_SOURCES)
+        assert_true(cache.load_cache(folder,sources) is not None,
+                    '%s tables cache was not current after adding lessons' % fcn)
+        sources = app.resolver.resolve_sources(folder,app.LESSON_SOURCES)
+        assert_equals(None,cache.load_cache(folder,sources,cache.LESSON_CACHE),
+                      '%s lesson cache was still current after adding lessons' % fcn)
+        dataset = app.Dataset(folder)
+        assert_equals(correct,dataset.inspections,'%s has the wrong inspection violations' % fcn)
+    finally:
+        shutil.rmtree(folder)
+    
+    # The sweep without NumPy has the same results
+    columns = app.LessonTable
+    try:
+        app.LessonTable = None
+        dataset = app.Dataset(parent,False)
+        assert_equals(correct,dataset.inspections,'%s has the wrong inspection violations without NumPy' % fcn)
+        assert_equals(takeoffs,[dataset.get_takeoff(pos).isoformat() for pos in range(len(lessons)-1)],
+                      '%s has the wrong takeoff times without NumPy' % fcn)
+    finally:
+        app.LessonTable = columns
+    
+    # Lessons to audit replace those of lessons.csv
+    dataset = app.Dataset(parent,lessons=lessons[:11])
+    assert_equals(lessons[1:11],list(dataset.iter_lessons()),
+                  '%s.iter_lessons did not produce the lessons given' % fcn)
+    assert_equals(inspections.get_inspection_violations(lessons[1:11],planes,repairs),dataset.inspections,
+                  '%s has the wrong inspection violations for the lessons given' % fcn)
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_profile():
+    """
+    Tests that profiling an audit counts the timestamps parsed and the minimums matched.
+    """
+    fcn = 'app.Dataset'
+    instrument = app.instrument
+    parent = os.path.split(__file__)[0]
+    lessons = utils.read_csv(os.path.join(parent,'lessons.csv'))[1:]
+    repairs = utils.read_csv(os.path.join(parent,'repairs.csv'))[1:]
+    
+    outer = instrument.stop()
+    try:
+        # Parsed (and saved to the cache), then loaded from the cache
+        profiles = []
+        for cached in [False,True,True]:
+            profile = instrument.start()
+            try:
+                list(app.iter_violations(app.Dataset(parent,cached)))
+            finally:
+                instrument.stop()
+            profiles.append(profile.counters)
+    finally:
+        if outer is not None:
+            instrument.start(outer)
+    
+    parsed, loaded = profiles[0], profiles[2]
+    weather = len(app.Dataset(parent).weather)
+    for counters in profiles:
+        assert_equals(len(lessons),counters.get('minimums'),
+                      '%s counted %s minimums for %d lessons' % (fcn,counters.get('minimums'),len(lessons)))
+    # Every lesson and repair has two times, and every weather report has one
+    least = 2*len(lessons)+2*len(repairs)+weather
+    assert_true(parsed.get('str_to_time',0) >= least,
+                '%s counted %s timestamps parsed, not at least %d' % (fcn,parsed.get('str_to_time'),least))
+    assert_equals(0,loaded.get('str_to_time',0),
+                  '%s counted %s timestamps parsed from the cache' % (fcn,loaded.get('str_to_time')))
+    assert_equals(2,loaded.get('cache.hit'),'%s did not count the cache hits' % fcn)
+    
+    print('  %s passed all profiling tests' % fcn)
+
+
+def test_discover_all_violations():
+    """
+    Tests that auditing several datasets in parallel matches auditing them one at a time.
+    """
+    import shutil
+    import tempfile
+    fcn = 'app.discover_all_violations'
+    printer = Printer()
+    app.print = printer.print
+    
+    parent = os.path.split(__file__)[0]
+    folder = tempfile.mkdtemp()
+    try:
+        correct = os.path.join(folder,'correct.csv')
+        app.discover_violations(parent,correct)
+        expect = printer.printed[0].strip()
+        printer.reset()
+        
+        # Workers find audit_dataset by module name, so register this copy of app
+        import sys
+        previous = sys.modules.get('app')
+        sys.modules['app'] = app
+        try:
+            # The same dataset twice must get two different output files
+            app.discover_all_violations([parent,parent],folder,2)
+        finally:
+            if previous is None:
+                del sys.modules['app']
+            else:
+                sys.modules['app'] = previous
+        name = os.path.basename(os.path.normpath(parent))
+        assert_equals(2,len(printer.printed),'%s did not print a line for each dataset' % fcn)
+        for line in printer.printed:
+            assert_true(line.strip().endswith(expect),'%s printed %s, not %s' % (fcn,repr(line),repr(expect)))
+        printer.reset()
+        
+        for output in [name+'.csv',name+'-2.csv']:
+            fpath = os.path.join(folder,output)
+            assert_true(os.path.exists(fpath),'%s did not create the file %s' % (fcn,repr(output)))
+            assert_equals(utils.read_csv(correct),utils.read_csv(fpath),
+                          '%s wrote %s differently from discover_violations' % (fcn,repr(output)))
+        
+        summary = utils.read_csv(os.path.join(folder,app.SUMMARY))
+        assert_equals(3,len(summary),'%s did not summarize each dataset' % fcn)
+        total = str(len(utils.read_csv(correct))-1)
+        for row in summary[1:]:
+            assert_equals(total,row[2],'%s summarized %s violations, not %s' % (fcn,row[2],total))
+    finally:
+        shutil.rmtree(folder)
+    
+    app.print = print
+    print('  %s passed all tests' % fcn)
+
+
+def test_audit_incremental():
+    """
+    Tests that auditing lessons as they are appended matches auditing them all at once.
+    """
+    import csv
+    import json
+    import pickle
+    import shutil
+    import tempfile
+    fcn = 'app.audit_incremental'
+    checkpoint = app.checkpoint
+    
+    parent = os.path.split(__file__)[0]
+    folder = tempfile.mkdtemp()
+    try:
+        # A copy of the dataset, with the lessons in order of takeoff
+        dataset = os.path.join(folder,'dataset')
+        os.mkdir(dataset)
+        for name in app.SOURCES:
+            shutil.copy(os.path.join(parent,name),os.path.join(dataset,name))
+        fpath = os.path.join(dataset,'lessons.csv')
+        lessons = utils.read_csv(fpath)
+        header, lessons = lessons[0], sorted(lessons[1:],key=lambda l: utils.str_to_time(l[3]))
+        utils.write_csv([header]+lessons,fpath)
+        
+        correct = os.path.join(folder,'correct.csv')
+        expect = app.audit_dataset(dataset,correct)
+        
+        # Audit the lessons a few days at a time
+        output = os.path.join(folder,'output.csv')
+        utils.write_csv([header]+lessons[:len(lessons)//3],fpath)
+        app.audit_incremental(dataset,output)
+        for chunk in [lessons[len(lessons)//3:len(lessons)//2],lessons[len(lessons)//2:]]:
+            with open(fpath,'a',newline='') as file:
+                wrap = csv.writer(file)
+                for lesson in chunk:
+                    wrap.writerow(lesson)
+            counts = app.audit_incremental(dataset,output)
+        
+        assert_equals(expect,counts,'%s did not count the same violations as audit_dataset' % fcn)
+        assert_equals(utils.read_csv(correct),utils.read_csv(output),
+                      '%s wrote the violations differently from audit_dataset' % fcn)
+        assert_true(os.path.exists(output+'.checkpoint'),'%s did not save a checkpoint' % fcn)
+        
+        # Nothing new is a no-op
+        assert_equals(expect,app.audit_incremental(dataset,output),
+                      '%s changed the counts when there were no new lessons' % fcn)
+        assert_equals(utils.read_csv(correct),utils.read_csv(output),
+                      '%s changed the output when there were no new lessons' % fcn)
+        
+        # A row that is still being written is left for the next audit
+        with open(fpath,'rb') as file:
+            contents = file.read()
+        torn = contents.rstrip(b'\r\n').rfind(b'\n')+1
+        cut = contents.rindex(b',')+5
+        with open(fpath,'wb') as file:
+            file.write(contents[:cut])
+        counts = app.audit_incremental(dataset,output)
+        assert_equals(torn,checkpoint.load_checkpoint(output)['offset'],
+                      '%s audited a row that was still being written' % fcn)
+        with open(fpath,'wb') as file:
+            file.write(contents)
+        assert_equals(expect,app.audit_incremental(dataset,output),
+                      '%s did not count the same violations after a torn row' % fcn)
+        assert_equals(utils.read_csv(correct),utils.read_csv(output),
+                      '%s wrote the violations differently after a torn row' % fcn)
+        
+        # A complete row with the wrong number of fields is an error
+        with open(fpath,'ab') as file:
+            file.write(b'S00001,,\r\n')
+        try:
+            app.audit_incremental(dataset,output)
+            assert_true(False,'%s did not reject a row with 3 fields' % fcn)
+        except ValueError:
+            pass
+        with open(fpath,'wb') as file:
+            file.write(contents)
+        
+        # A lessons file that was changed (not appended to) is audited from scratch
+        utils.write_csv([header]+lessons[:10],fpath)
+        counts = app.audit_incremental(dataset,output)
+        assert_equals(sum(counts.values()),len(utils.read_csv(output))-1,
+                      '%s did not audit a changed lessons file from scratch' % fcn)
+        
+        # The checkpoint is JSON, and a pickled checkpoint is never unpickled
+        with open(output+'.checkpoint','rb') as file:
+            assert_equals(checkpoint.MAGIC,file.read(len(checkpoint.MAGIC)),'%s wrote the wrong checkpoint' % fcn)
+            state = json.loads(file.read().decode('utf-8'))['state']
+        assert_equals(state,checkpoint.load_checkpoint(output),'%s did not load the checkpoint' % fcn)
+        marker = os.path.join(folder,'unpickled')
+        class Unpickled(object):
+            def __reduce__(self):
+                return (os.mkdir,(marker,))
+        with open(output+'.checkpoint','wb') as file:
+            file.write(checkpoint.MAGIC+pickle.dumps((checkpoint.VERSION,Unpickled())))
+        assert_equals(None,checkpoint.load_checkpoint(output),'%s did not ignore a pickled checkpoint' % fcn)
+        assert_true(not os.path.exists(marker),'%s unpickled the checkpoint' % fcn)
+    finally:
+        shutil.rmtree(folder)
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_parse_options():
+    """
+    Tests the function parse_options (used for the command line options).
+    """
+    fcn = 'app.parse_options'
+    tests = [(['input.csv'],(['input.csv'],{})),
+             (['--batch','a','b'],(['a','b'],{'--batch':True})),
+             (['a','--jobs','4','b','--batch','--output','out'],
+              (['a','b'],{'--batch':True,'--jobs':'4','--output':'out'})),
+             (['--test'],(['--test'],{})),
+             (['--batch','a','--jobs'],None),
+             (['--batch','a','--batch'],None)]
+    for test in tests:
+        answr = app.parse_options(test[0])
+        assert_equals(test[1],answr,'%s(%s) returned %s, not %s' % (fcn,test[0],repr(answr),repr(test[1])))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def check_execute_error(lines,value):
     correct = 'Usage: python auditor dataset [output.csv]'
     if len(lines) == 0:
@@ -238,13 +587,36 @@ def test_execute():
         quit_with_error("app.execute(%s) did not call 'discover_violations'" % repr(value))
     printer.reset()
     
+    # The profile report goes to stderr, so a piped audit does not break on it
+    import sys
+    import tempfile
+    folder = tempfile.mkdtemp()
+    files = []
+    app.print = lambda *objects, **kwargs: files.append(kwargs.get('file'))
+    try:
+        value = ['input.csv','--profile-out',os.path.join(folder,'stats.prof')]
+        app.execute(value)
+    finally:
+        app.print = printer.print
+        os.remove(value[-1])
+        os.rmdir(folder)
+    if files != [sys.stderr]:
+        quit_with_error("app.execute(%s) did not print the report to stderr" % repr(value))
+    printer.reset()
+    
     print('  %s passed all tests' % fcn)
 
 
-def test(level=TEST_BASIC_APP):
+def test(level=TEST_EXTENSION_2):
     """
     Performs all tests on the module app.
     """
     print('Testing module app (this may take a while)')
     test_discover_violations(level)
+    test_iter_violations()
+    test_dataset()
+    test_profile()
+    test_discover_all_violations()
+    test_audit_incremental()
+    test_parse_options()
     test_execute()
@@ -0,0 +1,184 @@
+"""
+Test procedures for the compiled dataset cache.
+
+These tests copy files from the same directory as this file into a temporary
+directory, and cache them there.
+"""
+
+import os
+import os.path
+import json
+import pickle
+import shutil
+import tempfile
+# See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
+if __package__ is None or __package__ == '':
+    # Access the module if run from __main__.py (Script visibility)
+    from support import *
+else:
+    # Access the module if run from __init__.py (Packages visibility)
+    from .support import *
+
+
+# Load the cache module
+utils = load_from_path('utils')
+cache = load_from_path('cache')
+
+# The files to cache
+SOURCES = ['file1.csv','file3.json']
+
+
+class Unpickled(object):
+    """
+    An object that creates the folder path when it is unpickled.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes an object for the folder path.
+        """
+        self.path = path
+
+    def __reduce__(self):
+        """
+        Returns the instructions to unpickle this object (which make the folder).
+        """
+        return (os.mkdir,(self.path,))
+
+
+def make_dataset():
+    """
+    Returns a temporary directory with copies of the SOURCES files
+    """
+    parent = os.path.split(__file__)[0]
+    folder = tempfile.mkdtemp()
+    for name in SOURCES:
+        shutil.copy(os.path.join(parent,name),os.path.join(folder,name))
+    return folder
+
+
+def test_load_cache():
+    """
+    Tests the functions save_cache and load_cache
+    """
+    fcn = 'cache.load_cache'
+
+    folder = make_dataset()
+    try:
+        assert_equals(None,cache.load_cache(folder,SOURCES),
+                      '%s did not return None when there is no cache' % fcn)
+
+        tables = {'table':utils.read_csv(os.path.join(folder,'file1.csv')),
+                  'weather':utils.read_json(os.path.join(folder,'file3.json'))}
+        assert_true(cache.save_cache(folder,cache.get_stamps(folder,SOURCES),tables),'cache.save_cache did not save the cache')
+        assert_true(os.path.exists(os.path.join(folder,cache.CACHE)),'cache.save_cache did not create %s' % cache.CACHE)
+        assert_equals(tables,cache.load_cache(folder,SOURCES),
+                      '%s did not return the saved tables' % fcn)
+
+        # The cache is JSON (after the magic bytes)
+        with open(os.path.join(folder,cache.CACHE),'rb') as f:
+            contents = f.read()
+        assert_true(contents.startswith(cache.MAGIC),'cache.save_cache did not start the cache with MAGIC')
+        data = json.loads(contents[len(cache.MAGIC):].decode('utf-8'))
+        assert_equals(tables,data['tables'],'cache.save_cache did not save the tables as JSON')
+
+        # A different list of sources is a different cache
+        assert_equals(None,cache.load_cache(folder,SOURCES[:1]),
+                      '%s used a cache made from other files' % fcn)
+
+        # A cache from another version is ignored
+        version = cache.VERSION
+        try:
+            cache.VERSION = version+1
+            assert_equals(None,cache.load_cache(folder,SOURCES),
+                          '%s used a cache from another version' % fcn)
+        finally:
+            cache.VERSION = version
+
+        # The lesson cache is a separate file
+        assert_equals(None,cache.load_cache(folder,SOURCES,cache.LESSON_CACHE),
+                      '%s did not return None when there is no lesson cache' % fcn)
+        lessons = {'takeoffs':[1483365600,1483369200]}
+        assert_true(cache.save_cache(folder,cache.get_stamps(folder,SOURCES),lessons,cache.LESSON_CACHE),
+                    'cache.save_cache did not save the lesson cache')
+        assert_equals(lessons,cache.load_cache(folder,SOURCES,cache.LESSON_CACHE),
+                      '%s did not return the saved lesson data' % fcn)
+        assert_equals(tables,cache.load_cache(folder,SOURCES),
+                      '%s did not keep the tables apart from the lesson data' % fcn)
+
+        cache.clear_cache(folder)
+        for name in [cache.CACHE,cache.LESSON_CACHE]:
+            assert_true(not os.path.exists(os.path.join(folder,name)),'cache.clear_cache did not remove %s' % name)
+    finally:
+        shutil.rmtree(folder)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_invalidation():
+    """
+    Tests that load_cache notices when the source files change
+    """
+    fcn = 'cache.load_cache'
+
+    folder = make_dataset()
+    try:
+        fpath = os.path.join(folder,'file1.csv')
+        tables = {'table':utils.read_csv(fpath)}
+        cache.save_cache(folder,cache.get_stamps(folder,SOURCES),tables)
+
+        # Touching a file does not change its contents
+        info = os.stat(fpath)
+        os.utime(fpath,ns=(info.st_atime_ns,info.st_mtime_ns+10**9))
+        assert_equals(tables,cache.load_cache(folder,SOURCES),
+                      '%s invalidated the cache for a file that was only touched' % fcn)
+
+        # Changing a file with the same size and time must still invalidate it
+        with open(fpath,'rb') as f:
+            contents = f.read()
+        with open(fpath,'wb') as f:
+            f.write(contents.replace(b'S00309',b'S00310'))
+        os.utime(fpath,ns=(info.st_atime_ns,info.st_mtime_ns+2*10**9))
+        assert_equals(None,cache.load_cache(folder,SOURCES),
+                      '%s used the cache after a file changed' % fcn)
+
+        # A file that changes after it is stamped (e.g. while it is parsed) invalidates it
+        stamps = cache.get_stamps(folder,SOURCES)
+        with open(fpath,'ab') as f:
+            f.write(b'S00311,Ann,Other,2016-01-01,,,,,,\n')
+        cache.save_cache(folder,stamps,tables)
+        assert_equals(None,cache.load_cache(folder,SOURCES),
+                      '%s used a cache for a file that changed while it was parsed' % fcn)
+
+        # Removing a file invalidates it
+        cache.save_cache(folder,cache.get_stamps(folder,SOURCES),tables)
+        os.remove(os.path.join(folder,'file3.json'))
+        assert_equals(None,cache.load_cache(folder,SOURCES),
+                      '%s used the cache after a file was removed' % fcn)
+
+        # A damaged cache is ignored
+        with open(os.path.join(folder,cache.CACHE),'wb') as f:
+            f.write(cache.MAGIC+b'garbage')
+        assert_equals(None,cache.load_cache(folder,SOURCES[:1]),
+                      '%s did not ignore a damaged cache' % fcn)
+
+        # A pickled cache is ignored, and is never unpickled (which could run code)
+        marker = os.path.join(folder,'unpickled')
+        with open(os.path.join(folder,cache.CACHE),'wb') as f:
+            f.write(cache.MAGIC+pickle.dumps(Unpickled(marker)))
+        assert_equals(None,cache.load_cache(folder,SOURCES[:1]),
+                      '%s did not ignore a pickled cache' % fcn)
+        assert_true(not os.path.exists(marker),'%s unpickled the cache' % fcn)
+    finally:
+        shutil.rmtree(folder)
+
+    print('  %s passed all tests for invalidation' % fcn)
+
+
+def test():
+    """
+    Performs all tests on the module cache.
+    """
+    print('Testing module cache')
+    test_load_cache()
+    test_invalidation()
@@ -9,6 +9,7 @@ else:
 # Load the utils module
 utils = load_from_path('utils')
 inspections = load_from_path('inspections')
+columnar = load_from_path('lessons')
 
 
 def build_hours():
@@ -248,6 +249,123 @@ def false_positive(flight,hourset):
     return message
 
 
+def brute_force_violations(lessons,planes,repairs):
+    """
+    Returns the list of inspection violations for each lesson, computed the slow way.
+    
+    This is a reference for inspections.get_inspection_violations.  For every lesson,
+    it loops over all of the repairs and all of the other lessons to find the annual,
+    the hours and whether the plane is in the shop.  It is far too slow for the app,
+    but it is easy to check by hand.
+    
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons WITHOUT the header
+    
+    Parameter planes: The planes in the flight school
+    Precondition: planes is a 2d-list (table) in the format of fleet.csv
+    
+    Parameter repairs: The repairs made to the planes
+    Precondition: repairs is a 2d-list (table) in the format of repairs.csv
+    """
+    local = lambda x: utils.str_to_time(x).replace(tzinfo=None)
+    times = [(local(item[3]),local(item[4])) for item in lessons]
+    shop  = [(item[0],local(item[1]),local(item[2]),item[3]) for item in repairs[1:]]
+    
+    # Only the lessons with the same plane matter (this is still a nested loop)
+    same = {}
+    for pos in range(len(lessons)):
+        same.setdefault(lessons[pos][1],[]).append(pos)
+    result = []
+    for pos in range(len(lessons)):
+        tailno = lessons[pos][1]
+        takeoff, landing = times[pos]
+        
+        fleet = [item for item in planes[1:] if item[0] == tailno]
+        if len(fleet) == 0:
+            result.append('')
+            continue
+        annual = local(fleet[0][5])
+        hours  = float(fleet[0][6])
+        
+        reset = None
+        grounded = False
+        for item in shop:
+            if item[0] == tailno and item[1] <= takeoff:
+                if reset is None or reset < item[1]:
+                    reset = item[1]
+                if item[3] == 'annual inspection' and annual < item[1]:
+                    annual = item[1]
+                if takeoff < item[2]:
+                    grounded = True
+        
+        if reset is not None:
+            hours = 0
+        for other in same[tailno]:
+            start, stop = times[other]
+            if start < takeoff and (reset is None or reset <= start):
+                hours += (stop-start).total_seconds()/(60*60)
+        hours += (landing-takeoff).total_seconds()/(60*60)
+        
+        found = []
+        if (takeoff-annual).days > 365:
+            found.append('Annual')
+        if hours > 100:
+            found.append('Inspection')
+        if grounded:
+            found.append('Grounded')
+        result.append('' if len(found) == 0 else found[0] if len(found) == 1 else 'Maintenance')
+    return result
+
+
+def test_get_inspection_violations():
+    """
+    Tests the function get_inspection_violations against the brute force reference
+    """
+    import random
+    fcn = 'inspections.get_inspection_violations'
+    
+    parent = os.path.split(__file__)[0]
+    table   = utils.read_csv(os.path.join(parent,'lessons.csv'))
+    header  = table[0]
+    lessons = table[1:]
+    planes  = utils.read_csv(os.path.join(parent,'fleet.csv'))
+    repairs = utils.read_csv(os.path.join(parent,'repairs.csv'))
+    
+    # The sweep must not depend on the order of the files
+    rng = random.Random(2017)
+    shuffled = lessons[:]
+    rng.shuffle(shuffled)
+    mixed = repairs[:1]+rng.sample(repairs[1:],len(repairs)-1)
+    
+    # Bring one plane close to its limits (ties, an inspection on the same day as a flight)
+    extra = [['S00000','133CZ','I003','2017-01-05T00:00:00-05:00','2017-01-05T02:00:00-05:00','VFR','Pattern'],
+             ['S00001','133CZ','I003','2017-01-05T00:00:00-05:00','2017-01-05T01:00:00-05:00','VFR','Pattern'],
+             ['S00002','811AX','',    '2017-01-21T22:00:00-05:00','2017-01-23T01:00:00-05:00','VFR','Pattern']]
+    
+    for data in [(lessons,repairs),(shuffled,mixed),(lessons+extra,repairs)]:
+        answr = inspections.get_inspection_violations(data[0],planes,data[1])
+        expct = brute_force_violations(data[0],planes,data[1])
+        for pos in range(len(expct)):
+            item = data[0][pos]
+            message = '%s identified flight %s for plane %s as %s, not %s'
+            assert_equals(expct[pos],answr[pos],
+                          message % (fcn,item[3],item[1],repr(answr[pos]),repr(expct[pos])))
+        
+        # The columnar sweep must agree with the list sweep
+        columns = inspections.get_inspection_violations(columnar.LessonTable([header]+data[0]),planes,data[1])
+        for pos in range(len(expct)):
+            item = data[0][pos]
+            message = '%s identified flight %s for plane %s in a LessonTable as %s, not %s'
+            assert_equals(expct[pos],columns[pos],
+                          message % (fcn,item[3],item[1],repr(columns[pos]),repr(expct[pos])))
+        
+        # The lessons may be streamed
+        stream = inspections.get_inspection_violations(iter(data[0]),planes,data[1])
+        assert_equals(answr,stream,'%s gave different answers for an iterator over the lessons' % fcn)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_list_inspection_violations():
     """
     Tests the function list_inspection_violations
@@ -305,4 +423,5 @@ def test():
     Performs all tests on the module endorsements.
     """
     print('Testing module inspections')
+    test_get_inspection_violations()
     test_list_inspection_violations()
@@ -0,0 +1,206 @@
+"""
+Test procedures for profiling an audit.
+
+Profiling is global to a process, so these tests set aside any profile that is already
+running (as with 'python auditor --test --profile') and restore it when they are done.
+"""
+
+import os
+import os.path
+import json
+import tempfile
+# See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
+if __package__ is None or __package__ == '':
+    # Access the module if run from __main__.py (Script visibility)
+    from support import *
+else:
+    # Access the module if run from __init__.py (Packages visibility)
+    from .support import *
+
+
+# Load the instrument module, and the utils module to profile
+instrument = load_from_path('instrument')
+utils = load_from_path('utils')
+
+
+def test_profile():
+    """
+    Tests the class Profile
+    """
+    fcn = 'instrument.Profile'
+
+    profile = instrument.Profile()
+    profile.add_time('load',1.5)
+    profile.add_time('load.weather',0.5)
+    profile.add_time('audit',2.0)
+    profile.add_time('audit',2.0)
+    profile.add_count('lessons',100)
+    profile.add_count('lessons',100)
+    profile.add_count('weather.exact')
+
+    assert_equals(4.0,profile.stages['audit'],'%s did not add the times of a stage' % fcn)
+    assert_equals(2,profile.calls['audit'],'%s did not count the calls of a stage' % fcn)
+    assert_equals(200,profile.counters['lessons'],'%s did not add to a counter' % fcn)
+    assert_equals({'lessons/sec':50.0},profile.rates(),'%s has the wrong rates' % fcn)
+
+    data = profile.to_dict()
+    assert_equals({'seconds':1.5,'calls':1},data['stages']['load'],'%s.to_dict has the wrong stage' % fcn)
+    assert_equals({'lessons':200,'weather.exact':1},data['counters'],'%s.to_dict has the wrong counters' % fcn)
+
+    # Nested stages are indented under their parent
+    lines = profile.summary().split('\n')
+    names = [line[:9].rstrip() for line in lines[1:4]]
+    assert_equals(['audit','load','  weather'],names,'%s.summary has the stages %s' % (fcn,names))
+    assert_true('lessons/sec' in lines[-1],'%s.summary is missing the rates' % fcn)
+
+    folder = tempfile.mkdtemp()
+    try:
+        fpath = os.path.join(folder,'profile.json')
+        profile.save(fpath)
+        with open(fpath) as f:
+            found = json.load(f)
+        assert_equals(data,found,'%s.save wrote %s' % (fcn,repr(found)))
+    finally:
+        os.remove(fpath)
+        os.rmdir(folder)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_stage():
+    """
+    Tests the functions start, stop, stage, count and the hooks
+    """
+    fcn = 'instrument.stage'
+    outer = instrument.stop()
+    try:
+        check_stage(fcn)
+    finally:
+        if outer is not None:
+            instrument.start(outer)
+
+    print('  %s passed all tests' % fcn)
+
+
+def check_stage(fcn):
+    """
+    Performs the tests of test_stage (with profiling off when it starts).
+
+    Parameter fcn: The name of the function tested
+    Precondition: fcn is a string
+    """
+    # Nothing is recorded when profiling is off
+    assert_true(not instrument.is_active(),'instrument is active before start')
+    instrument.count('lessons')
+    with instrument.stage('load'):
+        pass
+
+    heard = []
+    hook = lambda name, secs: heard.append(name)
+    profile = instrument.start()
+    try:
+        assert_true(instrument.is_active(),'instrument is not active after start')
+        with instrument.stage('load'):
+            with instrument.stage('load.weather'):
+                instrument.count('lessons')
+        instrument.add_hook(hook)
+        try:
+            with instrument.stage('audit'):
+                raise ValueError()
+        except ValueError:
+            pass
+        finally:
+            instrument.remove_hook(hook)
+        with instrument.stage('write'):
+            pass
+    finally:
+        result = instrument.stop()
+
+    assert_true(result is profile,'instrument.stop did not return the profile from start')
+    assert_true(not instrument.is_active(),'instrument is active after stop')
+    assert_equals(['load.weather','load','audit','write'],list(profile.stages),
+                  '%s recorded the stages %s' % (fcn,list(profile.stages)))
+    assert_true(profile.stages['load'] >= profile.stages['load.weather'],'%s timed a nested stage wrong' % fcn)
+    assert_equals({'lessons':1},profile.counters,'%s counted %s' % (fcn,profile.counters))
+    assert_equals(['audit'],heard,'the hook heard the stages %s' % heard)
+
+    # Hooks are called even when profiling is off
+    instrument.add_hook(hook)
+    try:
+        with instrument.stage('load'):
+            pass
+    finally:
+        instrument.remove_hook(hook)
+    assert_equals(['audit','load'],heard,'the hook heard the stages %s' % heard)
+
+
+def test_count_calls():
+    """
+    Tests the function count_calls
+    """
+    fcn = 'instrument.count_calls'
+    outer = instrument.stop()
+    try:
+        original = utils.str_to_time
+        instrument.count_calls(utils,'str_to_time')
+        instrument.count_calls(utils,'str_to_time')
+        assert_true(utils.str_to_time is original,'%s replaced the function when profiling is off' % fcn)
+
+        profile = instrument.start()
+        try:
+            utils.str_to_time('2017-01-01T09:00:00-05:00')
+            utils.str_to_time('2017-01-01 09:00')
+        finally:
+            instrument.stop()
+        assert_equals({'str_to_time':2},profile.counters,'%s counted %s' % (fcn,profile.counters))
+        assert_true(utils.str_to_time is original,'%s did not restore the function after stop' % fcn)
+    finally:
+        if outer is not None:
+            instrument.start(outer)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_profile_call():
+    """
+    Tests the functions profile_call and get_report
+    """
+    fcn = 'instrument.profile_call'
+
+    folder = tempfile.mkdtemp()
+    fpath = os.path.join(folder,'stats.prof')
+    try:
+        stamps = ['2017-01-0%dT09:00:00' % day for day in range(1,8)]
+        found = instrument.profile_call(fpath,list,map(utils.str_to_time,stamps))
+        assert_equals(7,len(found),'%s did not return the result of the function' % fcn)
+        assert_true(os.path.isfile(fpath),'%s did not save the statistics' % fcn)
+
+        report = instrument.get_report(fpath,5)
+        assert_true('str_to_time' in report,'instrument.get_report is missing str_to_time')
+        assert_true('due to restriction <5>' in report,'instrument.get_report did not limit the functions')
+
+        # The statistics are saved when the function crashes
+        os.remove(fpath)
+        try:
+            instrument.profile_call(fpath,utils.read_csv,os.path.join(folder,'missing.csv'))
+            quit_with_error('%s did not raise the error of the function' % fcn)
+        except FileNotFoundError:
+            pass
+        assert_true(os.path.isfile(fpath),'%s did not save the statistics of a crash' % fcn)
+    finally:
+        if os.path.exists(fpath):
+            os.remove(fpath)
+        os.rmdir(folder)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test():
+    """
+    Performs all tests on the module instrument.
+    """
+    print('Testing module instrument')
+    test_profile()
+    test_stage()
+    test_count_calls()
+    test_profile_call()
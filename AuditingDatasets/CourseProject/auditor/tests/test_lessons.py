@@ -0,0 +1,119 @@
+"""
+Test procedures for the columnar lesson table.
+
+These tests read lessons.csv (and the pilot tables) from the same directory as
+this file.
+"""
+
+import os.path
+# See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
+if __package__ is None or __package__ == '':
+    # Access the module if run from __main__.py (Script visibility)
+    from support import *
+else:
+    # Access the module if run from __init__.py (Packages visibility)
+    from .support import *
+
+
+# Load the lessons module
+utils = load_from_path('utils')
+lessons = load_from_path('lessons')
+
+
+def test_lesson_table():
+    """
+    Tests the columns of a LessonTable, and the method row
+    """
+    fcn = 'lessons.LessonTable'
+
+    parent = os.path.split(__file__)[0]
+    fpath = os.path.join(parent,'lessons.csv')
+    table = utils.read_csv(fpath)
+    result = lessons.read_lessons(fpath)
+
+    assert_equals(table[0],result.header,'%s has the wrong header' % fcn)
+    assert_equals(len(table)-1,len(result),'%s has the wrong number of lessons' % fcn)
+    assert_equals(['VFR','IFR'],result.rules[:2],'%s did not start the flight rules with FILED' % fcn)
+    assert_equals(['Pattern','Practice Area','Cross Country'],result.areas[:3],
+                  '%s did not start the areas with pilots.AREAS' % fcn)
+
+    for pos in range(1,len(table)):
+        lesson = table[pos]
+        assert_equals(lesson,result.row(pos-1),'%s did not reproduce lesson %d' % (fcn,pos))
+
+        takeoff = utils.str_to_time(lesson[3])
+        assert_equals(int(takeoff.timestamp()),int(result.takeoff[pos-1]),
+                      '%s has the wrong takeoff for lesson %d' % (fcn,pos))
+        local = int((takeoff.replace(tzinfo=None)-utils.str_to_time('1970-01-01T00:00:00')).total_seconds())
+        assert_equals(local,int(result.local_takeoff()[pos-1]),
+                      '%s has the wrong local takeoff for lesson %d' % (fcn,pos))
+        assert_equals(lesson[2] != '',bool(result.is_instructed()[pos-1]),
+                      '%s has the wrong instructor flag for lesson %d' % (fcn,pos))
+        assert_equals(lesson[5] == 'VFR',bool(result.is_vfr()[pos-1]),
+                      '%s has the wrong flight rules for lesson %d' % (fcn,pos))
+
+    # A table can also be made from an iterator
+    result = lessons.LessonTable(iter(table[:3]))
+    assert_equals(2,len(result),'%s did not read an iterator' % fcn)
+    assert_equals(table[2],result.row(1),'%s did not reproduce a lesson from an iterator' % fcn)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_join():
+    """
+    Tests the method join of LessonTable
+    """
+    fcn = 'lessons.LessonTable.join'
+
+    parent = os.path.split(__file__)[0]
+    table = utils.read_csv(os.path.join(parent,'lessons.csv'))
+    result = lessons.read_lessons(os.path.join(parent,'lessons.csv'))
+
+    for name, column, fid in [('students.csv','student',0),('instructors.csv','instructor',2),
+                              ('fleet.csv','plane',1)]:
+        other = utils.read_csv(os.path.join(parent,name))
+        joined = result.join(column,other)
+        for pos in range(1,len(table)):
+            row = utils.get_for_id(table[pos][fid],other)
+            expct = lessons.MISSING if row is None else other.index(row)
+            assert_equals(expct,int(joined[pos-1]),
+                          '%s(%s) joined lesson %d to the wrong row' % (fcn,repr(column),pos))
+
+    # Missing rows (and ids only in the other table) are allowed
+    other = [['ID'],['nobody'],[table[1][0]]]
+    joined = result.join('student',other)
+    assert_equals(2,int(joined[0]),'%s did not join with a small table' % fcn)
+    assert_true(lessons.MISSING in joined.tolist(),'%s did not mark missing students' % fcn)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_select():
+    """
+    Tests the method select of LessonTable
+    """
+    fcn = 'lessons.LessonTable.select'
+
+    parent = os.path.split(__file__)[0]
+    table = utils.read_csv(os.path.join(parent,'lessons.csv'))
+    result = lessons.read_lessons(os.path.join(parent,'lessons.csv'))
+
+    chosen = result.select(result.is_instructed() & ~result.is_vfr())
+    expct = [row for row in table[1:] if row[2] != '' and row[5] != 'VFR']
+    assert_equals(len(expct),len(chosen),'%s selected the wrong number of lessons' % fcn)
+    for pos in range(len(expct)):
+        assert_equals(expct[pos],chosen.row(pos),'%s selected the wrong lesson %d' % (fcn,pos))
+    assert_equals(len(table)-1,len(result),'%s modified the original table' % fcn)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test():
+    """
+    Performs all tests on the module lessons.
+    """
+    print('Testing module lessons')
+    test_lesson_table()
+    test_join()
+    test_select()
@@ -168,6 +168,60 @@ def test_has_multiengine_endorsement():
     print('  %s passed all tests' % fcn)
 
 
+def test_student_record():
+    """
+    Tests the class pilots.StudentRecord (and the cache in pilots.get_record)
+    """
+    fcn = 'pilots.StudentRecord'
+    
+    from dateutil.parser import parse
+    
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'students.csv')
+    table = utils.read_csv(fpath)
+    
+    takeoffs = ['2015-01-14T08:00:00','2015-12-27T10:15:20','2016-05-31T10:15:20',
+                '2016-12-12T10:15:20','2017-09-28T10:15:20','2017-12-30T16:30:45']
+    columns = [pilots.JOINED,pilots.SOLO,pilots.LICENSE,pilots.FIFTY_HOURS,
+               pilots.INSTRUMENT,pilots.ADVANCED,pilots.MULTIENGINE]
+    
+    for row in table[1:]:
+        record = pilots.StudentRecord(row)
+        # A record made from the epochs of another has the same times
+        copy = pilots.StudentRecord(row,record.epochs())
+        assert_equals(record.times,copy.times,'%s for %s changed times with epochs' % (fcn,row[0]))
+        for stamp in takeoffs:
+            time = parse(stamp)
+            earned = [row[col] != '' and time >= parse(row[col]) for col in columns]
+            expct = pilots.PILOT_INVALID
+            for pos in range(4):
+                if earned[pos]:
+                    expct = pos+pilots.PILOT_NOVICE
+            data = (fcn,row[0],stamp,repr(record.certification(time)),repr(expct))
+            assert_equals(expct, record.certification(time),
+                          '%s for %s gave certification on %s as %s, not %s' % data)
+            for pos in range(len(columns)):
+                data = (fcn,row[0],repr(columns[pos]),stamp,repr(not earned[pos]))
+                assert_equals(earned[pos], record.has(columns[pos],time),
+                              '%s for %s has(%s) on %s returned %s' % data)
+            
+            # The wall clock time is used for times with a timezone
+            local = utils.str_to_time(stamp,'America/Chicago')
+            assert_equals(expct, record.certification(local),
+                          '%s for %s did not use the local time of %s' % (fcn,row[0],repr(local)))
+    
+    # Records are cached, unless the row changes
+    row = utils.get_for_id('S00378',table)
+    record = pilots.get_record(row)
+    assert_true(record is pilots.get_record(list(row)),'pilots.get_record did not cache %s' % row[0])
+    assert_true(record is pilots.get_record(record),'pilots.get_record did not accept a record')
+    changed = row[:pilots.SOLO]+['']*(len(row)-pilots.SOLO)
+    assert_equals(pilots.PILOT_NOVICE, pilots.get_certification(parse(takeoffs[-1]),changed),
+                  'pilots.get_record used a stale record for a changed row')
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_get_minimums():
     """
     Tests the function pilots.get_minimums
@@ -269,7 +323,7 @@ def test_get_minimums():
     
     # Test the alternates to catch hard-coding
     parent = os.path.split(__file__)[0]
-    fpath  = os.path.join(parent,'alternates.csv')
+    fpath  = os.path.join(parent,'alternatives.csv')
     table = utils.read_csv(fpath)
     
     # TEST CASES (last element of each tuple is the row in the minimums table)
@@ -363,6 +417,72 @@ def test_get_minimums():
     print('  %s passed all tests' % fcn)
 
 
+def test_minimums_table():
+    """
+    Tests the class pilots.MinimumsTable
+    """
+    fcn = 'pilots.MinimumsTable'
+    
+    parent = os.path.split(__file__)[0]
+    table = utils.read_csv(os.path.join(parent,'minimums.csv'))
+    compiled = pilots.MinimumsTable(table)
+    
+    # Computed by hand from minimums.csv: (cert, area, instructed, vfr, daytime), answer
+    tests = [((pilots.PILOT_STUDENT,'Pattern',False,True,True),[2000.0,5.0,20.0,8.0]),
+             ((pilots.PILOT_CERTIFIED,'Pattern',False,True,True),[1500.0,5.0,20.0,10.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',True,True,True),[1500.0,3.0,30.0,20.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',False,True,False),None),
+             ((pilots.PILOT_CERTIFIED,'Pattern',False,True,False),[3000.0,10.0,20.0,10.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',True,True,False),[3000.0,10.0,20.0,10.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',False,False,True),None),
+             ((pilots.PILOT_CERTIFIED,'Pattern',False,False,True),[500.0,1.0,25.0,15.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',True,False,True),[500.0,0.75,30.0,20.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',False,False,False),None),
+             ((pilots.PILOT_CERTIFIED,'Pattern',False,False,False),[1000.0,2.0,25.0,15.0]),
+             ((pilots.PILOT_STUDENT,'Pattern',True,False,False),[1000.0,2.0,25.0,15.0]),
+             ((pilots.PILOT_NOVICE,'Pattern',False,True,True),None),
+             ((pilots.PILOT_NOVICE,'Practice Area',True,True,True),[2000.0,5.0,30.0,20.0]),
+             ((pilots.PILOT_CERTIFIED,'Pattern',True,False,True),[500.0,0.75,30.0,20.0]),
+             ((pilots.PILOT_50_HOURS,'Cross Country',False,True,True),[2500.0,10.0,25.0,15.0]),
+             ((pilots.PILOT_50_HOURS,'Cross Country',False,True,False),[5000.0,10.0,20.0,10.0])]
+    
+    for args, expt in tests:
+        mins = compiled.lookup(*args)
+        data = (fcn,', '.join(map(repr,args)),repr(mins),repr(expt))
+        assert_equals(expt, mins,'%s.lookup(%s) returned %s, not %s' % data)
+        mins = pilots.get_minimums(*args,compiled)
+        assert_equals(expt, mins,'%s with get_minimums(%s) returned %s, not %s' % data)
+    
+    # Every other input agrees with searching the table
+    for file in ['minimums.csv','alternatives.csv']:
+        table = utils.read_csv(os.path.join(parent,file))
+        compiled = pilots.MinimumsTable(table)
+        
+        certs = [pilots.PILOT_INVALID,pilots.PILOT_NOVICE,pilots.PILOT_STUDENT,
+                 pilots.PILOT_CERTIFIED,pilots.PILOT_50_HOURS]
+        areas = ['Pattern','Practice Area','Cross Country','Hangar']
+        for cert in certs:
+            for area in areas:
+                for instructed in [False,True]:
+                    for vfr in [False,True]:
+                        for daytime in [False,True,None]:
+                            args = (cert,area,instructed,vfr,daytime)
+                            expt = pilots.get_minimums(*args,table)
+                            mins = compiled.lookup(*args)
+                            data = (fcn,file,', '.join(map(repr,args)),repr(mins),repr(expt))
+                            assert_equals(expt, mins,'%s(%s).lookup(%s) returned %s, not %s' % data)
+                            mins = pilots.get_minimums(*args,compiled)
+                            assert_equals(expt, mins,'%s(%s) with get_minimums(%s) returned %s, not %s' % data)
+        
+        # Answers are copies
+        mins = compiled.lookup(pilots.PILOT_STUDENT,'Pattern',True,True,True)
+        mins[0] = -1
+        assert_true(compiled.lookup(pilots.PILOT_STUDENT,'Pattern',True,True,True)[0] != -1,
+                    '%s.lookup did not return a copy' % fcn)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test():
     """
     Performs all tests on the module pilots.
@@ -372,4 +492,6 @@ def test():
     test_has_instrument_rating()
     test_has_advanced_endorsement()
     test_has_multiengine_endorsement()
+    test_student_record()
     test_get_minimums()
+    test_minimums_table()
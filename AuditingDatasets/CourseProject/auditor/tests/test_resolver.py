@@ -0,0 +1,142 @@
+"""
+Test procedures for locating the files of a dataset.
+
+These tests copy files from the same directory as this file into a temporary
+directory, under other names, and resolve them there.
+"""
+
+import os
+import os.path
+import shutil
+import tempfile
+# See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
+if __package__ is None or __package__ == '':
+    # Access the module if run from __main__.py (Script visibility)
+    from support import *
+else:
+    # Access the module if run from __init__.py (Packages visibility)
+    from .support import *
+
+
+# Load the resolver module
+utils = load_from_path('utils')
+resolver = load_from_path('resolver')
+
+
+def test_sniff_format():
+    """
+    Tests the function sniff_format
+    """
+    fcn = 'resolver.sniff_format'
+
+    parent = os.path.split(__file__)[0]
+    tests = [('file1.csv',resolver.CSV),('file3.json',resolver.JSON),('file4.json',resolver.JSON),
+             ('daycycle.json',resolver.JSON),('lessons.csv',resolver.CSV)]
+    for name, expct in tests:
+        found = resolver.sniff_format(os.path.join(parent,name))
+        assert_equals(expct,found,'%s(%s) returned %s, not %s' % (fcn,repr(name),repr(found),repr(expct)))
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_resolve_file():
+    """
+    Tests the functions resolve_file and resolve_sources
+    """
+    fcn = 'resolver.resolve_file'
+
+    parent = os.path.split(__file__)[0]
+    folder = tempfile.mkdtemp()
+    try:
+        # JSON contents under a CSV name (as in KITH-2018)
+        shutil.copy(os.path.join(parent,'daycycle.json'),os.path.join(folder,'daycycle.csv'))
+        shutil.copy(os.path.join(parent,'lessons.csv'),os.path.join(folder,'lessons.csv'))
+        found = resolver.resolve_file(folder,'daycycle.json')
+        assert_equals(os.path.join(folder,'daycycle.csv'),found,'%s did not find daycycle.csv' % fcn)
+        found = resolver.resolve_file(folder,'lessons.csv')
+        assert_equals(os.path.join(folder,'lessons.csv'),found,'%s did not use the exact name' % fcn)
+
+        # A candidate with the expected contents is preferred
+        shutil.copy(os.path.join(parent,'lessons.csv'),os.path.join(folder,'Daycycle.bak'))
+        shutil.copy(os.path.join(parent,'daycycle.json'),os.path.join(folder,'daycycle.txt'))
+        found = resolver.resolve_file(folder,'daycycle.json')
+        assert_equals(os.path.join(folder,'daycycle.csv'),found,'%s did not prefer JSON contents' % fcn)
+        os.remove(os.path.join(folder,'daycycle.csv'))
+        found = resolver.resolve_file(folder,'daycycle.json')
+        assert_equals(os.path.join(folder,'daycycle.txt'),found,'%s did not ignore the extension' % fcn)
+
+        # A missing file resolves to its logical name
+        found = resolver.resolve_file(folder,'weather.json')
+        assert_equals(os.path.join(folder,'weather.json'),found,'%s did not keep a missing name' % fcn)
+
+        found = resolver.resolve_sources(folder,['lessons.csv','daycycle.json','weather.json'])
+        assert_equals(['lessons.csv','daycycle.txt','weather.json'],found,
+                      'resolver.resolve_sources returned %s' % repr(found))
+    finally:
+        shutil.rmtree(folder)
+
+    print('  %s passed all tests' % fcn)
+
+
+def test_read_daycycle():
+    """
+    Tests the functions read_daycycle and get_daycycle_dictionary
+    """
+    fcn = 'resolver.read_daycycle'
+
+    parent = os.path.split(__file__)[0]
+    fpath = os.path.join(parent,'daycycle.json')
+    daycycle = utils.read_json(fpath)
+    expct = utils.Daycycle(daycycle)
+
+    # The same daycycle as a table
+    table = [['Date','Sunrise','Sunset','Timezone']]
+    for year in sorted(daycycle):
+        if year.isdigit():
+            for moday in sorted(daycycle[year]):
+                times = daycycle[year][moday]
+                table.append([year+'-'+moday,times['sunrise'],times['sunset'],daycycle['timezone']])
+
+    folder = tempfile.mkdtemp()
+    try:
+        shutil.copy(fpath,os.path.join(folder,'daycycle.csv'))
+        utils.write_csv(table,os.path.join(folder,'table.json'))
+        for name in ['daycycle.csv','table.json']:
+            found = resolver.read_daycycle(os.path.join(folder,name))
+            assert_equals(expct.timezone,found.timezone,'%s(%s) has the wrong timezone' % (fcn,repr(name)))
+            assert_equals(expct.first,found.first,'%s(%s) has the wrong first day' % (fcn,repr(name)))
+            assert_equals(list(expct.sunrise),list(found.sunrise),'%s(%s) has the wrong sunrises' % (fcn,repr(name)))
+            assert_equals(list(expct.sunset),list(found.sunset),'%s(%s) has the wrong sunsets' % (fcn,repr(name)))
+    finally:
+        shutil.rmtree(folder)
+
+    try:
+        resolver.get_daycycle_dictionary([['Date','Sunrise','Sunset']])
+        quit_with_error('resolver.get_daycycle_dictionary did not reject a table without a timezone')
+    except ValueError:
+        pass
+
+    try:
+        resolver.get_daycycle_dictionary(table[:1])
+        quit_with_error('resolver.get_daycycle_dictionary did not reject a table without days')
+    except ValueError:
+        pass
+
+    mixed = table[:3]+[table[3][:3]+['America/Chicago']]
+    try:
+        resolver.get_daycycle_dictionary(mixed)
+        quit_with_error('resolver.get_daycycle_dictionary did not reject a table with two timezones')
+    except ValueError:
+        pass
+
+    print('  %s passed all tests' % fcn)
+
+
+def test():
+    """
+    Performs all tests on the module resolver.
+    """
+    print('Testing module resolver')
+    test_sniff_format()
+    test_resolve_file()
+    test_read_daycycle()
@@ -9,6 +9,7 @@ Date:   June 7, 2019
 
 import os.path
 import json
+import csv
 # See: https://stackoverflow.com/questions/14132789/relative-imports-for-the-billionth-time
 if __package__ is None or __package__ == '':
     # Access the module if run from __main__.py (Script visibility)
@@ -185,6 +186,72 @@ def test_read_csv():
     print('  %s passed all tests' % fcn)
 
 
+def test_iter_csv():
+    """
+    Tests the function utils.iter_csv
+    """
+    fcn = 'utils.iter_csv'
+    
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'file1.csv')
+    rows = utils.iter_csv(fpath)
+    
+    assert_true(not type(rows) == list,
+                  '%s returned a list instead of an iterator' % fcn)
+    assert_equals(next(rows), FILE1[0],
+                  '%s did not start with the header row' % fcn)
+    table = [FILE1[0]]+list(rows)
+    assert_equals(table, FILE1,
+                  '%s did not produce the correct rows: %s vs %s' % (fcn,repr(table), repr(FILE1)))
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_mapped_csv():
+    """
+    Tests the class utils.MappedCSV (and the function iter_mapped_csv)
+    """
+    import tempfile
+    fcn = 'utils.MappedCSV'
+    
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'file1.csv')
+    with utils.MappedCSV(fpath) as table:
+        assert_equals(len(FILE1),len(table),'%s has %d rows, not %d' % (fcn,len(table),len(FILE1)))
+        for pos in range(len(FILE1)):
+            row = table[pos]
+            assert_equals(len(FILE1[pos]),len(row),'%s row %d has the wrong length' % (fcn,pos))
+            assert_equals(FILE1[pos][3],row[3],'%s row %d has the wrong takeoff' % (fcn,pos))
+            assert_equals(FILE1[pos][-1],row[-1],'%s row %d has the wrong last field' % (fcn,pos))
+            assert_equals(FILE1[pos][1:3],row[1:3],'%s row %d has the wrong slice' % (fcn,pos))
+            assert_equals(FILE1[pos],row.tolist(),'%s row %d has the wrong fields' % (fcn,pos))
+            assert_equals(FILE1[pos]+['Winds'],row+['Winds'],'%s row %d cannot be added to a list' % (fcn,pos))
+            assert_true(row == FILE1[pos],'%s row %d is not equal to its list' % (fcn,pos))
+        assert_equals(FILE1[-1],table[-1].tolist(),'%s did not support a negative position' % fcn)
+        assert_equals(FILE1,[list(row) for row in table],'%s did not iterate over the rows' % fcn)
+    
+    rows = utils.iter_mapped_csv(fpath)
+    assert_equals(FILE1,[row.tolist() for row in rows],'utils.iter_mapped_csv did not produce the correct rows')
+    
+    # Quotes, blank lines, carriage returns and a missing final newline
+    folder = tempfile.mkdtemp()
+    fpath  = os.path.join(folder,'quoted.csv')
+    contents = [b'a,b,c\n',b'a,"b,c"\r\n\n',b'"x ""y""","two\nlines",\n',b'1,,3\n1,2',b'']
+    correct  = [[['a','b','c']],[['a','b,c'],[]],[['x "y"','two\nlines','']],[['1','','3'],['1','2']],[]]
+    try:
+        for pos in range(len(contents)):
+            with open(fpath,'wb') as file:
+                file.write(contents[pos])
+            with utils.MappedCSV(fpath) as table:
+                found = [row.tolist() for row in table]
+            assert_equals(correct[pos],found,'%s read %s as %s' % (fcn,repr(contents[pos]),repr(found)))
+    finally:
+        os.remove(fpath)
+        os.rmdir(folder)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_write_csv():
     """
     Tests the function utils.write_csv
@@ -216,6 +283,58 @@ def test_write_csv():
     print('  %s passed all tests' % fcn)
 
 
+def test_csv_writer():
+    """
+    Tests the class utils.CSVWriter
+    """
+    import gzip
+    import tempfile
+    fcn = 'utils.CSVWriter'
+    
+    folder = tempfile.mkdtemp()
+    try:
+        # The bytes are the same as for csv.writer
+        correct = os.path.join(folder,'correct.csv')
+        with open(correct,'w',newline='') as file:
+            csv.writer(file).writerows(FILE1)
+        with open(correct,'rb') as file:
+            expect = file.read()
+        
+        fpath = os.path.join(folder,'file1.csv')
+        with utils.CSVWriter(fpath) as wrap:
+            wrap.writerow(FILE1[0])
+            wrap.writerows(iter(FILE1[1:]))
+        assert_equals(len(FILE1),wrap.count,'%s counted %d rows, not %d' % (fcn,wrap.count,len(FILE1)))
+        with open(fpath,'rb') as file:
+            assert_equals(expect,file.read(),'%s did not write the same bytes as csv.writer' % fcn)
+        
+        # Appending adds to the end
+        with utils.CSVWriter(fpath) as wrap:
+            wrap.writerows(FILE1[:3])
+        with utils.CSVWriter(fpath,True) as wrap:
+            wrap.writerows(FILE1[3:])
+        with open(fpath,'rb') as file:
+            assert_equals(expect,file.read(),'%s did not append to the file' % fcn)
+        
+        # A file ending in .gz is compressed (even when appended to)
+        fpath = os.path.join(folder,'file1.csv.gz')
+        with utils.CSVWriter(fpath) as wrap:
+            wrap.writerows(FILE1[:3])
+        with utils.CSVWriter(fpath,True) as wrap:
+            wrap.writerows(FILE1[3:])
+        with gzip.open(fpath,'rb') as file:
+            assert_equals(expect,file.read(),'%s did not compress the file' % fcn)
+        utils.write_csv(FILE1,fpath)
+        with gzip.open(fpath,'rb') as file:
+            assert_equals(expect,file.read(),'utils.write_csv did not compress the file')
+    finally:
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder,name))
+        os.rmdir(folder)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_read_json():
     """
     Tests the function utils.read_json
@@ -243,6 +362,39 @@ def test_read_json():
     print('  %s passed all tests' % fcn)
 
 
+def test_iter_json_items():
+    """
+    Tests the function utils.iter_json_items
+    """
+    fcn = 'utils.iter_json_items'
+    
+    parent = os.path.split(__file__)[0]
+    fpath = os.path.join(parent,'file3.json')
+    data  = list(utils.iter_json_items(fpath))
+    assert_equals(list(FILE3.items()), data,
+                  '%s did not return the correct items: %s' % (fcn,repr(data)))
+    
+    # Values that span several blocks
+    block = utils.JSON_BLOCK
+    try:
+        utils.JSON_BLOCK = 7
+        data = list(utils.iter_json_items(fpath))
+    finally:
+        utils.JSON_BLOCK = block
+    assert_equals(list(FILE3.items()), data,
+                  '%s did not read values split across blocks: %s' % (fcn,repr(data)))
+    
+    # A file that is not an object is an error
+    fpath = os.path.join(parent,'file4.json')
+    try:
+        data = list(utils.iter_json_items(fpath))
+        quit_with_error('%s did not reject a JSON list: %s' % (fcn,repr(data)))
+    except ValueError:
+        pass
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_str_to_time():
     """
     Tests the function utils.str_to_time
@@ -289,6 +441,98 @@ def test_str_to_time():
     
     print('  %s passed all tests' % fcn)
 
+def test_str_to_time_iso():
+    """
+    Tests the strict ISO fast path of utils.str_to_time against dateutil
+    """
+    fcn = 'utils.str_to_time'
+    
+    from dateutil.parser import parse
+    from pytz import timezone
+    
+    inputs = ['2017-01-08T14:00:00-05:00','2017-03-12T03:00:00-04:00','2019-12-31T23:59:59+00:00',
+              '2016-02-29T08:30:00+05:30','2017-12-30 16:30:45','2015-01-12T09:00:00','2016-05-12']
+    for input in inputs:
+        correct = parse(input)
+        result  = utils.str_to_time(input)
+        assert_equals(correct, result, '%s did not properly parse %s' % (fcn,repr(input)))
+        assert_equals(correct.utcoffset(), result.utcoffset(),
+                      '%s gave %s the wrong offset' % (fcn,repr(input)))
+    
+    input   = '2017-07-04T12:00:00'
+    central = 'America/Chicago'
+    correct = timezone(central).localize(parse(input))
+    result  = utils.str_to_time(input,central)
+    assert_equals(correct, result, '%s could not handle timezone string %s' % (fcn,repr(central)))
+    assert_equals(correct.utcoffset(), result.utcoffset(),
+                  '%s gave %s the wrong offset for %s' % (fcn,repr(input),repr(central)))
+    
+    # Strict in shape, but not valid dates
+    for input in ['2016-13-01','2017-02-29T10:00:00','2017-01-08T25:00:00-05:00','']:
+        assert_equals(None, utils.str_to_time(input),
+                      '%s did not return None for %s' % (fcn,repr(input)))
+    
+    print('  %s passed all ISO tests' % fcn)
+
+
+def test_epoch_to_time():
+    """
+    Tests the function utils.epoch_to_time
+    """
+    fcn = 'utils.epoch_to_time'
+    
+    inputs = ['2017-01-08T14:00:00-05:00','2017-03-12T03:00:00-04:00','2019-12-31T23:59:59+00:00',
+              '2016-02-29T08:30:00+05:30','1969-12-31T19:00:00-05:00']
+    for input in inputs:
+        time = utils.str_to_time(input)
+        epoch, offset = int(time.timestamp()), int(time.utcoffset().total_seconds())
+        result = utils.epoch_to_time(epoch,offset)
+        assert_equals(time, result, '%s(%s,%s) returned %s' % (fcn,epoch,offset,repr(result)))
+        assert_equals(input, result.isoformat(),
+                      '%s(%s,%s) has the wrong offset %s' % (fcn,epoch,offset,result.isoformat()))
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_localize():
+    """
+    Tests the functions utils.get_zone, utils.localize and utils.localize_many against pytz
+    """
+    fcn = 'utils.localize'
+    
+    import datetime
+    from pytz import timezone
+    
+    eastern = 'America/New_York'
+    assert_true(utils.get_zone(eastern) is utils.get_zone(eastern),'utils.get_zone did not cache the zone')
+    assert_equals(timezone(eastern),utils.get_zone(eastern),'utils.get_zone returned the wrong zone')
+    
+    # Every half hour on either side of both daylight saving changes, twice (cached)
+    times = []
+    for day in [datetime.datetime(2017,3,11),datetime.datetime(2017,3,12),datetime.datetime(2017,3,13),
+                datetime.datetime(2017,11,4),datetime.datetime(2017,11,5),datetime.datetime(2017,7,4)]:
+        times.extend(day+datetime.timedelta(minutes=30*step) for step in range(48))
+    times = times+times
+    for name in [eastern,'Australia/Lord_Howe','UTC']:
+        zone = timezone(name)
+        many = utils.localize_many(times,name)
+        for pos in range(len(times)):
+            correct = zone.localize(times[pos])
+            result = utils.localize(times[pos],name)
+            assert_true(correct.tzinfo is result.tzinfo,'%s gave %s the wrong tzinfo in %s' % 
+                        (fcn,repr(times[pos]),repr(name)))
+            assert_equals(correct.isoformat(),result.isoformat(),'%s gave %s the wrong time in %s' % 
+                          (fcn,repr(times[pos]),repr(name)))
+            assert_true(correct.tzinfo is many[pos].tzinfo,'utils.localize_many gave %s the wrong tzinfo in %s' %
+                        (repr(times[pos]),repr(name)))
+    
+    # Times with a timezone are kept
+    aware = timezone(eastern).localize(times[0])
+    assert_true(utils.localize_many([aware],'UTC')[0] is aware,'utils.localize_many changed an aware time')
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_daytime():
     """
     Tests the function utils.daytime
@@ -324,6 +568,61 @@ def test_daytime():
     print('  %s passed all tests' % fcn)
 
 
+def test_daycycle():
+    """
+    Tests the class utils.Daycycle (and its use by utils.daytime)
+    """
+    fcn = 'utils.Daycycle'
+    
+    import datetime
+    from pytz import timezone
+    
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'daycycle.json')
+    cycle = utils.read_json(fpath)
+    compiled = utils.Daycycle(cycle)
+    eastern  = timezone(cycle['timezone'])
+    
+    # Compare against sunrise and sunset computed directly from the dictionary
+    date = datetime.date(2015,1,1)
+    while date.year < 2020:
+        entry = cycle[str(date.year)][date.strftime('%m-%d')]
+        rise = eastern.localize(datetime.datetime.strptime(str(date)+' '+entry['sunrise'],'%Y-%m-%d %H:%M'))
+        sets = eastern.localize(datetime.datetime.strptime(str(date)+' '+entry['sunset'],'%Y-%m-%d %H:%M'))
+        for hour in range(0,24,3):
+            naive = datetime.datetime(date.year,date.month,date.day,hour)
+            time  = eastern.localize(naive)
+            expct = rise < time < sets
+            data  = (fcn,repr(time),repr(compiled.daytime(time)),repr(expct))
+            assert_equals(expct, compiled.daytime(time),'%s.daytime(%s) returned %s, not %s' % data)
+            assert_equals(expct, utils.daytime(time,cycle),
+                          'utils.daytime(%s,daycycle) returned %s, not %s' % data[1:])
+            assert_equals(expct, compiled.daytime(naive),
+                          '%s.daytime(%s) returned %s, not %s' % (fcn,repr(naive),data[2],data[3]))
+        date += datetime.timedelta(days=5)
+    
+    # Sunrise and sunset themselves are not daytime
+    rise = utils.str_to_time('2015-01-01T07:35:00-05:00')
+    assert_equals(False, compiled.daytime(rise),'%s.daytime(%s) is not False' % (fcn,repr(rise)))
+    
+    # Dates outside of the daycycle
+    for stamp in ['2014-12-31T12:00:00-05:00','2020-01-01T12:00:00-05:00']:
+        time = utils.str_to_time(stamp)
+        assert_equals(None, compiled.daytime(time),'%s.daytime(%s) is not None' % (fcn,repr(time)))
+        assert_equals(None, utils.daytime(time,cycle),'utils.daytime(%s) is not None' % repr(time))
+    
+    # The compiled form (as JSON) makes the same daycycle
+    data = json.loads(json.dumps(compiled.to_dict()))
+    copy = utils.Daycycle(data)
+    assert_equals(compiled.to_dict(), copy.to_dict(),'%s(%s.to_dict()) is not the same daycycle' % (fcn,fcn))
+    for stamp in ['2015-01-01T07:36:00-05:00','2017-07-04T21:00:00-04:00','2019-12-31T12:00:00-05:00']:
+        time = utils.str_to_time(stamp)
+        assert_equals(compiled.daytime(time), copy.daytime(time),
+                      '%s(%s.to_dict()).daytime(%s) is not the same' % (fcn,fcn,repr(time)))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_get_for_id():
     """
     Tests the function utils.get_for_id
@@ -352,14 +651,51 @@ def test_get_for_id():
     print('  %s passed all tests' % fcn)
 
 
+def test_indexed_table():
+    """
+    Tests the class utils.IndexedTable (and its use by utils.get_for_id)
+    """
+    fcn = 'utils.IndexedTable'
+    
+    table = utils.IndexedTable(FILE1,[1])
+    assert_equals(FILE1, list(table), '%s did not keep the rows of %s' % (fcn,repr(FILE1)))
+    
+    for row in FILE1[1:]+[['XXXXXX']]:
+        expct = utils.get_for_id(row[0],FILE1)
+        result = utils.get_for_id(row[0],table)
+        data = (fcn,repr(row[0]),repr(result),repr(expct))
+        assert_equals(expct, result, 'get_for_id(%s,%s) returned %s, not %s' % data)
+    
+    # Rows are copies
+    result = table.lookup('S00324')
+    result[1] = 'XXXXX'
+    assert_equals(FILE1[3], table.lookup('S00324'), '%s.lookup did not return a copy' % fcn)
+    
+    # Secondary index on the airplane
+    result = table.lookup_by(1,'811AX')
+    assert_equals([FILE1[4],FILE1[6]], result, '%s.lookup_by(1,%s) returned %s' % (fcn,repr('811AX'),repr(result)))
+    assert_equals([], table.lookup_by(1,'XXXXX'), '%s.lookup_by could not handle a missing value' % fcn)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test():
     """
     Performs all tests on the module utils.
     """
     print('Testing module utils')
     test_read_csv()
+    test_iter_csv()
+    test_mapped_csv()
     test_write_csv()
+    test_csv_writer()
     test_read_json()
+    test_iter_json_items()
     test_str_to_time()
+    test_str_to_time_iso()
+    test_epoch_to_time()
+    test_localize()
     test_daytime()
+    test_daycycle()
     test_get_for_id()
+    test_indexed_table()
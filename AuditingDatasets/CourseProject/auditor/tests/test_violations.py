@@ -160,6 +160,70 @@ def test_get_weather_report():
     print('  %s passed all tests' % fcn)
 
 
+def test_weather_index():
+    """
+    Tests the class WeatherIndex (and its use by get_weather_report)
+    """
+    fcn = 'violations.WeatherIndex'
+    
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'file3.json')
+    report = utils.read_json(fpath)
+    index  = violations.WeatherIndex(report)
+    
+    assert_equals(len(report), len(index),
+                  '%s has %s reports, not %s' % (fcn,repr(len(index)),repr(len(report))))
+    assert_true(index.times == sorted(index.times),'%s did not sort the report times' % fcn)
+    
+    tests = [("2017-12-31T21:00:00-05:00","2017-12-31T21:00:00-05:00"),
+             ("2017-12-31T22:59:59-05:00","2017-12-31T22:00:00-05:00"),
+             ("2017-12-31T23:30:00-05:00","2017-12-31T23:00:00-05:00"),
+             ("2018-01-01T05:00:00+00:00","2018-01-01T00:00:00-05:00"),
+             ("2018-01-02T12:00:00-05:00","2018-01-01T00:00:00-05:00"),
+             ("2017-12-31T20:59:00-05:00",None)]
+    
+    # Perform the tests
+    for test in tests:
+        expct = None if test[1] is None else report[test[1]]
+        stamp = utils.str_to_time(test[0])
+        found = index.lookup(stamp)
+        data  = (fcn,test[0],repr(found),repr(expct))
+        assert_equals(expct, found,'%s.lookup(%s) returned %s, not %s' % data)
+        
+        found = violations.get_weather_report(stamp,report)
+        data  = ('violations.get_weather_report',test[0],repr(found),repr(expct))
+        assert_equals(expct, found,'%s(%s,weather) returned %s, not %s' % data)
+    
+    # A compact index from a stream keeps only the records
+    index = violations.read_weather(fpath)
+    assert_equals(len(report), len(index),'violations.read_weather has the wrong number of reports')
+    assert_true(index.weather is None,'violations.read_weather kept the weather dictionary')
+    for test in tests:
+        expct = None if test[1] is None else repr(violations.WeatherRecord(report[test[1]]))
+        found = index.lookup(utils.str_to_time(test[0]))
+        found = None if found is None else repr(found)
+        data  = (fcn,test[0],repr(found),repr(expct))
+        assert_equals(expct, found,'compact %s.lookup(%s) returned %s, not %s' % data)
+    
+    # The features have a row for each record, and a last row for a missing report
+    features = index.features().tolist()
+    assert_equals(len(index)+1,len(features),'%s.features has %d rows' % (fcn,len(features)))
+    for pos in [0,len(index)//2,len(index)-1]:
+        expct = repr(list(index.records[pos].features()))
+        assert_equals(expct,repr(features[pos]),'%s.features has the row %s, not %s' % (fcn,features[pos],expct))
+    assert_true(features[-1][0] != features[-1][0],'%s.features does not end with a missing report' % fcn)
+    assert_true(index.features() is index.features(),'%s.features was not kept' % fcn)
+    
+    # Known times are used instead of parsing the keys
+    times = dict((key, index.times[pos]) for key, pos in index.positions.items())
+    records = [(key, index.records[pos]) for key, pos in index.positions.items()]
+    copy = violations.WeatherIndex(iter(records),True,times)
+    assert_equals(index.times,copy.times,'%s with times has the wrong times' % fcn)
+    assert_equals(index.positions,copy.positions,'%s with times has the wrong positions' % fcn)
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_get_weather_violation():
     """
     Tests the function get_weather_violation
@@ -234,6 +298,147 @@ def test_get_weather_violation():
     print('  %s passed all tests' % fcn)
 
 
+def test_weather_record():
+    """
+    Tests the class WeatherRecord
+    """
+    fcn = 'violations.WeatherRecord'
+    inf = float('inf')
+    
+    tests = [({'visibility':{'prevailing':21120.0,'minimum':2640.0,'units':'FT'},
+               'wind':{'speed':10.0,'gusts':20.0,'crosswind':5.0,'units':'MPS'},
+               'sky':[{'type':'scattered','height':700.0,'units':'FT'},
+                      {'type':'overcast','height':1200.0,'units':'FT'},
+                      {'type':'broken','height':900.0,'units':'FT'}]},
+              (0.5,19.4384,38.8768,9.7192,900.0,True,True,True)),
+             ({'visibility':{'prevailing':10.0,'units':'SM'},'wind':'calm','sky':'clear'},
+              (10.0,0.0,None,None,inf,True,True,True)),
+             ({'visibility':{'prevailing':3.0,'units':'SM'},'wind':{'speed':8.0,'units':'KT'},
+               'sky':[{'type':'a few','height':300.0,'units':'FT'}]},
+              (3.0,8.0,None,None,inf,True,True,True)),
+             ({'visibility':'unavailable','wind':'unavailable','sky':'unavailable'},
+              (None,None,None,None,None,False,False,False))]
+    names = ('visibility_sm','wind_kt','gust_kt','cross_kt','ceiling_ft',
+             'has_visibility','has_wind','has_ceiling')
+    
+    # Perform the tests (None means nan)
+    for test in tests:
+        record = violations.WeatherRecord(test[0])
+        for pos in range(len(names)):
+            found = getattr(record,names[pos])
+            expct = test[1][pos]
+            if expct is None:
+                assert_true(found != found,'%s(%s).%s is %s, not nan' % (fcn,repr(test[0]),names[pos],repr(found)))
+            elif type(expct) == float:
+                assert_floats_equal(expct,found,'%s(%s).%s is %s, not %s' % (fcn,repr(test[0]),names[pos],repr(found),repr(expct)))
+            else:
+                assert_equals(expct,found,'%s(%s).%s is %s, not %s' % (fcn,repr(test[0]),names[pos],repr(found),repr(expct)))
+        
+        # The record checks agree with the raw checks
+        for minimum in [0.5,1,5,10]:
+            assert_equals(violations.bad_visibility(test[0]['visibility'],minimum),record.bad_visibility(minimum),
+                          '%s.bad_visibility(%s) disagrees with bad_visibility' % (fcn,repr(minimum)))
+        for maxwind, maxcross in [(10,5),(20,10),(40,10),(40,20)]:
+            assert_equals(violations.bad_winds(test[0]['wind'],maxwind,maxcross),record.bad_winds(maxwind,maxcross),
+                          '%s.bad_winds(%s,%s) disagrees with bad_winds' % (fcn,repr(maxwind),repr(maxcross)))
+        for minimum in [500,900,1000,5000]:
+            assert_equals(violations.bad_ceiling(test[0]['sky'],minimum),record.bad_ceiling(minimum),
+                          '%s.bad_ceiling(%s) disagrees with bad_ceiling' % (fcn,repr(minimum)))
+        
+        # A record made from the attributes of another is the same
+        copy = violations.WeatherRecord(record.tolist())
+        assert_equals(repr(record),repr(copy),'%s(%s.tolist()) is %s' % (fcn,repr(record),repr(copy)))
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_get_weather_violations():
+    """
+    Tests the function get_weather_violations against get_weather_violation
+    """
+    fcn = 'violations.get_weather_violations'
+    
+    parent = os.path.split(__file__)[0]
+    fpath  = os.path.join(parent,'weather.json')
+    report = utils.read_json(fpath)
+    
+    # The special cases, and units that the test data might not have
+    readings = list(report.values())+[None,
+        {'visibility':'unavailable','wind':'calm','sky':'clear'},
+        {'visibility':{'prevailing':21120.0,'units':'FT'},'wind':'unavailable','sky':'unavailable'},
+        {'visibility':{'prevailing':3.0,'minimum':1.0,'units':'SM'},'sky':[],
+         'wind':{'speed':5.0,'gusts':12.0,'crosswind':4.0,'units':'MPS'}},
+        {'visibility':{'prevailing':10.0,'units':'SM'},'wind':{'speed':15.0,'units':'KT'},
+         'sky':[{'type':'scattered','height':300.0,'units':'FT'},
+                {'type':'indefinite ceiling','height':800.0,'units':'FT'}]}]
+    minimums = [[500,0.75,30,20],[1000,2,25,15],[1500,5,20,10],[2000,8,25,15],
+                [3000,10,20,8],[5000,10,10,5]]
+    
+    features = []
+    limits = []
+    for read in readings:
+        for mins in minimums:
+            features.append(violations.get_weather_features(read))
+            limits.append(mins)
+    codes = violations.get_weather_violations(features,limits)
+    assert_equals(len(limits),len(codes),'%s returned the wrong number of codes' % fcn)
+    
+    pos = 0
+    for read in readings:
+        for mins in minimums:
+            expct = violations.get_weather_violation(read,mins)
+            check = violations.WEATHER_REASONS[codes[pos]]
+            data  = (fcn,repr(read),repr(mins),repr(check),repr(expct))
+            assert_equals(expct, check,'%s(%s,%s) gave %s, not %s' % data)
+            pos += 1
+    
+    # A flight with no minimums (None or nan) is okay, even with no report
+    nan = float('nan')
+    features = [violations.get_weather_features(readings[-3]),violations.get_weather_features(None)]*3
+    limits = [None,None,[nan]*4,[nan]*4,minimums[-1],minimums[-1]]
+    codes = violations.get_weather_violations(features,limits).tolist()
+    assert_equals([0,0,0,0,4,5],codes,'%s gave the codes %s for missing minimums' % (fcn,repr(codes)))
+    codes = violations.get_weather_violations(features[2:],violations.numpy.array(limits[2:])).tolist()
+    assert_equals([0,0,4,5],codes,'%s gave the codes %s for an array of missing minimums' % (fcn,repr(codes)))
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_check_lessons():
+    """
+    Tests the functions check_lesson and check_lessons
+    """
+    fcn = 'violations.check_lessons'
+    
+    parent = os.path.split(__file__)[0]
+    students = utils.read_csv(os.path.join(parent,'students.csv'))
+    weather  = violations.WeatherIndex(utils.read_json(os.path.join(parent,'file3.json')))
+    dcycle   = utils.read_json(os.path.join(parent,'daycycle.json'))
+    minimums = utils.read_csv(os.path.join(parent,'minimums.csv'))
+    tables   = (students,weather,dcycle,minimums)
+    
+    # S00772 is a novice, so a solo has no minimums (and no weather violation)
+    tests = [(['S00772','133CZ','',    '2017-12-31T22:00:00-05:00','2017-12-31T23:00:00-05:00','VFR','Pattern'],''),
+             (['S00772','133CZ','I003','2017-12-31T22:00:00-05:00','2017-12-31T23:00:00-05:00','VFR','Pattern'],'Weather'),
+             (['S00350','133CZ','',    '2017-12-31T22:00:00-05:00','2017-12-31T23:00:00-05:00','IFR','Pattern'],''),
+             (['S00772','133CZ','I003','2017-12-31T20:00:00-05:00','2017-12-31T21:00:00-05:00','VFR','Pattern'],'Unknown'),
+             (['S00772','133CZ','',    '2017-12-31T20:00:00-05:00','2017-12-31T21:00:00-05:00','VFR','Pattern'],'')]
+    
+    for lesson, expct in tests:
+        found = violations.check_lesson(lesson,tables)
+        data  = (lesson[0],lesson[2],lesson[3],repr(found),repr(expct))
+        assert_equals(expct,found,'violations.check_lesson(%s,%s,%s) returned %s, not %s' % data)
+    
+    lessons = [test[0] for test in tests]
+    correct = [test[1] for test in tests]
+    found = violations.check_lessons(lessons,tables)
+    assert_equals(correct,found,'%s returned %s, not %s' % (fcn,repr(found),repr(correct)))
+    found = violations.check_lessons(lessons[:1],tables)
+    assert_equals([''],found,'%s returned %s for a lesson with no minimums' % (fcn,repr(found)))
+    
+    print('  %s passed all tests' % fcn)
+
+
 def test_list_weather_violations():
     """
     Tests the function list_weather_violations
@@ -284,6 +489,58 @@ def test_list_weather_violations():
     print('  %s passed all tests' % fcn)
 
 
+def test_partition_lessons():
+    """
+    Tests the function partition_lessons
+    """
+    fcn = 'violations.partition_lessons'
+    
+    parent = os.path.split(__file__)[0]
+    lessons = utils.read_csv(os.path.join(parent,'lessons.csv'))[1:]
+    
+    for parts in [1,2,7,64,len(lessons)+1]:
+        result = violations.partition_lessons(lessons,parts)
+        assert_true(len(result) <= parts,'%s(lessons,%d) returned %d partitions' % (fcn,parts,len(result)))
+        
+        found = sorted(pos for part in result for pos in part)
+        assert_equals(list(range(len(lessons))),found,
+                      '%s(lessons,%d) did not include every lesson exactly once' % (fcn,parts))
+        
+        # Partitions are disjoint date ranges, in order
+        last = ''
+        for part in result:
+            dates = [lessons[pos][3][:10] for pos in part]
+            assert_true(last < min(dates),'%s(lessons,%d) split the date %s' % (fcn,parts,min(dates)))
+            last = max(dates)
+    
+    print('  %s passed all tests' % fcn)
+
+
+def test_list_weather_violations_parallel():
+    """
+    Tests that list_weather_violations gives the same result with several workers
+    """
+    import sys
+    fcn = 'violations.list_weather_violations'
+    
+    parent = os.path.split(__file__)[0]
+    correct = violations.list_weather_violations(parent)
+    
+    # Workers find the functions by module name, so register this copy of violations
+    previous = sys.modules.get('violations')
+    sys.modules['violations'] = violations
+    try:
+        results = violations.list_weather_violations(parent,3)
+    finally:
+        if previous is None:
+            del sys.modules['violations']
+        else:
+            sys.modules['violations'] = previous
+    
+    assert_equals(correct,results,'%s(tests,3) did not match %s(tests)' % (fcn,fcn))
+    print('  %s passed all tests in parallel' % fcn)
+
+
 def test():
     """
     Performs all tests on the module violations.
@@ -293,5 +550,11 @@ def test():
     test_bad_winds()
     test_bad_ceiling()
     test_get_weather_report()
+    test_weather_index()
+    test_weather_record()
     test_get_weather_violation()
+    test_get_weather_violations()
+    test_check_lessons()
     test_list_weather_violations()
+    test_partition_lessons()
+    test_list_weather_violations_parallel()
@@ -13,12 +13,38 @@ enforce any of the preconditions in this module.
 Author: Christian M. Fulton
 Date: 14/08/2021
 """
+import io
 import csv
+import gzip
 import json
+import mmap
+import re
+import datetime
+from array import array
 from pytz import timezone
 from dateutil.parser import *
 
 
+# The end of a line in a CSV file (see MappedCSV)
+_LINE_ENDING = re.compile(b'\r?\n')
+# The end of a line in a CSV file without carriage returns
+_NEWLINE = re.compile(b'\n')
+# The write buffer of a CSVWriter, in bytes
+BUFFER_SIZE = 1 << 20
+# The gzip compression level of a CSVWriter (the zlib default, much faster than 9)
+COMPRESS_LEVEL = 6
+# The whitespace allowed between JSON tokens
+_JSON_SPACE = re.compile(r'[ \t\n\r]*')
+# The size of each block read by iter_json_items, in characters
+JSON_BLOCK = 1 << 16
+# The timezones looked up so far, by name (see get_zone)
+_ZONES = {}
+# The tzinfo of each (zone name, date ordinal), or False if its offset changes that day
+_OFFSETS = {}
+# The fixed offset timezones made so far, by UTC offset in seconds (see epoch_to_time)
+_FIXED = {}
+
+
 def read_csv(filename):
     """
     Returns the contents read from the CSV file filename.
@@ -40,6 +66,283 @@ def read_csv(filename):
     f.close()
     return data
 
+def iter_csv(filename):
+    """
+    Returns an iterator over the rows of the CSV file filename.
+    
+    This function produces the same rows as read_csv, in the same order, but only 
+    reads one row at a time.  Use it for files too large to hold in memory. The file
+    is closed when the iterator is exhausted (or garbage collected).
+    
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a file that exists, and that file 
+    is a valid CSV file
+    """
+    with open(filename, newline='') as f:
+        for row in csv.reader(f):
+            yield row
+
+
+class MappedCSV(object):
+    """
+    A class representing a CSV file that is memory-mapped instead of read.
+    
+    A large file like lessons.csv takes a lot of memory to read with read_csv, because
+    every field of every row is turned into a string, even though most rows are only
+    looked at briefly.  This class maps the file into memory and scans it once for the
+    start and end of each row (with a regular expression, unless the file has quotes).
+    Indexing it gives a MappedRow, which splits its row into fields when first used, 
+    and only decodes the fields that are accessed.
+    
+    The rows are the same as those of read_csv, including fields in quotes (such a row 
+    is simply parsed with the csv module when it is used).  The file must not change 
+    while it is mapped.  Rows must not be used after the file is closed; convert them 
+    to lists (with the method tolist) to keep them.
+    
+    Attribute starts: The byte offset of the start of each row
+    Invariant: starts is an array of ints in ascending order
+    
+    Attribute stops: The byte offset of the end of each row (before the line ending)
+    Invariant: stops is an array of ints, the same length as starts
+    
+    Attribute quoted: The rows that have a field in quotes
+    Invariant: quoted is a set of positions of rows
+    """
+    
+    def __init__(self, filename):
+        """
+        Initializes the map of the CSV file filename.
+        
+        Parameter filename: The file to map
+        Precondition: filename is a string, referring to a file that exists, and that 
+        file is a valid CSV file (in UTF-8)
+        """
+        self._file = open(filename, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # An empty file cannot be mapped
+            self._data = b''
+        self.starts = array('q')
+        self.stops = array('q')
+        self.quoted = set()
+        if self._data.find(b'"') == -1:
+            self._scan_lines()
+        else:
+            self._scan_quoted()
+    
+    def _scan_lines(self):
+        """
+        Finds the rows of a file without quotes, where every line ending ends a row.
+        """
+        # Searching for a plain newline is much faster, so only look for '\r' if needed
+        ending = _LINE_ENDING if self._data.find(b'\r') != -1 else _NEWLINE
+        # Each row starts at the end of the line before
+        self.stops.extend(map(re.Match.start, ending.finditer(self._data)))
+        self.starts.append(0)
+        self.starts.extend(map(re.Match.end, ending.finditer(self._data)))
+        if self.starts[-1] == len(self._data):
+            self.starts.pop()
+        else: # The last row has no line ending
+            self.stops.append(len(self._data))
+    
+    def _scan_quoted(self):
+        """
+        Finds the rows of a file with quotes, where a field in quotes may span lines.
+        """
+        data = self._data
+        size = len(data)
+        start = 0
+        while start < size:
+            stop = data.find(b'\n', start)
+            stop = size if stop == -1 else stop
+            if data.find(b'"', start, stop) != -1:
+                # A newline only ends the row if the quotes balance
+                while data[start:stop].count(b'"') % 2 == 1 and stop < size:
+                    stop = data.find(b'\n', stop+1)
+                    stop = size if stop == -1 else stop
+                self.quoted.add(len(self.starts))
+            self.starts.append(start)
+            self.stops.append(stop-1 if stop > start and data[stop-1] == 13 else stop)
+            start = stop+1
+    
+    def __len__(self):
+        """
+        Returns the number of rows in this file (including the header).
+        """
+        return len(self.starts)
+    
+    def __getitem__(self, pos):
+        """
+        Returns the row at position pos as a MappedRow.
+        
+        Parameter pos: The row position
+        Precondition: pos is a valid (possibly negative) position of a row
+        """
+        if pos < 0:
+            pos += len(self.starts)
+        return MappedRow(self, pos)
+    
+    def __iter__(self):
+        """
+        Returns an iterator over the rows (as MappedRow objects) of this file.
+        """
+        for pos in range(len(self.starts)):
+            yield MappedRow(self, pos)
+    
+    def __enter__(self):
+        """
+        Returns this object, to close the file with a with statement.
+        """
+        return self
+    
+    def __exit__(self, *args):
+        """
+        Closes the file at the end of a with statement.
+        """
+        self.close()
+    
+    def close(self):
+        """
+        Closes the file (rows may no longer be used).
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+    
+    def split(self, pos):
+        """
+        Returns the fields of the row at pos, as a list of (undecoded) bytes.
+        
+        A row with a field in quotes is parsed with the csv module instead, so its 
+        fields are already strings.
+        
+        Parameter pos: The row position
+        Precondition: pos is a valid (non-negative) position of a row
+        """
+        line = self._data[self.starts[pos]:self.stops[pos]]
+        if pos in self.quoted:
+            return next(csv.reader([line.decode('utf-8')]), [])
+        return line.split(b',') if line else [] # A blank line has no fields
+
+
+class MappedRow(object):
+    """
+    A class representing a row of a MappedCSV.
+    
+    A row acts like a (read-only) list of strings: it has a length, it can be indexed 
+    and sliced, and it may be added to a list.  The row is only split into fields when
+    first used, and a field is only decoded to a string when it is accessed.
+    
+    Attribute table: The mapped file
+    Invariant: table is a MappedCSV (that is not closed)
+    
+    Attribute pos: The position of this row
+    Invariant: pos is a valid (non-negative) position of a row in table
+    """
+    __slots__ = ('table', 'pos', '_fields')
+    
+    def __init__(self, table, pos):
+        """
+        Initializes a view of the row at position pos in table.
+        
+        Parameter table: The mapped file
+        Precondition: table is a MappedCSV (that is not closed)
+        
+        Parameter pos: The position of this row
+        Precondition: pos is a valid (non-negative) position of a row in table
+        """
+        self.table = table
+        self.pos = pos
+        self._fields = None
+    
+    def _split(self):
+        """
+        Returns the (possibly undecoded) fields of this row.
+        """
+        if self._fields is None:
+            self._fields = self.table.split(self.pos)
+        return self._fields
+    
+    def __len__(self):
+        """
+        Returns the number of fields in this row.
+        """
+        return len(self._split())
+    
+    def __getitem__(self, index):
+        """
+        Returns the field (or list of fields, for a slice) at index.
+        
+        Parameter index: The field position or slice
+        Precondition: index is a valid list index or slice
+        """
+        fields = self._fields
+        if fields is None:
+            fields = self._split()
+        value = fields[index]
+        if type(value) == bytes:
+            return value.decode('utf-8')
+        elif type(value) == list:
+            return [v.decode('utf-8') if type(v) == bytes else v for v in value]
+        return value
+    
+    def __iter__(self):
+        """
+        Returns an iterator over the fields of this row.
+        """
+        return iter(self[:])
+    
+    def __add__(self, other):
+        """
+        Returns the list of the fields of this row followed by the list other.
+        
+        Parameter other: The list to add
+        Precondition: other is a list
+        """
+        return self[:]+other
+    
+    def __eq__(self, other):
+        """
+        Returns True if other is a row (or list) with the same fields.
+        
+        Parameter other: The value to compare
+        Precondition: None
+        """
+        if isinstance(other, MappedRow):
+            other = other[:]
+        return isinstance(other, list) and self[:] == other
+    
+    def __repr__(self):
+        """
+        Returns an unambiguous string representation of this row.
+        """
+        return 'MappedRow(%r)' % self[:]
+    
+    def tolist(self):
+        """
+        Returns the fields of this row as a list of strings.
+        """
+        return self[:]
+
+
+def iter_mapped_csv(filename):
+    """
+    Returns an iterator over the rows of the CSV file filename, as MappedRow objects.
+    
+    This function produces the same rows as iter_csv, but the file is memory-mapped
+    (see MappedCSV), so a field is only decoded if it is accessed.  The file is closed
+    when the iterator is exhausted (or garbage collected), after which the rows may no
+    longer be used.  Convert a row to a list (with tolist) to keep it.
+    
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a file that exists, and that file 
+    is a valid CSV file (in UTF-8)
+    """
+    with MappedCSV(filename) as table:
+        for row in table:
+            yield row
+
+
 def write_csv(data, filename):
     """
     Writes the given data out as a CSV file filename.
@@ -49,24 +352,109 @@ def write_csv(data, filename):
     converted using ISO formatting. All other objects are converted to their string
     representation.
     
+    The rows are written with a CSVWriter, so a filename ending in '.gz' is compressed.
+    
     Parameter data: The Python value to encode as a CSV file
     Precondition: data is a  2-dimensional list of strings
     
     Parameter filename: The file to read
     Precondition: filename is a string representing a path to a file with extension
-    .csv or .CSV.  The file may or may not exist.
-    """
-    head = []
-    body = []
-    for row in data[0]:
-        head.append(row)
-    for row in data[1:]:
-        body.append(row)
-    f = open(filename, 'wt')
-    wrap = csv.writer(f)
-    wrap.writerow(head)
-    wrap.writerows(body)
-    f.close()
+    .csv or .CSV (or .csv.gz).  The file may or may not exist.
+    """
+    with CSVWriter(filename) as wrap:
+        wrap.writerows(data)
+
+
+class CSVWriter(object):
+    """
+    A class for writing a CSV file one row at a time.
+    
+    A writer is a context manager, so that the file is closed at the end of a with
+    statement.  Rows may be written one at a time (writerow) or from any iterable
+    (writerows), so a large report never has to be held in memory.  The file has a 
+    large write buffer (BUFFER_SIZE), and it is gzip-compressed if requested.  The
+    (uncompressed) bytes are the same as those written by csv.writer, with '\r\n' at
+    the end of each row.
+    
+    Attribute filename: The file being written
+    Invariant: filename is a string
+    
+    Attribute count: The number of rows written so far
+    Invariant: count is an int >= 0
+    """
+    
+    def __init__(self, filename, append=False, compress=None):
+        """
+        Initializes a writer for the CSV file filename.
+        
+        If append is True, the rows are added to the end of the file (if it exists).
+        Otherwise, the file is replaced.  If compress is None, the file is compressed 
+        if filename ends in '.gz'.  A compressed file that is appended to has several 
+        gzip members, which gzip reads as one file.
+        
+        Parameter filename: The file to write
+        Precondition: filename is a string representing a path to a file
+        
+        Parameter append: Whether to add to the end of the file
+        Precondition: append is a bool
+        
+        Parameter compress: Whether to compress the file with gzip (None for auto)
+        Precondition: compress is None or a bool
+        """
+        if compress is None:
+            compress = filename.endswith('.gz')
+        mode = 'ab' if append else 'wb'
+        if compress:
+            self._raw = gzip.open(filename, mode, COMPRESS_LEVEL)
+            stream = io.BufferedWriter(self._raw, BUFFER_SIZE)
+        else:
+            self._raw = None
+            stream = open(filename, mode, buffering=BUFFER_SIZE)
+        self._file = io.TextIOWrapper(stream, newline='')
+        self._writer = csv.writer(self._file)
+        self.filename = filename
+        self.count = 0
+    
+    def __enter__(self):
+        """
+        Returns this writer, to close the file with a with statement.
+        """
+        return self
+    
+    def __exit__(self, *args):
+        """
+        Closes the file at the end of a with statement.
+        """
+        self.close()
+    
+    def writerow(self, row):
+        """
+        Writes a single row to the file.
+        
+        Parameter row: The row to write
+        Precondition: row is a list of values (converted with str, as by csv.writer)
+        """
+        self._writer.writerow(row)
+        self.count += 1
+    
+    def writerows(self, rows):
+        """
+        Writes all of the rows in rows to the file.
+        
+        Parameter rows: The rows to write
+        Precondition: rows is an iterable of lists of values
+        """
+        for row in rows:
+            self._writer.writerow(row)
+            self.count += 1
+    
+    def close(self):
+        """
+        Flushes the buffer and closes the file.
+        """
+        self._file.close()
+        if self._raw is not None:
+            self._raw.close()
 
 
 def read_json(filename):
@@ -86,12 +474,156 @@ def read_json(filename):
     return data
 
 
+def iter_json_items(filename):
+    """
+    Returns an iterator over the (key, value) pairs of the JSON object in filename.
+    
+    This function produces the same pairs as read_json(filename).items(), in file order,
+    but the file is read a block at a time and each value is parsed as soon as it is
+    complete.  So neither the text of the file nor the whole dictionary is ever held in
+    memory, only one value at a time.  Use it for large files like weather.json.
+    
+    Unlike read_json, a key that appears twice is produced twice (read_json keeps only
+    the last value).  The iterator raises a ValueError if the file is not a JSON object.
+    
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a file that exists, and that file 
+    is a valid JSON file
+    """
+    with open(filename, 'r') as jfile:
+        stream = _JSONStream(jfile)
+        if stream.peek() != '{':
+            raise ValueError('%s is not a JSON object' % repr(filename))
+        stream.pos += 1
+        if stream.peek() == '}':
+            return
+        
+        while True:
+            if stream.peek() != '"':
+                raise ValueError('%s has a malformed key' % repr(filename))
+            key = stream.value()
+            if stream.peek() != ':':
+                raise ValueError('%s has no value for the key %s' % (repr(filename), repr(key)))
+            stream.pos += 1
+            stream.peek()
+            yield (key, stream.value())
+            
+            separator = stream.peek()
+            stream.pos += 1
+            if separator == '}':
+                return
+            elif separator != ',':
+                raise ValueError('%s has a malformed object after %s' % (repr(filename), repr(key)))
+
+
+class _JSONStream(object):
+    """
+    A class representing the unread part of a JSON file, for iter_json_items.
+    
+    Attribute file: The file being read
+    Invariant: file is an open text file
+    
+    Attribute text: The text read from the file but not yet parsed (and a little before)
+    Invariant: text is a string
+    
+    Attribute pos: The position of the next character to parse
+    Invariant: pos is an int in 0..len(text)
+    
+    Attribute eof: Whether the end of the file has been read into text
+    Invariant: eof is a bool
+    """
+    
+    def __init__(self, file):
+        """
+        Initializes a stream at the start of file.
+        
+        Parameter file: The file to read
+        Precondition: file is a text file open for reading
+        """
+        self.file = file
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+    
+    def _more(self):
+        """
+        Reads the next block of the file into text, returning False at the end of file.
+        
+        The parsed text before pos is discarded, so text never holds more than a value
+        (and a block) at a time.
+        """
+        block = self.file.read(JSON_BLOCK)
+        if not block:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:]+block
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """
+        Returns the next character that is not whitespace ('' at the end of file).
+        
+        This method skips the whitespace, so pos is the position of the character.
+        """
+        while True:
+            self.pos = _JSON_SPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            elif not self._more():
+                return ''
+    
+    def value(self):
+        """
+        Returns the JSON value at pos, moving pos past it.
+        
+        A value that runs to the end of text may be incomplete (the rest of a number
+        or object may be in the next block), so it is only accepted at the end of file.
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.text, self.pos)
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more()
+
+
+def _is_strict_iso(timestamp):
+    """
+    Returns True if timestamp has one of the strict ISO formats used in our datasets.
+    
+    The strict formats are 'YYYY-MM-DD', 'YYYY-MM-DDTHH:MM:SS', and
+    'YYYY-MM-DDTHH:MM:SS+HH:MM' (the offset may also be negative).  A space may be used
+    in place of the 'T'.  This only checks the shape of the string, not whether the
+    numbers make a valid date.
+    
+    Parameter timestamp: The time stamp to check
+    Precondition: timestamp is a string
+    """
+    size = len(timestamp)
+    if size != 10 and size != 19 and size != 25:
+        return False
+    if timestamp[4] != '-' or timestamp[7] != '-':
+        return False
+    if size == 10:
+        return True
+    if timestamp[10] not in 'T ' or timestamp[13] != ':' or timestamp[16] != ':':
+        return False
+    return size == 19 or (timestamp[19] in '+-' and timestamp[22] == ':')
+
+
 def str_to_time(timestamp, tz=None):
     """
     Returns the datetime object for the given timestamp (or None if stamp is invalid)
     
-    This function should just use the parse function in dateutil.parser to
-    convert the timestamp to a datetime object.  If it is not a valid date (so
+    Strict ISO timestamps (see _is_strict_iso) are converted with the datetime
+    method fromisoformat.  Anything else uses the parse function in dateutil.parser
+    to convert the timestamp to a datetime object.  If it is not a valid date (so
     the parser crashes), this function should return None.
     
     If the timestamp has a timezone, then it should keep that timezone even if
@@ -110,17 +642,23 @@ def str_to_time(timestamp, tz=None):
     Precondition: tz is either None, a string naming a valid time zone,
     or a time zone OFFSET.
     """
-    # HINT: Use the code from the previous exercise and update the timezone
-    # Use localize if timezone is a string; otherwise replace the timezone if not None
+    # Nearly every timestamp is strict ISO, which datetime parses much faster than
+    # dateutil.  Only irregular strings need the full parser.
+    t = None
+    if type(timestamp) == str and _is_strict_iso(timestamp):
+        try:
+            t = datetime.datetime.fromisoformat(timestamp)
+        except ValueError:
+            pass
     try:
-        t = parse(timestamp)
+        if t is None:
+            t = parse(timestamp)
         if t.tzinfo is not None:
             return t # return itself if it already has tz
         else:
             if tz is not None:
                 if type(tz) == str:
-                    t_zone = timezone(tz)
-                    nt = t_zone.localize(t)
+                    nt = localize(t, tz)
                     return nt # tz as str:
                 else:
                     r = t.replace(tzinfo=tz)
@@ -132,6 +670,236 @@ def str_to_time(timestamp, tz=None):
         return None
 
 
+def epoch_to_time(epoch, offset):
+    """
+    Returns the datetime object for the given time and UTC offset.
+    
+    This undoes converting a time to its epoch seconds and UTC offset, as a cache does
+    to store times as numbers.  The result has a fixed offset timezone, just like the 
+    result of str_to_time for a strict ISO timestamp with an offset.
+    
+    Parameter epoch: The time as seconds since the epoch
+    Precondition: epoch is an int
+    
+    Parameter offset: The UTC offset of the time in seconds
+    Precondition: offset is an int
+    """
+    zone = _FIXED.get(offset)
+    if zone is None:
+        zone = datetime.timezone(datetime.timedelta(seconds=offset))
+        _FIXED[offset] = zone
+    return datetime.datetime.fromtimestamp(epoch, zone)
+
+
+def get_zone(name):
+    """
+    Returns the pytz timezone object for the given name.
+    
+    Each name is only looked up once, and the zone is then kept for later calls.
+    
+    Parameter name: The timezone name
+    Precondition: name is a string naming a valid time zone
+    """
+    zone = _ZONES.get(name)
+    if zone is None:
+        zone = timezone(name)
+        _ZONES[name] = zone
+    return zone
+
+
+def _get_day_tzinfo(name, time):
+    """
+    Returns the tzinfo of the zone name for the whole date of time (False if it changes).
+    
+    The offset of a zone only changes on the days that daylight saving time starts or
+    ends.  On every other day, the tzinfo that pytz gives the first and last instant of
+    the day is the same, and is correct for any time that day.
+    
+    Parameter name: The timezone name
+    Precondition: name is a string naming a valid time zone
+    
+    Parameter time: The time whose date is checked
+    Precondition: time is a datetime object
+    """
+    zone = get_zone(name)
+    first = zone.localize(datetime.datetime(time.year, time.month, time.day))
+    last = zone.localize(datetime.datetime(time.year, time.month, time.day, 23, 59, 59, 999999))
+    return first.tzinfo if first.tzinfo is last.tzinfo else False
+
+
+def localize(time, name):
+    """
+    Returns the naive time localized to the timezone name.
+    
+    The result is the same as the pytz method localize (with the same tzinfo object).
+    But the tzinfo for each (zone, date) is only computed once, so localizing a time is
+    usually a dictionary lookup and a replace.  On the days that the offset changes,
+    this function calls localize as normal.
+    
+    Parameter time: The time to localize
+    Precondition: time is a datetime object with no timezone
+    
+    Parameter name: The timezone name
+    Precondition: name is a string naming a valid time zone
+    """
+    key = (name, time.toordinal())
+    tzinfo = _OFFSETS.get(key)
+    if tzinfo is None:
+        tzinfo = _get_day_tzinfo(name, time)
+        _OFFSETS[key] = tzinfo
+    if tzinfo is False:
+        return get_zone(name).localize(time)
+    return time.replace(tzinfo=tzinfo)
+
+
+def localize_many(times, name):
+    """
+    Returns the list of times localized to the timezone name.
+    
+    This is the same as calling localize on each time, except that it reuses the tzinfo
+    of the previous time for a time on the same date (so a batch of times sorted by date
+    rarely needs the cache at all).  Times that already have a timezone are kept as is,
+    as in str_to_time.
+    
+    Parameter times: The times to localize
+    Precondition: times is an iterable of datetime objects
+    
+    Parameter name: The timezone name
+    Precondition: name is a string naming a valid time zone
+    """
+    result = []
+    append = result.append
+    last = None
+    tzinfo = False
+    for time in times:
+        if time.tzinfo is not None:
+            append(time)
+            continue
+        day = time.toordinal()
+        if day != last:
+            last = day
+            tzinfo = _OFFSETS.get((name, day))
+            if tzinfo is None:
+                tzinfo = _get_day_tzinfo(name, time)
+                _OFFSETS[(name, day)] = tzinfo
+        if tzinfo is False:
+            append(get_zone(name).localize(time))
+        else:
+            append(time.replace(tzinfo=tzinfo))
+    return result
+
+
+class Daycycle(object):
+    """
+    A class representing a compiled daycycle dictionary.
+    
+    Answering daytime questions directly from a daycycle dictionary means formatting
+    the date, looking up two strings, and converting them to localized times on every
+    single call.  This class does that work once for every day in the dictionary,
+    storing sunrise and sunset as seconds since the epoch in two arrays indexed by
+    day.  Checking a time is then an array index and two comparisons.
+    
+    Attribute timezone: The name of the timezone for this daycycle
+    Invariant: timezone is a string naming a valid time zone
+    
+    Attribute zone: The timezone for this daycycle
+    Invariant: zone is a pytz timezone object for the name timezone
+    
+    Attribute first: The ordinal of the first day in this daycycle
+    Invariant: first is an int (see the date method toordinal)
+    
+    Attribute sunrise: The sunrise times for each day, starting at first
+    Invariant: sunrise is an array of ints (seconds since the epoch), with the value
+    NO_DAY for any day missing from the original dictionary
+    
+    Attribute sunset: The sunset times for each day, starting at first
+    Invariant: sunset is an array of ints the same length as sunrise
+    """
+    # The value stored for days that are not in the daycycle dictionary
+    NO_DAY = -2**62
+    
+    def __init__(self, daycycle):
+        """
+        Initializes a compiled daycycle for the given daycycle dictionary.
+        
+        The daycycle may also be the compiled form of another daycycle (see to_dict), 
+        which is used as is.
+        
+        Parameter daycycle: The daycycle dictionary
+        Precondition: daycycle is a valid daycycle dictionary, as described in daytime,
+        or a dictionary returned by the method to_dict
+        """
+        self.timezone = daycycle['timezone']
+        self.zone = get_zone(self.timezone)
+        if 'sunrise' in daycycle:
+            self.first = daycycle['first']
+            self.sunrise = array('q', daycycle['sunrise'])
+            self.sunset  = array('q', daycycle['sunset'])
+            return
+        
+        days = {}
+        for year in daycycle:
+            if year.isdigit():
+                for moday in daycycle[year]:
+                    date = datetime.date(int(year), int(moday[:2]), int(moday[3:]))
+                    days[date.toordinal()] = daycycle[year][moday]
+        
+        self.first = min(days) if days else 0
+        size = max(days)-self.first+1 if days else 0
+        self.sunrise = array('q', [self.NO_DAY])*size
+        self.sunset  = array('q', [self.NO_DAY])*size
+        for day in days:
+            date = datetime.date.fromordinal(day)
+            self.sunrise[day-self.first] = self._epoch(date, days[day]['sunrise'])
+            self.sunset[day-self.first]  = self._epoch(date, days[day]['sunset'])
+    
+    def _epoch(self, date, clock):
+        """
+        Returns the seconds since the epoch for the local time clock on date.
+        
+        Parameter date: The day of the time
+        Precondition: date is a date object
+        
+        Parameter clock: The time of day in 24-hour format
+        Precondition: clock is a string of the form 'hh:mm'
+        """
+        local = datetime.datetime(date.year, date.month, date.day, int(clock[:2]), int(clock[3:5]))
+        return int(self.zone.localize(local).timestamp())
+    
+    def to_dict(self):
+        """
+        Returns the compiled form of this daycycle as a dictionary (suitable for JSON).
+        
+        The dictionary has the keys 'timezone', 'first', 'sunrise' and 'sunset', with the
+        values of those attributes (the arrays as lists).  A Daycycle made from this
+        dictionary is the same as this one, without compiling the days again.
+        """
+        return {'timezone': self.timezone, 'first': self.first,
+                'sunrise': self.sunrise.tolist(), 'sunset': self.sunset.tolist()}
+    
+    def daytime(self, time):
+        """
+        Returns true if the time takes place during the day.
+        
+        This method has the same behavior as the function daytime.  It returns None if
+        the date of time is not in this daycycle.
+        
+        Parameter time: The time to check
+        Precondition: time is a datetime object
+        """
+        pos = time.toordinal()-self.first
+        if pos < 0 or pos >= len(self.sunrise) or self.sunrise[pos] == self.NO_DAY:
+            return None
+        if time.tzinfo is None:
+            time = localize(time, self.timezone)
+        stamp = time.timestamp()
+        return self.sunrise[pos] < stamp < self.sunset[pos]
+
+
+# The compiled version of the last daycycle dictionary passed to daytime
+_LAST_DAYCYCLE = None
+
+
 def daytime(time, daycycle):
     """
     Returns true if the time takes place during the day.
@@ -164,35 +932,102 @@ def daytime(time, daycycle):
     datetime objects from this set.  If the time parameter does not have a timezone,
     we assume that it is in the same timezone as the daycycle dictionary
     
+    The sunrise and sunset used are those for the calendar date of time (in the
+    timezone of time).  If that date is not in the daycycle, this function returns
+    None.
+    
     Parameter time: The time to check
     Precondition: time is a datetime object
     
     Parameter daycycle: The daycycle dictionary
-    Precondition: daycycle is a valid daycycle dictionary, as described above
-    """
-    # HINT: Use the code from the previous exercise to get sunset AND sunrise
-    # Add a timezone to time if one is missing (the one from the daycycle)
-    if time.year >= 2015 and time.year <= 2019:
-        # if the time parameter does not have a timezone it inherits
-        # timezone from daycycle
-        dtz = timezone(daycycle['timezone'])
-        if time.tzinfo is None:
-            time = time.replace(tzinfo=dtz) # the new time with timezone inhertied
-        moday = time.strftime('%m-%d')
-        set_time = daycycle[str(time.year)][moday]['sunset']
-        rise_time = daycycle[str(time.year)][moday]['sunrise']
-
-        pset, prise = parse(str(time)+' '+set_time), parse(str(time)+' '+rise_time)
-        # remove inherited tz
-        pset, prise = pset.replace(tzinfo=None), prise.replace(tzinfo=None)
-        # assign dtz to sunset/rise
-        sunset, sunrise = dtz.localize(pset), dtz.localize(prise)
-        if time > sunrise and time < sunset:
-            return True
-        else:
-            return False
-    else:
-        return None
+    Precondition: daycycle is a valid daycycle dictionary, as described above,
+    or a Daycycle object compiled from one
+    """
+    global _LAST_DAYCYCLE
+    if isinstance(daycycle, Daycycle):
+        return daycycle.daytime(time)
+    
+    # Compile the dictionary once, reusing it for the same dictionary
+    compiled = _LAST_DAYCYCLE
+    if compiled is None or compiled[0] is not daycycle:
+        compiled = (daycycle, Daycycle(daycycle))
+        _LAST_DAYCYCLE = compiled
+    return compiled[1].daytime(time)
+
+
+class IndexedTable(list):
+    """
+    A class representing a table (2-dimensional list) with a hash index on its rows.
+    
+    This is a list, and can be used anywhere that the table returned by read_csv is
+    expected.  But it also keeps a dictionary from the identifier (first element) of 
+    each row to that row, so that get_for_id is a dictionary lookup instead of a scan.
+    It can optionally index other columns as well, for columns that are not unique.
+    
+    The indices are built when the table is created, so the table should not be 
+    modified afterwards.
+    
+    Attribute index: The rows of this table by identifier
+    Invariant: index is a dictionary mapping the first element of each row to that row.
+    If two rows share an identifier, the first one is used.
+    
+    Attribute secondary: The secondary indices of this table
+    Invariant: secondary is a dictionary mapping column positions to dictionaries.  Each
+    of those maps a value in that column to the list of rows with that value (in order).
+    """
+    
+    def __init__(self, table, secondary=()):
+        """
+        Initializes an indexed table with the rows in table.
+        
+        Parameter table: The 2-dimensional table of data
+        Precondition: table is a 2-dimension list of strings (such as one returned by
+        read_csv)
+        
+        Parameter secondary: The other columns to index (OPTIONAL)
+        Precondition: secondary is a sequence of column positions (ints)
+        """
+        super().__init__(table)
+        self.index = {}
+        for row in self:
+            if len(row) > 0 and row[0] not in self.index:
+                self.index[row[0]] = row
+        
+        self.secondary = {}
+        for column in secondary:
+            values = {}
+            for row in self:
+                if len(row) > column:
+                    values.setdefault(row[column], []).append(row)
+            self.secondary[column] = values
+    
+    def lookup(self, id):
+        """
+        Returns (a copy of) the row of this table with the given id.
+        
+        This method has the same behavior as get_for_id.  If there is no match, it
+        returns None.
+        
+        Parameter id: The identifier to find
+        Precondition: id is a string
+        """
+        row = self.index.get(id)
+        return None if row is None else list(row)
+    
+    def lookup_by(self, column, value):
+        """
+        Returns (copies of) the rows of this table with value in the given column.
+        
+        The rows are returned in the order they appear in the table.  If there is no
+        match, this method returns the empty list.
+        
+        Parameter column: The column to search
+        Precondition: column is a position given as a secondary index of this table
+        
+        Parameter value: The value to find
+        Precondition: value is a string
+        """
+        return [list(row) for row in self.secondary[column].get(value, [])]
 
 
 def get_for_id(id, table):
@@ -204,15 +1039,19 @@ def get_for_id(id, table):
     returns a COPY of that row. If there is no match, this function returns None.
     
     This function is useful for extract rows from a table of pilots, a table of instructors,
-    or even a table of planes.
+    or even a table of planes.  If table is an IndexedTable, this is a dictionary lookup 
+    instead of a search.
     
     Parameter id: The id of the student or instructor
     Precondition: id is a string
     
     Parameter table: The 2-dimensional table of data
-    Precondition: table is a non-empty 2-dimension list of strings
+    Precondition: table is a non-empty 2-dimension list of strings, or an IndexedTable
     """
+    if isinstance(table, IndexedTable):
+        return table.lookup(id)
+    
     # reach into table and extract id and return a copy
     for r in table:
         if r[0] == id:
-            return r
\ No newline at end of file
+            return list(r)
@@ -33,7 +33,33 @@ Date: 28/08/2021
 """
 import utils
 import pilots
+import resolver
+import instrument
+import bisect
 import os.path
+import concurrent.futures
+
+try:
+    import numpy
+except ImportError: # Only needed for get_weather_violations
+    numpy = None
+
+
+# UNITS
+# The number of feet in a statute mile
+FEET_PER_MILE = 5280
+# The number of knots in a meter per second
+KNOTS_PER_MPS = 1.94384
+# The cloud layers that count as a ceiling
+CEILINGS = ('broken', 'overcast', 'indefinite ceiling')
+
+# WEATHER FEATURES
+# The normalized weather features, in the order of get_weather_features
+FEATURES = ('visibility', 'wind', 'gusts', 'crosswind', 'ceiling')
+# The weather violations, in the order of their codes (see get_weather_violations)
+WEATHER_REASONS = ('', 'Visibility', 'Winds', 'Ceiling', 'Weather', 'Unknown')
+# The code for each set of bad measurements (visibility = 1, winds = 2, ceiling = 4)
+_WEATHER_CODES = (0, 1, 2, 4, 3, 4, 4, 4)
 
 
 # WEATHER FUNCTIONS
@@ -71,27 +97,8 @@ def bad_visibility(visibility,minimum):
     Parameter minimum: The minimum allowed visibility (in statute miles)
     Precondition: minimum is a float or int
     """
-    result = False
-
-    for k in visibility:
-        if visibility == 'unavailable':
-            result = True
-        elif k == 'minimum' and visibility['units'] == 'SM':
-            if visibility['minimum'] < minimum:
-                result = True
-        elif k == 'minimum' and visibility['units'] == 'FT':
-            v = visibility['minimum']
-            if v/5280 < minimum:
-                result = True
-        elif k == 'prevailing' and visibility['units'] == 'SM':
-            if visibility['prevailing'] < minimum:
-                result = True
-        elif k == 'prevailing' and visibility['units'] == 'FT':
-            v = visibility['prevailing']
-            if v/5820 < minimum:
-                result = True
-
-    return result
+    miles = get_visibility_sm(visibility)
+    return miles is None or miles < minimum
 
 
 def bad_winds(winds,maxwind,maxcross):
@@ -141,32 +148,10 @@ def bad_winds(winds,maxwind,maxcross):
     # If the “gusts” are provided, it uses that measurement in place of the (non-crosswind) speed.
     # If the winds are “calm” this function returns False. 
     # If the winds are “unavailable” this function returns true.
-    result = False
-    for w in winds:
-        if winds == 'unavailable':
-            result = True
-        elif w == 'speed' and winds['units'] == 'KT':
-            if winds['speed'] > maxwind:
-                result = True
-        elif w == 'gusts' and winds['units'] == 'KT':
-            if winds['gusts'] > maxwind:
-                result = True
-        elif w == 'speed' and winds['units'] == 'MPS':
-            wind_speeds = winds['speed']
-            if wind_speeds * 1.94384 > maxwind:
-                result = True
-        elif w == 'gusts' and winds['units'] == 'MPS':
-            gust_speeds = winds['gusts']
-            if gust_speeds * 1.94384 > maxwind:
-                result = True
-        elif w == 'crosswind' and winds['units'] == 'KT':
-            if winds['crosswind'] > maxcross:
-                result = True
-        elif w == 'crosswind' and winds['units'] == 'MPS':
-            cross_speed = winds['crosswind']
-            if cross_speed * 1.94384 > maxcross:
-                result = True
-    return result
+    speeds = get_winds_kt(winds)
+    if speeds is None:
+        return True
+    return speeds[0] > maxwind or speeds[1] > maxwind or speeds[2] > maxcross
 
 
 def bad_ceiling(ceiling,minimum):
@@ -210,23 +195,326 @@ def bad_ceiling(ceiling,minimum):
     Parameter minimum: The minimum allowed ceiling (in feet)
     Precondition: minimum is a float or int
     """
-    result = False
-
-    # If the ceiling is less than the minimum it returns True. 
-    # It returns False otherwise. 
-    # If the sky is “clear” this function returns False. 
-    # If the sky measurement is “unavailable” this function returns true.
-    if type(ceiling) == str:
-        if ceiling == 'clear':
-            result = False
-        if ceiling == 'unavailable':
-            result = True
-    else:
-        for c in ceiling:
-            if c['type'] == 'broken' or c['type'] == 'overcast' or c['type'] == 'indefinite ceiling':
-                if c['height'] < minimum:
-                    result = True
-    return result
+    height = get_ceiling_ft(ceiling)
+    return height is None or height < minimum
+
+
+def get_visibility_sm(visibility):
+    """
+    Returns the visibility in statute miles (None if it is 'unavailable')
+    
+    This is the lesser of the 'minimum' (if it exists) and 'prevailing' visibility, 
+    as that is the measurement that bad_visibility compares against a minimum.
+    
+    Parameter visibility: The visibility information
+    Precondition: visibility is a valid visibility measurement, as described in
+    bad_visibility
+    """
+    if visibility == 'unavailable':
+        return None
+    scale = FEET_PER_MILE if visibility['units'] == 'FT' else 1
+    return min(visibility.get('minimum', float('inf')), visibility['prevailing'])/scale
+
+
+def get_winds_kt(winds):
+    """
+    Returns the tuple (speed, gusts, crosswind) in knots (None if it is 'unavailable')
+    
+    A 'calm' wind has a speed of 0.  A gust or crosswind that was not measured is nan,
+    which is never greater than a maximum.
+    
+    Parameter winds: The wind speed information
+    Precondition: winds is a valid wind measurement, as described in bad_winds
+    """
+    if winds == 'unavailable':
+        return None
+    nan = float('nan')
+    if winds == 'calm':
+        return (0.0, nan, nan)
+    scale = KNOTS_PER_MPS if winds['units'] == 'MPS' else 1
+    return (winds['speed']*scale, winds.get('gusts', nan)*scale, 
+            winds.get('crosswind', nan)*scale)
+
+
+def get_ceiling_ft(ceiling):
+    """
+    Returns the ceiling in feet (None if it is 'unavailable')
+    
+    The ceiling is the lowest cloud layer that is 'broken', 'overcast', or 'indefinite 
+    ceiling'.  If the sky is 'clear', or there is no such layer, the ceiling is inf.
+    
+    Parameter ceiling: The ceiling information
+    Precondition: ceiling is a valid ceiling measurement, as described in bad_ceiling
+    """
+    if ceiling == 'unavailable':
+        return None
+    elif ceiling == 'clear':
+        return float('inf')
+    return min([layer['height'] for layer in ceiling if layer['type'] in CEILINGS]+[float('inf')])
+
+
+class WeatherRecord(object):
+    """
+    A class representing a weather report, normalized for the weather checks.
+    
+    A weather report from weather.json has visibility in feet or miles, wind in knots
+    or meters per second, and the sky as a list of cloud layers.  A record converts all
+    of this once (when the weather is loaded), so that each check is only a comparison.
+    A measurement that is 'unavailable' has its flag set to False (and a value of nan).
+    
+    Attribute visibility_sm: The visibility in statute miles (see get_visibility_sm)
+    Invariant: visibility_sm is a float
+    
+    Attribute wind_kt: The wind speed in knots (0 if calm)
+    Invariant: wind_kt is a float
+    
+    Attribute gust_kt: The gusts in knots (nan if not measured)
+    Invariant: gust_kt is a float
+    
+    Attribute cross_kt: The crosswind in knots (nan if not measured)
+    Invariant: cross_kt is a float
+    
+    Attribute ceiling_ft: The ceiling in feet (inf if clear; see get_ceiling_ft)
+    Invariant: ceiling_ft is a float
+    
+    Attribute has_visibility: Whether the visibility is available
+    Invariant: has_visibility is a bool
+    
+    Attribute has_wind: Whether the wind is available
+    Invariant: has_wind is a bool
+    
+    Attribute has_ceiling: Whether the ceiling is available
+    Invariant: has_ceiling is a bool
+    """
+    __slots__ = ('visibility_sm', 'wind_kt', 'gust_kt', 'cross_kt', 'ceiling_ft',
+                 'has_visibility', 'has_wind', 'has_ceiling')
+    
+    def __init__(self, weather):
+        """
+        Initializes a record for the given weather report.
+        
+        The weather may also be the attributes of another record (see tolist), which are
+        used as is.
+        
+        Parameter weather: The weather measure
+        Precondition: weather is dictionary containing a visibility, wind, and ceiling
+        measurement (see get_weather_violation), or a list returned by the method tolist
+        """
+        if isinstance(weather, list):
+            for name, value in zip(self.__slots__, weather):
+                setattr(self, name, value)
+            return
+        
+        nan = float('nan')
+        miles = get_visibility_sm(weather['visibility'])
+        speeds = get_winds_kt(weather['wind'])
+        height = get_ceiling_ft(weather['sky'])
+        
+        self.has_visibility = miles is not None
+        self.has_wind = speeds is not None
+        self.has_ceiling = height is not None
+        self.visibility_sm = nan if miles is None else miles
+        self.wind_kt, self.gust_kt, self.cross_kt = (nan, nan, nan) if speeds is None else speeds
+        self.ceiling_ft = nan if height is None else height
+    
+    def __repr__(self):
+        """
+        Returns an unambiguous string representation of this record.
+        """
+        values = tuple(getattr(self, name) for name in self.__slots__)
+        return 'WeatherRecord(%s)' % ', '.join('%s=%r' % item for item in zip(self.__slots__, values))
+    
+    def tolist(self):
+        """
+        Returns the attributes of this record as a list (suitable for JSON).
+        
+        The attributes are in the order of __slots__.  A WeatherRecord made from this
+        list is the same as this one.
+        """
+        return [getattr(self, name) for name in self.__slots__]
+    
+    def bad_visibility(self, minimum):
+        """
+        Returns True if the visibility violates the minimum (see bad_visibility)
+        
+        Parameter minimum: The minimum allowed visibility (in statute miles)
+        Precondition: minimum is a float or int
+        """
+        return not self.has_visibility or self.visibility_sm < minimum
+    
+    def bad_winds(self, maxwind, maxcross):
+        """
+        Returns True if the winds violate the maximums (see bad_winds)
+        
+        Parameter maxwind: The maximum allowable wind speed (in knots)
+        Precondition: maxwind is a float or int
+        
+        Parameter maxcross: The maximum allowable crosswind speed (in knots)
+        Precondition: maxcross is a float or int
+        """
+        return (not self.has_wind or self.wind_kt > maxwind or self.gust_kt > maxwind or
+                self.cross_kt > maxcross)
+    
+    def bad_ceiling(self, minimum):
+        """
+        Returns True if the ceiling violates the minimum (see bad_ceiling)
+        
+        Parameter minimum: The minimum allowed ceiling (in feet)
+        Precondition: minimum is a float or int
+        """
+        return not self.has_ceiling or self.ceiling_ft < minimum
+    
+    def features(self):
+        """
+        Returns the normalized features of this record (see get_weather_features)
+        """
+        inf = float('inf')
+        return (self.visibility_sm if self.has_visibility else -inf,
+                self.wind_kt if self.has_wind else inf, self.gust_kt, self.cross_kt,
+                self.ceiling_ft if self.has_ceiling else -inf)
+
+
+class WeatherIndex(object):
+    """
+    A class representing a weather dictionary sorted by time.
+    
+    Looking up a report in a weather dictionary is fast when the takeoff time is one of
+    its keys, but searching for the most recent report before takeoff means parsing
+    every key in the dictionary.  This class parses the keys once, sorts them, and uses
+    binary search (the bisect module) to answer that question in O(log n) time.
+    
+    Attribute weather: The original weather dictionary
+    Invariant: weather is a dictionary formatted as described in get_weather_report, or
+    None if the index was made from an iterator
+    
+    Attribute times: The report timestamps as seconds since the epoch
+    Invariant: times is a list of floats in ascending order
+    
+    Attribute reports: The weather reports for each timestamp
+    Invariant: reports is a list of weather reports, the same length as times, where
+    reports[i] is the report for times[i].  In a compact index, reports is records.
+    
+    Attribute positions: The position of each key of weather
+    Invariant: positions is a dictionary from keys of weather to positions in reports
+    
+    Attribute records: The normalized weather reports
+    Invariant: records is a list of WeatherRecord objects, the same length as reports, 
+    where records[i] is the record for reports[i]
+    """
+    
+    def __init__(self, weather, compact=False, times=None):
+        """
+        Initializes a weather index for the given weather dictionary.
+        
+        Keys that are not valid timestamps are ignored.  The weather may also be an
+        iterator over the (key, report) pairs of a weather dictionary, such as the one
+        returned by utils.iter_json_items (if a key repeats, the last report is used).
+        The reports of an iterator may also be WeatherRecord objects.
+        
+        A compact index only keeps the normalized records, not the original reports,
+        so it is much smaller.  Its method lookup returns the WeatherRecord instead of
+        the report, which get_weather_violation accepts all the same.
+        
+        If the time of each key is already known (as when the index comes from a cache),
+        they may be given as times, and the keys are not parsed again.
+        
+        Parameter weather: The weather report dictionary
+        Precondition: weather is a dictionary formatted as described in get_weather_report,
+        or an iterator over the items of such a dictionary
+        
+        Parameter compact: Whether to discard the original reports
+        Precondition: compact is a bool
+        
+        Parameter times: The time of each key as seconds since the epoch (OPTIONAL)
+        Precondition: times is None or a dictionary with the (valid) keys of weather
+        """
+        items = weather.items() if isinstance(weather, dict) else weather
+        entries = {}
+        for key, report in items:
+            if times is None:
+                time = utils.str_to_time(key)
+                stamp = None if time is None else time.timestamp()
+            else:
+                stamp = times[key]
+            if stamp is not None:
+                record = report if isinstance(report, WeatherRecord) else WeatherRecord(report)
+                entries[key] = (stamp, key, record, None if compact else report)
+        stamps = sorted(entries.values(), key=lambda entry: entry[:2])
+        
+        self.weather = weather if isinstance(weather, dict) else None
+        self.times = [stamp[0] for stamp in stamps]
+        self.positions = dict((stamps[pos][1], pos) for pos in range(len(stamps)))
+        self.records = [stamp[2] for stamp in stamps]
+        self.reports = self.records if compact else [stamp[3] for stamp in stamps]
+        self._features = None
+    
+    def features(self):
+        """
+        Returns the weather features of every record, as a NumPy array.
+        
+        The array has a row for each record (see WeatherRecord.features), in the order
+        of records, and one more row at the end for a missing report.  So position -1
+        from find picks that last row.  The array is made once, the first time that it
+        is needed.  This method requires NumPy.
+        """
+        if self._features is None:
+            rows = [record.features() for record in self.records]+[get_weather_features(None)]
+            self._features = numpy.array(rows, dtype=numpy.float64)
+        return self._features
+    
+    def __len__(self):
+        """
+        Returns the number of reports in this index.
+        """
+        return len(self.times)
+    
+    def find(self, takeoff):
+        """
+        Returns the position of the most recent weather report at or before take-off.
+        
+        The result is an index into reports (and features), or -1 if there is no such
+        report.  A report whose key matches the ISO representation of takeoff is always
+        used, just like get_weather_report.
+        
+        Parameter takeoff: The takeoff time
+        Precondition: takeoff is a datetime object with a timezone
+        """
+        pos = self.positions.get(takeoff.isoformat())
+        if pos is not None:
+            instrument.count('weather.exact')
+            return pos
+        instrument.count('weather.fallback')
+        return bisect.bisect_right(self.times, takeoff.timestamp())-1
+    
+    def lookup(self, takeoff):
+        """
+        Returns the most recent weather report at or before take-off.
+        
+        This method has the same behavior as get_weather_report.  It returns None if 
+        there is no such report.
+        
+        Parameter takeoff: The takeoff time
+        Precondition: takeoff is a datetime object with a timezone
+        """
+        pos = self.find(takeoff)
+        return None if pos == -1 else self.reports[pos]
+    
+    def lookup_record(self, takeoff):
+        """
+        Returns the WeatherRecord for the most recent report at or before take-off.
+        
+        This method is the same as lookup, except that it returns the normalized record 
+        for the report.  It returns None if there is no such report.
+        
+        Parameter takeoff: The takeoff time
+        Precondition: takeoff is a datetime object with a timezone
+        """
+        pos = self.find(takeoff)
+        return None if pos == -1 else self.records[pos]
+
+
+# The index for the last weather dictionary searched by get_weather_report
+_LAST_INDEX = None
 
 
 def get_weather_report(takeoff,weather):
@@ -300,26 +588,23 @@ def get_weather_report(takeoff,weather):
     Precondition: takeoff is a datetime object
     
     Paramater weather: The weather report dictionary 
-    Precondition: weather is a dictionary formatted as described above
+    Precondition: weather is a dictionary formatted as described above, or a
+    WeatherIndex for such a dictionary
     """
-    # HINT: Looping through the dictionary is VERY slow because it is so large
-    # You should convert the takeoff time to an ISO string and search for that first.
-    # Only loop through the dictionary as a back-up if that fails.
+    global _LAST_INDEX
+    if isinstance(weather, WeatherIndex):
+        return weather.lookup(takeoff)
     
     # Search for time in dictionary
-    # As fall back, find the closest time before takeoff
     if takeoff.isoformat() in weather:
         return weather[takeoff.isoformat()]
-    closest = None
-    for w in weather:
-        current = utils.str_to_time(w, takeoff)
-        if current < takeoff:
-            if closest is None:
-                closest = current
-            elif closest < current:
-                closest = current
-            return weather[current.isoformat()]
-    return None
+    
+    # As fall back, binary search an index (reusing it for the same dictionary)
+    index = _LAST_INDEX
+    if index is None or index.weather is not weather:
+        index = WeatherIndex(weather)
+        _LAST_INDEX = index
+    return index.lookup(takeoff)
 
 
 def get_weather_violation(weather,minimums):
@@ -373,24 +658,24 @@ def get_weather_violation(weather,minimums):
     available (e.g. weather is None).  Finally, it returns '' (the empty string) if 
     the weather is fine and there are no violations.
     
+    The weather may also be a WeatherRecord for the reading, which is faster as it 
+    has already been normalized.
+    
     Parameter weather: The weather measure
     Precondition: weather is dictionary containing a visibility, wind, and ceiling measurement,
-    or None if no weather reading is available.
+    a WeatherRecord, or None if no weather reading is available.
     
     Parameter minimums: The safety minimums for ceiling, visibility, wind, and crosswind
     Precondition: minimums is a list of four floats
     """
     if weather is None:
         return 'Unknown'
+    if not isinstance(weather, WeatherRecord):
+        weather = WeatherRecord(weather)
     
-    bad_vis, bad_wind, bad_ceil = False, False, False
-
-    if bad_visibility(weather['visibility'], minimums[1]):
-        bad_vis = True
-    if bad_ceiling(weather['sky'], minimums[0]):
-        bad_ceil = True
-    if bad_winds(weather['wind'], minimums[2], minimums[3]):
-        bad_wind = True
+    bad_vis = weather.bad_visibility(minimums[1])
+    bad_ceil = weather.bad_ceiling(minimums[0])
+    bad_wind = weather.bad_winds(minimums[2], minimums[3])
     if bad_vis and not bad_wind and not bad_ceil:
         return 'Visibility'
     if bad_wind and not bad_vis and not bad_ceil:
@@ -404,6 +689,74 @@ def get_weather_violation(weather,minimums):
         return 'Weather'
 
 
+def get_weather_features(weather):
+    """
+    Returns the normalized features of a weather report as a tuple of five floats.
+    
+    The features are in the order of FEATURES: the visibility (in statute miles), the 
+    wind speed, the gusts and the crosswind (all in knots), and the ceiling (in feet),
+    as in a WeatherRecord.  The missing measurements are chosen so that the comparisons
+    in get_weather_violations give the same answer as get_weather_violation:
+    
+        An 'unavailable' visibility or ceiling is -inf (less than any minimum)
+        An 'unavailable' wind speed is inf (greater than any maximum)
+        A 'clear' sky (or one with no ceiling layer) has a ceiling of inf
+        A gust or crosswind that was not measured is nan
+    
+    If weather is None (no report), every feature is nan.
+    
+    Parameter weather: The weather measure
+    Precondition: weather is dictionary containing a visibility, wind, and ceiling 
+    measurement, a WeatherRecord, or None if no weather reading is available.
+    """
+    if weather is None:
+        return (float('nan'),)*len(FEATURES)
+    if not isinstance(weather, WeatherRecord):
+        weather = WeatherRecord(weather)
+    return weather.features()
+
+
+def get_weather_violations(features, minimums):
+    """
+    Returns the weather violation codes for many flights at once.
+    
+    This is the batch version of get_weather_violation.  Row i of features holds the
+    normalized weather features (see get_weather_features) at the takeoff of flight i, 
+    and row i of minimums holds the minimums for that flight, in the same order as for 
+    get_weather_violation (ceiling, visibility, wind, crosswind).  The result is a NumPy 
+    array with a code for each flight, which is a position in WEATHER_REASONS.  That is,
+    WEATHER_REASONS[code] is the value that get_weather_violation would return for the 
+    same report and minimums (a row of nan features is a missing report, or 'Unknown').
+    
+    A flight may have no minimums at all (see pilots.get_minimums).  Its row of minimums
+    is None (or has a nan), and its code is 0 (okay), as in get_lesson_violation.
+    
+    This function requires NumPy.
+    
+    Parameter features: The weather features of each flight
+    Precondition: features is an n x 5 array (or 2d-list) of floats
+    
+    Parameter minimums: The safety minimums of each flight
+    Precondition: minimums is an n x 4 array (or 2d-list) of floats, where a row of a
+    2d-list may also be None
+    """
+    if not isinstance(minimums, numpy.ndarray):
+        minimums = [[float('nan')]*4 if row is None else row for row in minimums]
+    features = numpy.asarray(features, dtype=numpy.float64).reshape(-1, len(FEATURES))
+    minimums = numpy.asarray(minimums, dtype=numpy.float64).reshape(-1, 4)
+    
+    # Comparisons with nan are always False, so missing measurements are never bad
+    bad_vis = features[:, 0] < minimums[:, 1]
+    bad_wind = ((features[:, 1] > minimums[:, 2]) | (features[:, 2] > minimums[:, 2]) |
+                (features[:, 3] > minimums[:, 3]))
+    bad_ceil = features[:, 4] < minimums[:, 0]
+    
+    codes = numpy.array(_WEATHER_CODES, dtype=numpy.int8)[bad_vis*1+bad_wind*2+bad_ceil*4]
+    codes[numpy.isnan(features[:, 0])] = WEATHER_REASONS.index('Unknown')
+    codes[numpy.isnan(minimums).any(axis=1)] = 0
+    return codes
+
+
 # FILES TO AUDIT
 # Sunrise and sunset
 DAYCYCLE = 'daycycle.json'
@@ -417,7 +770,7 @@ STUDENTS = 'students.csv'
 LESSONS  = 'lessons.csv'
 
 
-def list_weather_violations(directory):
+def list_weather_violations(directory, jobs=1):
     """
     Returns the (annotated) list of flight reservations that violate weather minimums.
     
@@ -451,40 +804,322 @@ def list_weather_violations(directory):
     then it is possible it is no longer a visibility violation because it is subject to
     a different set of minimums.
     
+    If jobs is not 1, the lessons are split into date ranges, and the date ranges are
+    checked in parallel by a pool of jobs worker processes (see check_in_parallel).  
+    The result is the same, in the same order.
+    
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the files 'daycycle.json',
+    'weather.json', 'minimums.csv', 'students.csv', and 'lessons.csv'
+    
+    Parameter jobs: The number of worker processes (None for one per CPU)
+    Precondition: jobs is None or an int > 0
+    """
+    if jobs == 1:
+        return list(iter_weather_violations(directory))
+    
+    tables = load_tables(directory)
+    lessons = utils.read_csv(resolver.resolve_file(directory, LESSONS))[1:]
+    reasons = check_in_parallel(lessons, tables, jobs)
+    
+    result = []
+    for pos in range(len(lessons)):
+        if reasons[pos] != '':
+            result.append(lessons[pos]+[reasons[pos]])
+    return result
+
+
+def iter_weather_violations(directory):
+    """
+    Returns an iterator over the flight lessons that violate weather minimums.
+    
+    This is the streaming version of list_weather_violations.  It produces the same
+    (annotated) lessons in the same order, but it reads lessons.csv one row at a time
+    and produces each violation as soon as it is found.  So memory use does not grow 
+    with the number of lessons.  The other files are small and are loaded up front.
+    
     Parameter directory: The directory of files to audit
     Precondition: directory is the name of a directory containing the files 'daycycle.json',
     'weather.json', 'minimums.csv', 'students.csv', and 'lessons.csv'
     """
-    # Load in all of the files
+    tables = load_tables(directory)
+    lessons = utils.iter_csv(resolver.resolve_file(directory, LESSONS))
+    next(lessons, None) # Skip the header
+    for lesson in lessons:
+        violation = check_lesson(lesson, tables)
+        if violation != '':
+            lesson.append(violation)
+            yield lesson
+
+
+def read_weather(filename):
+    """
+    Returns a compact WeatherIndex for the weather file filename.
+    
+    The file is streamed with utils.iter_json_items, so the reports are normalized one
+    at a time, and neither the text of the file nor the weather dictionary is ever held
+    in memory.  See WeatherIndex for what a compact index returns from lookup.
+    
+    Parameter filename: The file to read
+    Precondition: filename is a string, referring to a file in the format of weather.json
+    """
+    return WeatherIndex(utils.iter_json_items(filename), True)
+
+
+def load_tables(directory):
+    """
+    Returns the tuple (students, weather, daycycle, minimums) of tables for directory.
+    
+    These are the read-only tables used to check the lessons for weather violations,
+    in their indexed forms: an IndexedTable, a WeatherIndex, a Daycycle and a 
+    MinimumsTable, respectively.
+    
+    The files are found with resolver.resolve_file, so the daycycle may be in any of the
+    formats accepted by resolver.read_daycycle, under any extension.
+    
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the files 'daycycle.json',
+    'weather.json', 'minimums.csv', and 'students.csv'
+    """
+    students = utils.IndexedTable(utils.read_csv(resolver.resolve_file(directory, STUDENTS)))
+    weather = read_weather(resolver.resolve_file(directory, WEATHER))
+    dcycle = resolver.read_daycycle(resolver.resolve_file(directory, DAYCYCLE))
+    minimums = pilots.MinimumsTable(utils.read_csv(resolver.resolve_file(directory, MINIMUMS)))
+    return (students, weather, dcycle, minimums)
+
+
+def check_lesson(lesson, tables):
+    """
+    Returns the weather violation for a single flight lesson (empty string if it is ok)
+    
+    This function looks up the takeoff time and student, and then calls 
+    get_lesson_violation.  So a lesson with no minimums is okay (see get_lesson_violation).
+    
+    Parameter lesson: The flight lesson
+    Precondition: lesson is a 7-element list of strings, in the format of lessons.csv
+    
+    Parameter tables: The tables to check against
+    Precondition: tables is a tuple returned by load_tables, except that the students 
+    may also be a dictionary of StudentRecords by student id (see get_student)
+    """
+    students, weather, dcycle, minimums = tables
+    takeoff = utils.str_to_time(lesson[3])
+    student = get_student(lesson[0], students)
+    return get_lesson_violation(lesson, takeoff, student, weather, dcycle, minimums)
+
+
+def check_lessons(lessons, tables, takeoffs=None):
+    """
+    Returns the weather violation of each lesson in lessons (empty string if it is ok)
+    
+    This is the batch version of check_lesson, with the same result for each lesson.
+    The minimums and the weather report are looked up for every lesson first, and then
+    they are all compared at once with get_weather_violations.  A lesson with no 
+    minimums is left out of the comparison, and is okay (as in get_lesson_violation).
+    This function requires NumPy.
+    
+    If the takeoff times are already known, they may be given as takeoffs, and they are
+    not parsed again.
+    
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons WITHOUT the header
+    
+    Parameter tables: The tables to check against
+    Precondition: tables is a tuple as for check_lesson
+    
+    Parameter takeoffs: The takeoff time of each lesson (OPTIONAL)
+    Precondition: takeoffs is None or a list of datetime objects, parallel to lessons
+    """
+    students, weather, dcycle, minimums = tables
+    checked = []
+    limits = []
+    found = []
+    for pos in range(len(lessons)):
+        lesson = lessons[pos]
+        takeoff = utils.str_to_time(lesson[3]) if takeoffs is None else takeoffs[pos]
+        student = get_student(lesson[0], students)
+        limit = get_lesson_minimums(lesson, takeoff, student, dcycle, minimums)
+        if limit is not None:
+            checked.append(pos)
+            limits.append(limit)
+            found.append(weather.find(takeoff))
+    
+    # Position -1 (no report) picks the features of None at the end
+    codes = get_weather_violations(weather.features()[found], limits)
+    
+    result = ['']*len(lessons)
+    for pos, code in zip(checked, codes.tolist()):
+        result[pos] = WEATHER_REASONS[code]
+    return result
+
+
+def get_student(id, students):
+    """
+    Returns the StudentRecord for the student with the given id.
     
-    # For each of the lessons
-        # Get the takeoff time
-        # Get the pilot credentials
-        # Get the pilot minimums
-        # Get the weather conditions
-        # Check for a violation and add to result if so
+    The students may be a table, as in load_tables, or a dictionary that maps each id 
+    to its StudentRecord (so the records are made once per dataset, not per lesson).
     
-    students = utils.read_csv(os.path.join(directory, STUDENTS))
-    weather = utils.read_json(os.path.join(directory, WEATHER))
-    dcycle = utils.read_json(os.path.join(directory, DAYCYCLE))
-    minimums = utils.read_csv(os.path.join(directory, MINIMUMS))
-    lessons = utils.read_csv(os.path.join(directory, LESSONS))
+    Parameter id: The id of the student
+    Precondition: id is a string
+    
+    Parameter students: The registered students
+    Precondition: students is an IndexedTable for students.csv, or a dictionary of 
+    StudentRecords by student id
+    """
+    if isinstance(students, dict):
+        return students.get(id)
+    return pilots.get_record(utils.get_for_id(id, students))
 
+
+def partition_lessons(lessons, parts):
+    """
+    Returns the positions of lessons, split into at most parts ranges of takeoff dates.
+    
+    The result is a list of lists of positions.  Every lesson belongs to exactly one 
+    list.  Each list covers a range of (local) takeoff dates that does not overlap the 
+    others, and all lessons on the same date are in the same list.  The lists are about 
+    the same size, unless a single date has too many lessons.
+    
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons WITHOUT the header
+    
+    Parameter parts: The number of partitions
+    Precondition: parts is an int > 0
+    """
+    order = sorted(range(len(lessons)), key=lambda pos: lessons[pos][3][:10])
+    size = max(1, -(-len(order)//parts))
+    
     result = []
-    for l in lessons[1:]:
-        takeoff = utils.str_to_time(l[3])
-        takeoff_time = takeoff.replace(tzinfo=None)
-        student_id = utils.get_for_id(l[0], students)
-        cert = pilots.get_certification(takeoff_time, student_id)
-        area = l[6]
-        instructed = (False if l[2] == '' else True)
-        vfr = (True if l[5] == 'VFR' else False)
-        day = utils.daytime(takeoff_time, dcycle)
-        pilot_minimums = pilots.get_minimums(cert, area, instructed, vfr, day, minimums)
+    start = 0
+    while start < len(order):
+        stop = min(start+size, len(order))
+        # Do not split a date across partitions
+        while stop < len(order) and lessons[order[stop]][3][:10] == lessons[order[stop-1]][3][:10]:
+            stop += 1
+        result.append(order[start:stop])
+        start = stop
+    return result
+
+
+# The tables of a worker process (see check_in_parallel)
+_WORKER_TABLES = None
 
+
+def _init_worker(tables):
+    """
+    Stores the tables for a worker process of check_in_parallel.
+    
+    Parameter tables: The tables to check against
+    Precondition: tables is a tuple returned by load_tables
+    """
+    global _WORKER_TABLES
+    _WORKER_TABLES = tables
+
+
+def _check_partition(lessons):
+    """
+    Returns the weather violation of each lesson, using the tables of this worker.
+    
+    The lessons are checked as a batch (with check_lessons) when NumPy is available.
+    
+    Parameter lessons: The lessons to check
+    Precondition: lessons is a list of 7-element lists of strings
+    """
+    if numpy is not None:
+        return check_lessons(lessons, _WORKER_TABLES)
+    return [check_lesson(lesson, _WORKER_TABLES) for lesson in lessons]
+
+
+def check_in_parallel(lessons, tables, jobs=None):
+    """
+    Returns the weather violation of each lesson, checked by a pool of worker processes.
+    
+    The result is a list of strings, with one element for each lesson in lessons and in 
+    the same order (as for check_lesson).  The lessons are split by partition_lessons
+    into several date ranges for each worker, so that busy dates are spread out.  The
+    tables are sent to each worker once, when it starts, and each task only sends the 
+    lessons in one date range.
+    
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons WITHOUT the header
+    
+    Parameter tables: The tables to check against
+    Precondition: tables is a tuple returned by load_tables
+    
+    Parameter jobs: The number of worker processes (None for one per CPU)
+    Precondition: jobs is None or an int > 0
+    """
+    workers = jobs if jobs is not None else (os.cpu_count() or 1)
+    parts = partition_lessons(lessons, 4*workers)
+    
+    result = ['']*len(lessons)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(tables,)) as pool:
+        tasks = [[lessons[pos] for pos in part] for part in parts]
+        for part, reasons in zip(parts, pool.map(_check_partition, tasks)):
+            for pos, reason in zip(part, reasons):
+                result[pos] = reason
+    return result
+
+
+def get_lesson_violation(lesson, takeoff, student, weather, daycycle, minimums):
+    """
+    Returns the weather violation for a single flight lesson (empty string if it is ok)
+    
+    This function gets the pilot certification, the pilot minimums, and the weather
+    conditions for the lesson, and returns the result of get_weather_violation.  The
+    takeoff time and the student are looked up by the caller, so that other audits of
+    the same lesson can share them.
+    
+    Some lessons have no minimums at all (such as a novice pilot flying solo, see
+    pilots.get_minimums).  No weather is allowed for them, so this function does not 
+    judge the weather, and returns the empty string.  Whether the flight was allowed is
+    up to the endorsement audit (which reports such a flight as 'Solo').
+    
+    Parameter lesson: The flight lesson
+    Precondition: lesson is a 7-element list of strings, in the format of lessons.csv
+    
+    Parameter takeoff: The takeoff time of this lesson
+    Precondition: takeoff is a datetime object with a timezone
+    
+    Parameter student: The student pilot of this lesson
+    Precondition: student is 10-element list of strings representing a pilot, or a
+    StudentRecord for such a list
+    
+    Parameter weather: The weather reports
+    Precondition: weather is a weather dictionary or a WeatherIndex
+    
+    Parameter daycycle: The sunrise and sunset times
+    Precondition: daycycle is a daycycle dictionary or a Daycycle
+    
+    Parameter minimums: The table of allowed minimums
+    Precondition: minimums is a 2d-list (table) in the format of minimums.csv, or a
+    MinimumsTable for such a table
+    """
+    pilot_minimums = get_lesson_minimums(lesson, takeoff, student, daycycle, minimums)
+    if pilot_minimums is None:
+        return ''
+    if isinstance(weather, WeatherIndex):
+        conditions = weather.lookup_record(takeoff)
+    else:
         conditions = get_weather_report(takeoff, weather)
-        violation = get_weather_violation(conditions, pilot_minimums)
-        if violation != '':
-            l.append(violation)
-            result.append(l)
-    return result
\ No newline at end of file
+    return get_weather_violation(conditions, pilot_minimums)
+
+
+def get_lesson_minimums(lesson, takeoff, student, daycycle, minimums):
+    """
+    Returns the weather minimums that apply to a single flight lesson.
+    
+    The result is a list of four floats (ceiling, visibility, wind, crosswind), as for 
+    pilots.get_minimums, or None if no minimums apply.  It depends on the pilot 
+    certification at takeoff, whether there is an instructor, the flight rules, the 
+    area, and the time of day.
+    
+    The parameters are the same as those of get_lesson_violation.
+    """
+    cert = pilots.get_certification(takeoff, student)
+    instructed = lesson[2] != ''
+    vfr = lesson[5] == 'VFR'
+    day = utils.daytime(takeoff, daycycle)
+    return pilots.get_minimums(cert, lesson[6], instructed, vfr, day, minimums)
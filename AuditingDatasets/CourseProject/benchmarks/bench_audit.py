@@ -0,0 +1,354 @@
+"""
+Benchmark for every stage of an audit.
+
+This script times the stages of auditing a dataset, one after the other:
+
+    load        reading and indexing every file of the dataset
+    timestamps  parsing the takeoff time of each lesson
+    daycycle    checking whether each takeoff is during the day
+    weather     finding the weather record for each takeoff
+    minimums    finding the weather minimums for each lesson
+    checks      the inspection sweep, then every check of every lesson (app.audit_lesson,
+                which parses the takeoff of each lesson again as it streams them)
+    write       writing the violations to a CSV file
+
+For each stage it reports the time, the operations per second (lessons, or rows
+written, per second) and the peak memory allocated by the stage (from a second run of
+the stage under tracemalloc, since tracing slows it down).  The datasets are copied to a
+temporary folder with their lessons repeated for each scale (see support.scale_dataset),
+so the default runs KITH-2017, KITH-2018 and KITH-2019 at 1x, 10x and 100x their size.
+
+The results are saved as JSON (by default in benchmarks/results, named for the current
+commit), so two runs can be compared with --compare to find regressions.
+
+Usage: python benchmarks/bench_audit.py [--scales 1,10,100] [--no-memory] [--output FILE] [dataset ...]
+       python benchmarks/bench_audit.py --compare OLD.json NEW.json
+"""
+import os
+import os.path
+import sys
+import array
+import json
+import shutil
+import tempfile
+import platform
+import datetime
+import subprocess
+
+import support
+import utils
+import pilots
+import resolver
+import violations
+import endorsements
+import inspections
+import app
+
+try:
+    import resource
+except ImportError:
+    # Peak memory of the process is only available on Unix
+    resource = None
+
+
+# The stages of an audit, in order
+STAGES = ('load', 'timestamps', 'daycycle', 'weather', 'minimums', 'checks', 'write')
+# The folder for the results (relative to this file)
+RESULTS = 'results'
+# The default scales of each dataset
+SCALES = (1, 10, 100)
+
+
+def load_tables(directory):
+    """
+    Returns a dictionary of the tables of the dataset directory.
+
+    The keys are the attributes of app.Dataset, except records, inspections, takeoffs 
+    and offsets (which are the work of later stages), plus 'lessons' and 'repairs'.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+    """
+    path = lambda name: resolver.resolve_file(directory, name)
+    tables = {}
+    tables['students'] = utils.IndexedTable(utils.read_csv(path(violations.STUDENTS)))
+    tables['teachers'] = utils.IndexedTable(utils.read_csv(path(endorsements.TEACHERS)))
+    tables['planes'] = utils.IndexedTable(utils.read_csv(path(endorsements.PLANES)))
+    tables['weather'] = violations.read_weather(path(violations.WEATHER))
+    tables['daycycle'] = resolver.read_daycycle(path(violations.DAYCYCLE))
+    tables['minimums'] = pilots.MinimumsTable(utils.read_csv(path(violations.MINIMUMS)))
+    lessons = utils.read_csv(path(violations.LESSONS))
+    tables['header'] = lessons[0]
+    tables['lessons'] = lessons[1:]
+    tables['repairs'] = utils.read_csv(path(inspections.REPAIRS))
+    return tables
+
+
+def parse_takeoffs(lessons):
+    """
+    Returns the takeoff time of each lesson.
+
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons WITHOUT the header
+    """
+    return [utils.str_to_time(lesson[3]) for lesson in lessons]
+
+
+def check_daytime(takeoffs, daycycle):
+    """
+    Returns whether each takeoff is during the day.
+
+    Parameter takeoffs: The takeoff times
+    Precondition: takeoffs is a list of datetime objects
+
+    Parameter daycycle: The sunrise and sunset times
+    Precondition: daycycle is a Daycycle
+    """
+    return [daycycle.daytime(takeoff) for takeoff in takeoffs]
+
+
+def lookup_weather(takeoffs, weather):
+    """
+    Returns the weather record for each takeoff.
+
+    Parameter takeoffs: The takeoff times
+    Precondition: takeoffs is a list of datetime objects
+
+    Parameter weather: The hourly weather reports
+    Precondition: weather is a WeatherIndex
+    """
+    return [weather.lookup_record(takeoff) for takeoff in takeoffs]
+
+
+def lookup_minimums(tables, takeoffs):
+    """
+    Returns the weather minimums for each lesson.
+
+    Parameter tables: The tables of the dataset
+    Precondition: tables is a dictionary returned by load_tables
+
+    Parameter takeoffs: The takeoff time of each lesson
+    Precondition: takeoffs is a list of datetime objects, parallel to tables['lessons']
+    """
+    result = []
+    for pos in range(len(takeoffs)):
+        lesson = tables['lessons'][pos]
+        student = pilots.get_record(utils.get_for_id(lesson[0], tables['students']))
+        result.append(violations.get_lesson_minimums(lesson, takeoffs[pos], student,
+                                                     tables['daycycle'], tables['minimums']))
+    return result
+
+
+def audit_lessons(tables, takeoffs):
+    """
+    Returns the (annotated) violations of every lesson, as in app.iter_violations.
+
+    The lessons come from tables instead of being streamed from the file, and their
+    takeoff times from the earlier stage, so that this stage does not include reading
+    or parsing them.
+
+    Parameter tables: The tables of the dataset
+    Precondition: tables is a dictionary returned by load_tables
+
+    Parameter takeoffs: The takeoff time of each lesson
+    Precondition: takeoffs is a list of datetime objects, parallel to tables['lessons']
+    """
+    dataset = app.Dataset.__new__(app.Dataset)
+    for name in tables:
+        if name not in ('lessons', 'repairs'):
+            setattr(dataset, name, tables[name])
+    dataset._lessons = tables['lessons']
+    dataset.records = dict((row[0], pilots.get_record(row)) for row in reversed(tables['students'][1:]))
+    dataset.takeoffs = array.array('q', [int(takeoff.timestamp()) for takeoff in takeoffs])
+    dataset.offsets = array.array('i', [int(takeoff.utcoffset().total_seconds()) for takeoff in takeoffs])
+    dataset.inspections = inspections.get_inspection_violations(tables['lessons'], tables['planes'],
+                                                                 tables['repairs'])
+    return list(app.iter_violations(dataset))
+
+
+def write_violations(header, rows, filename):
+    """
+    Writes the violations to the CSV file filename, returning the number of rows.
+
+    Parameter header: The header of the lessons file
+    Precondition: header is a list of strings
+
+    Parameter rows: The violations
+    Precondition: rows is a 2d-list of annotated lessons
+
+    Parameter filename: The file to write
+    Precondition: filename is a string that is a valid file name
+    """
+    with utils.CSVWriter(filename) as wrap:
+        wrap.writerow(header+['REASON'])
+        wrap.writerows(rows)
+    return len(rows)
+
+
+def run_stage(results, name, ops, memory, func, *args):
+    """
+    Returns the result of func on args, recording the timings of the stage in results.
+
+    Parameter results: The results of each stage so far
+    Precondition: results is a dictionary from stage names to dictionaries
+
+    Parameter name: The name of the stage
+    Precondition: name is a string in STAGES
+
+    Parameter ops: The number of operations of the stage
+    Precondition: ops is an int >= 0, or a function computing it from the result
+
+    Parameter memory: Whether to measure the peak memory of the stage
+    Precondition: memory is a bool
+
+    Parameter func: The stage
+    Precondition: func is callable with the arguments args
+    """
+    result, secs = support.timed(func, *args)
+    ops = ops(result) if callable(ops) else ops
+    record = {'seconds': secs, 'ops': ops, 'ops_per_sec': ops/secs if secs else None}
+    if memory:
+        record['peak_mb'] = support.measure(func, *args)[2]/2**20
+    results[name] = record
+    print('    %-10s %9.3f s %12.0f ops/s%s' % (name, secs, record['ops_per_sec'] or 0,
+          ' %9.1f MB peak' % record['peak_mb'] if memory else ''))
+    return result
+
+
+def bench_dataset(directory, scale, memory):
+    """
+    Returns the results of the benchmark on one dataset at one scale, printing them.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+
+    Parameter scale: The number of copies of each lesson
+    Precondition: scale is an int > 0
+
+    Parameter memory: Whether to measure the peak memory of each stage
+    Precondition: memory is a bool
+    """
+    name = os.path.basename(os.path.normpath(directory))
+    folder = tempfile.mkdtemp()
+    try:
+        support.scale_dataset(directory, scale, folder)
+        print('  %s x%d' % (name, scale))
+        results = {}
+        tables = run_stage(results, 'load', lambda tables: len(tables['lessons']), memory,
+                           load_tables, folder)
+        lessons = len(tables['lessons'])
+
+        takeoffs = run_stage(results, 'timestamps', lessons, memory, parse_takeoffs, tables['lessons'])
+        run_stage(results, 'daycycle', lessons, memory, check_daytime, takeoffs, tables['daycycle'])
+        run_stage(results, 'weather', lessons, memory, lookup_weather, takeoffs, tables['weather'])
+        run_stage(results, 'minimums', lessons, memory, lookup_minimums, tables, takeoffs)
+        rows = run_stage(results, 'checks', lessons, memory, audit_lessons, tables, takeoffs)
+        output = os.path.join(folder, 'violations.csv')
+        run_stage(results, 'write', len(rows), memory, write_violations, tables['header'], rows, output)
+    finally:
+        shutil.rmtree(folder)
+    return {'dataset': name, 'scale': scale, 'lessons': lessons, 'violations': len(rows),
+            'stages': results}
+
+
+def get_commit():
+    """
+    Returns the (short) hash of the current commit, or None if it is unknown.
+    """
+    try:
+        found = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=support.ROOT,
+                               capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return found.stdout.strip() or None
+
+
+def get_environment():
+    """
+    Returns a dictionary describing the machine and commit of this run.
+    """
+    result = {'commit': get_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(), 'platform': platform.platform()}
+    if violations.numpy is not None:
+        result['numpy'] = violations.numpy.__version__
+    return result
+
+
+def compare(before, after):
+    """
+    Prints the change in time of every stage between two result files.
+
+    Parameter before: The older result file
+    Precondition: before is a string naming a JSON file written by this script
+
+    Parameter after: The newer result file
+    Precondition: after is a string naming a JSON file written by this script
+    """
+    with open(before) as f:
+        old = json.load(f)
+    with open(after) as f:
+        new = json.load(f)
+    print('%s -> %s' % (old['environment']['commit'], new['environment']['commit']))
+    runs = dict(((run['dataset'], run['scale']), run) for run in old['runs'])
+    for run in new['runs']:
+        key = (run['dataset'], run['scale'])
+        if key not in runs:
+            continue
+        print('  %s x%d' % key)
+        for stage in STAGES:
+            if stage in run['stages'] and stage in runs[key]['stages']:
+                secs = runs[key]['stages'][stage]['seconds'], run['stages'][stage]['seconds']
+                ratio = secs[1]/secs[0] if secs[0] else float('nan')
+                flag = '  SLOWER' if ratio > 1.1 else ''
+                print('    %-10s %9.3f s -> %9.3f s  %6.2fx%s' % (stage, secs[0], secs[1], ratio, flag))
+
+
+def main(args):
+    """
+    Runs the benchmark with the options in args.
+
+    Parameter args: The command line arguments (minus the script name)
+    Precondition: args is a list of strings
+    """
+    if args[:1] == ['--compare'] and len(args) == 3:
+        compare(args[1], args[2])
+        return
+
+    scales, memory, output, names = SCALES, True, None, []
+    pos = 0
+    while pos < len(args):
+        if args[pos] == '--scales':
+            scales = tuple(int(scale) for scale in args[pos+1].split(','))
+            pos += 1
+        elif args[pos] == '--no-memory':
+            memory = False
+        elif args[pos] == '--output':
+            output = args[pos+1]
+            pos += 1
+        else:
+            names.append(args[pos])
+        pos += 1
+    if not names:
+        names = ['KITH-2017', 'KITH-2018', 'KITH-2019']
+
+    environment = get_environment()
+    runs = []
+    for name in names:
+        for scale in scales:
+            runs.append(bench_dataset(support.dataset_path(name), scale, memory))
+    result = {'environment': environment, 'runs': runs}
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux
+        result['maxrss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/2**10
+
+    if output is None:
+        folder = os.path.join(os.path.split(os.path.abspath(__file__))[0], RESULTS)
+        os.makedirs(folder, exist_ok=True)
+        output = os.path.join(folder, '%s.json' % (environment['commit'] or 'latest'))
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print('Results saved to %s' % output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,150 @@
+"""
+Benchmark for the inspection audit.
+
+This script compares inspections.get_inspection_violations (which sweeps through the
+history of each plane once) against a nested loop that, for each lesson, scans every
+repair and every other lesson.  The nested loop is the approach the inspections module
+warns about, and it is kept here as the baseline.
+
+The nested loop is slow, so it is timed on a sample of the lessons and extrapolated to
+the full dataset.  The sampled lessons are also checked against the sweep.
+
+When NumPy is available, the sweep is also timed on a LessonTable (as app.Dataset does
+it), including reading the lessons into the table, and checked against the sweep.
+
+Usage: python benchmarks/bench_inspections.py [--sample N] [dataset ...]
+"""
+import os.path
+import sys
+import random
+
+import support
+import utils
+import inspections
+
+try:
+    from lessons import LessonTable
+except ImportError: # The module lessons requires NumPy
+    LessonTable = None
+
+
+def nested_violation(pos, lessons, times, planes, repairs):
+    """
+    Returns the inspection violation for the lesson at pos, using a nested loop.
+
+    Parameter pos: The position of the lesson
+    Precondition: pos is a valid index of lessons
+
+    Parameter lessons: The flight lessons
+    Precondition: lessons is a 2d-list of lessons WITHOUT the header
+
+    Parameter times: The local takeoff and landing time of each lesson
+    Precondition: times is a list of pairs of datetimes, parallel to lessons
+
+    Parameter planes: The planes in the flight school
+    Precondition: planes is a 2d-list (table) in the format of fleet.csv
+
+    Parameter repairs: The repairs, with local in and out times
+    Precondition: repairs is a list of tuples (tailno, timein, timeout, description)
+    """
+    tailno = lessons[pos][1]
+    takeoff, landing = times[pos]
+    plane = utils.get_for_id(tailno, planes)
+    if plane is None:
+        return ''
+    annual = inspections.get_local_time(plane[5])
+    hours = float(plane[6])
+
+    reset = None
+    grounded = False
+    for repair in repairs:
+        if repair[0] == tailno and repair[1] <= takeoff:
+            if reset is None or reset < repair[1]:
+                reset = repair[1]
+            if repair[3] == inspections.ANNUAL and annual < repair[1]:
+                annual = repair[1]
+            grounded = grounded or takeoff < repair[2]
+
+    if reset is not None:
+        hours = 0
+    for other in range(len(lessons)):
+        start, stop = times[other]
+        if lessons[other][1] == tailno and start < takeoff and (reset is None or reset <= start):
+            hours += inspections.get_flight_hours(start, stop)
+    hours += inspections.get_flight_hours(takeoff, landing)
+
+    found = []
+    if (takeoff-annual).days > inspections.MAX_DAYS:
+        found.append('Annual')
+    if hours > inspections.MAX_HOURS:
+        found.append('Inspection')
+    if grounded:
+        found.append('Grounded')
+    return '' if len(found) == 0 else found[0] if len(found) == 1 else 'Maintenance'
+
+
+def bench_dataset(directory, sample):
+    """
+    Runs the inspection benchmark on one dataset, printing the results.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+
+    Parameter sample: The number of lessons to time with the nested loop
+    Precondition: sample is an int > 0
+    """
+    lessons = utils.read_csv(os.path.join(directory, inspections.LESSONS))
+    header, lessons = lessons[0], lessons[1:]
+    planes = utils.read_csv(os.path.join(directory, inspections.PLANES))
+    repairs = utils.read_csv(os.path.join(directory, inspections.REPAIRS))
+
+    local = inspections.get_local_time
+    times = [(local(l[3]), local(l[4])) for l in lessons]
+    shop = [(r[0], local(r[1]), local(r[2]), r[3]) for r in repairs[1:]]
+    chosen = random.Random(0).sample(range(len(lessons)), min(sample, len(lessons)))
+    slow, secs = support.timed(lambda: [nested_violation(p, lessons, times, planes, shop) for p in chosen])
+    nested = secs*len(lessons)/len(chosen)
+
+    fast, sweep = support.timed(inspections.get_inspection_violations, lessons, planes, repairs)
+    wrong = [chosen[i] for i in range(len(chosen)) if slow[i] != fast[chosen[i]]]
+
+    print('%s: %d lessons, %d repairs, %d violations' %
+          (os.path.basename(os.path.normpath(directory)), len(lessons), len(repairs)-1,
+           len(fast)-fast.count('')))
+    print('  nested loop    %9.3f s (extrapolated from %d lessons)' % (nested, len(chosen)))
+    print('  sweep          %9.3f s' % sweep)
+    print('  speedup        %9.1fx' % (nested/sweep))
+    if wrong:
+        print('  MISMATCHES: %d (first at lesson %d)' % (len(wrong), wrong[0]))
+    if LessonTable is not None:
+        sweep_table = lambda: inspections.get_inspection_violations(LessonTable([header]+lessons),
+                                                                    planes, repairs)
+        result, columns = support.timed(sweep_table)
+        print('  LessonTable    %9.3f s (%.1fx the sweep, %s results)' %
+              (columns, sweep/columns, 'same' if result == fast else 'DIFFERENT'))
+
+
+def main(args):
+    """
+    Runs the benchmark for the datasets named in args.
+
+    Parameter args: The command line arguments (minus the script name)
+    Precondition: args is a list of strings
+    """
+    sample, names = 500, []
+    pos = 0
+    while pos < len(args):
+        if args[pos] == '--sample':
+            sample = int(args[pos+1])
+            pos += 1
+        else:
+            names.append(args[pos])
+        pos += 1
+    if not names:
+        names = ['KITH-2017', 'KITH-2018', 'KITH-2019']
+    for name in names:
+        bench_dataset(support.dataset_path(name), sample)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,99 @@
+"""
+Benchmark for the memory used to load weather.json in the auditor.
+
+This script compares the original weather loader (utils.read_json, which reads the
+whole file into a string and then parses it into a dictionary of dictionaries, which
+is then indexed by violations.WeatherIndex) against violations.read_weather, which
+streams the file with utils.iter_json_items straight into a compact WeatherIndex.
+
+Memory is measured with tracemalloc, so it counts the Python allocations made while
+loading (the peak) and those still held by the index afterwards (retained).  The
+weather file is synthetic, with an hourly report for every year requested, and is
+written in the same pretty-printed format as the real files.
+
+Usage: python benchmarks/bench_json.py [--years N] [--gaps F] [--keep FILE]
+"""
+import os
+import os.path
+import sys
+import json
+import tempfile
+
+import support
+import utils
+import violations
+
+
+def eager_weather(filename):
+    """
+    Returns a WeatherIndex for filename using the original (non-streaming) loader.
+
+    Parameter filename: The weather file
+    Precondition: filename is a string, referring to a file in the format of weather.json
+    """
+    return violations.WeatherIndex(utils.read_json(filename))
+
+
+def write_weather(filename, years, gaps):
+    """
+    Writes a synthetic weather file covering the given number of years.
+
+    Parameter filename: The file to write
+    Precondition: filename is a string that is a valid file name
+
+    Parameter years: The number of years
+    Precondition: years is an int > 0
+
+    Parameter gaps: The fraction of hours missing from the weather
+    Precondition: gaps is a float in [0,1)
+    """
+    weather = support.synthetic_weather(list(range(2017, 2017+years)), 'America/New_York', gaps)
+    with open(filename, 'w') as f:
+        json.dump(weather, f, indent=1)
+    return len(weather)
+
+
+def main(args):
+    """
+    Runs the benchmark with the options in args.
+
+    Parameter args: The command line arguments (minus the script name)
+    Precondition: args is a list of strings
+    """
+    years, gaps, keep = 5, 0.05, None
+    pos = 0
+    while pos < len(args):
+        if args[pos] == '--years':
+            years = int(args[pos+1])
+        elif args[pos] == '--gaps':
+            gaps = float(args[pos+1])
+        elif args[pos] == '--keep':
+            keep = args[pos+1]
+        else:
+            print(__doc__.split('\n\n')[-2])
+            return
+        pos += 2
+
+    filename = keep if keep else os.path.join(tempfile.mkdtemp(), violations.WEATHER)
+    try:
+        count = write_weather(filename, years, gaps)
+        size = os.path.getsize(filename)
+        print('weather.json: %d years, %d reports, %.1f MB' % (years, count, size/2**20))
+        results = []
+        for name, func in [('read_json+WeatherIndex', eager_weather),
+                           ('read_weather (stream)', violations.read_weather)]:
+            index, secs, peak, held = support.measure(func, filename)
+            assert len(index) == count
+            results.append(peak)
+            print('  %-24s %7.3f s  peak %8.1f MB  retained %8.1f MB' %
+                  (name, secs, peak/2**20, held/2**20))
+            del index
+        print('  peak reduction           %7.1fx' % (results[0]/results[1]))
+    finally:
+        if not keep:
+            os.remove(filename)
+            os.rmdir(os.path.dirname(filename))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
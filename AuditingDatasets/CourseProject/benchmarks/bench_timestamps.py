@@ -0,0 +1,73 @@
+"""
+Microbenchmark for timestamp parsing in the auditor.
+
+This script gathers every timestamp in the datasets (lesson takeoffs and landings,
+student certification dates, fleet annuals, and repair dates) and parses them all
+with utils.str_to_time and with dateutil alone, checking that the results agree.
+
+Usage: python benchmarks/bench_timestamps.py [--repeat N] [dataset ...]
+"""
+import os.path
+import sys
+
+import support
+import utils
+from dateutil.parser import parse
+
+
+def dataset_timestamps(directory):
+    """
+    Returns a list of all timestamp strings in the dataset directory.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+    """
+    stamps = []
+    for row in utils.read_csv(os.path.join(directory, 'lessons.csv'))[1:]:
+        stamps.extend(row[3:5])
+    for row in utils.read_csv(os.path.join(directory, 'students.csv'))[1:]:
+        stamps.extend(col for col in row[3:] if col != '')
+    for row in utils.read_csv(os.path.join(directory, 'fleet.csv'))[1:]:
+        stamps.append(row[5])
+    for row in utils.read_csv(os.path.join(directory, 'repairs.csv'))[1:]:
+        stamps.extend(row[1:3])
+    return stamps
+
+
+def main(args):
+    """
+    Runs the benchmark for the datasets named in args.
+
+    Parameter args: The command line arguments (minus the script name)
+    Precondition: args is a list of strings
+    """
+    repeat, names = 3, []
+    pos = 0
+    while pos < len(args):
+        if args[pos] == '--repeat':
+            repeat = int(args[pos+1])
+            pos += 1
+        else:
+            names.append(args[pos])
+        pos += 1
+    if not names:
+        names = ['KITH-2017', 'KITH-2018', 'KITH-2019']
+
+    stamps = []
+    for name in names:
+        stamps.extend(dataset_timestamps(support.dataset_path(name)))
+
+    slow = min(support.timed(lambda: [parse(s) for s in stamps])[1] for x in range(repeat))
+    fast = min(support.timed(lambda: [utils.str_to_time(s) for s in stamps])[1] for x in range(repeat))
+
+    wrong = [s for s in stamps if utils.str_to_time(s) != parse(s)]
+    print('%d timestamps from %s (best of %d)' % (len(stamps), ', '.join(names), repeat))
+    print('  dateutil.parser.parse  %8.3f s  %10.0f/s' % (slow, len(stamps)/slow))
+    print('  utils.str_to_time      %8.3f s  %10.0f/s' % (fast, len(stamps)/fast))
+    print('  speedup                %8.1fx' % (slow/fast))
+    if wrong:
+        print('  MISMATCHES: %d (first %s)' % (len(wrong), repr(wrong[0])))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
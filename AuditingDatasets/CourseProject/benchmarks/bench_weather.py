@@ -0,0 +1,198 @@
+"""
+Benchmark for weather report lookup in the auditor.
+
+This script compares the original weather lookup (an exact key match, falling back
+to a scan that parses every key of weather.json) against violations.WeatherIndex,
+over the takeoff times of every lesson in a dataset.  The sample datasets do not ship
+a weather.json, so if one is missing this script synthesizes an hourly year of reports
+with some hours missing (so that the fallback path is actually exercised).
+
+The scan is far too slow to run for every lesson, so its fallback is timed on a sample
+of the lessons that miss an exact key and extrapolated to the full dataset.
+
+The lookup is only part of an audit, so this script also times the whole weather audit
+of the dataset, before and after.  The audit before is scan_weather_violations, which
+is list_weather_violations with the original weather dictionary and linear scan.  The 
+audit after is list_weather_violations itself.  Both load every file they need, and 
+audit every lesson (nothing is extrapolated).
+
+Usage: python benchmarks/bench_weather.py [--sample N] [--gaps F] [dataset ...]
+"""
+import os.path
+import sys
+import json
+import random
+import shutil
+import tempfile
+
+import support
+import utils
+import pilots
+import resolver
+import violations
+
+
+def scan_weather_report(takeoff, weather):
+    """
+    Returns a weather report using the original linear scan of get_weather_report.
+
+    This is the lookup before WeatherIndex, kept here as the benchmark baseline.
+
+    Parameter takeoff: The takeoff time
+    Precondition: takeoff is a datetime object with a timezone
+
+    Parameter weather: The weather report dictionary
+    Precondition: weather is a dictionary formatted as in weather.json
+    """
+    if takeoff.isoformat() in weather:
+        return weather[takeoff.isoformat()]
+    for w in weather:
+        current = utils.str_to_time(w, takeoff)
+        if current < takeoff:
+            return weather[current.isoformat()]
+    return None
+
+
+def scan_weather_violations(directory):
+    """
+    Returns the weather violations of directory, using the original weather lookup.
+
+    This is list_weather_violations (with one job) before WeatherIndex: the weather is
+    the dictionary of weather.json, and each report is found with scan_weather_report.
+    Everything else is the same as list_weather_violations, so the two only differ in
+    how the weather is loaded and searched.
+
+    Parameter directory: The directory of files to audit
+    Precondition: directory is the name of a directory containing the dataset files
+    """
+    students = utils.IndexedTable(utils.read_csv(resolver.resolve_file(directory, violations.STUDENTS)))
+    weather = utils.read_json(resolver.resolve_file(directory, violations.WEATHER))
+    dcycle = resolver.read_daycycle(resolver.resolve_file(directory, violations.DAYCYCLE))
+    minimums = pilots.MinimumsTable(utils.read_csv(resolver.resolve_file(directory, violations.MINIMUMS)))
+    lessons = utils.iter_csv(resolver.resolve_file(directory, violations.LESSONS))
+    next(lessons, None)
+
+    result = []
+    for lesson in lessons:
+        takeoff = utils.str_to_time(lesson[3])
+        student = pilots.get_record(utils.get_for_id(lesson[0], students))
+        limits = violations.get_lesson_minimums(lesson, takeoff, student, dcycle, minimums)
+        if limits is not None:
+            reason = violations.get_weather_violation(scan_weather_report(takeoff, weather), limits)
+            if reason != '':
+                result.append(lesson+[reason])
+    return result
+
+
+def bench_audit(directory, weather):
+    """
+    Times the weather audit of directory before and after WeatherIndex, printing the results.
+
+    The dataset is copied to a temporary folder with the given weather, so that both
+    audits read the same weather.json.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+
+    Parameter weather: The weather dictionary to audit with
+    Precondition: weather is a dictionary formatted as in weather.json
+    """
+    folder = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(folder, violations.WEATHER), 'w') as f:
+            json.dump(weather, f)
+        support.scale_dataset(directory, 1, folder)
+        before, slow = support.timed(scan_weather_violations, folder)
+        after, fast = support.timed(violations.list_weather_violations, folder, 1)
+    finally:
+        shutil.rmtree(folder)
+
+    same = 'same' if before == after else 'DIFFERENT'
+    print('  full audit     %9.3f s before, %.3f s after (%.1fx, %d violations, %s results)' %
+          (slow, fast, slow/fast, len(after), same))
+
+
+def load_weather(directory, takeoffs, gaps):
+    """
+    Returns the weather dictionary for this dataset (synthetic if there is none).
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+
+    Parameter takeoffs: The takeoff times of the lessons
+    Precondition: takeoffs is a non-empty list of datetime objects
+
+    Parameter gaps: The fraction of hours missing from synthetic weather
+    Precondition: gaps is a float in [0,1)
+    """
+    path = os.path.join(directory, violations.WEATHER)
+    if os.path.isfile(path):
+        return utils.read_json(path)
+    years = sorted(set(t.year for t in takeoffs))
+    return support.synthetic_weather(years, 'America/New_York', gaps)
+
+
+def bench_dataset(directory, sample, gaps):
+    """
+    Runs the weather lookup benchmark on one dataset, printing the results.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+
+    Parameter sample: The number of lessons to time with the linear scan
+    Precondition: sample is an int > 0
+
+    Parameter gaps: The fraction of hours missing from synthetic weather
+    Precondition: gaps is a float in [0,1)
+    """
+    lessons = utils.read_csv(os.path.join(directory, violations.LESSONS))[1:]
+    takeoffs = [utils.str_to_time(l[3]) for l in lessons]
+    weather = load_weather(directory, takeoffs, gaps)
+
+    # Exact hits are cheap, so only sample the lookups that fall back to the scan
+    hits = [t for t in takeoffs if t.isoformat() in weather]
+    misses = [t for t in takeoffs if t.isoformat() not in weather]
+    chosen = random.Random(0).sample(misses, min(sample, len(misses)))
+    scan, secs = support.timed(lambda: [scan_weather_report(t, weather) for t in chosen])
+    scan_total = secs*len(misses)/max(len(chosen), 1)
+    scan, secs = support.timed(lambda: [scan_weather_report(t, weather) for t in hits])
+    scan_total += secs
+
+    index, build = support.timed(violations.WeatherIndex, weather)
+    found, look = support.timed(lambda: [index.lookup(t) for t in takeoffs])
+
+    print('%s: %d lessons, %d weather reports, %d lookups fall back' %
+          (os.path.basename(os.path.normpath(directory)), len(takeoffs), len(weather), len(misses)))
+    print('  linear scan    %9.3f s (fallback extrapolated from %d lessons)' % (scan_total, len(chosen)))
+    print('  WeatherIndex   %9.3f s (%.3f s build + %.3f s lookup)' % (build+look, build, look))
+    print('  speedup        %9.1fx' % (scan_total/(build+look)))
+    bench_audit(directory, weather)
+
+
+def main(args):
+    """
+    Runs the benchmark for the datasets named in args.
+
+    Parameter args: The command line arguments (minus the script name)
+    Precondition: args is a list of strings
+    """
+    sample, gaps, names = 20, 0.05, []
+    pos = 0
+    while pos < len(args):
+        if args[pos] == '--sample':
+            sample = int(args[pos+1])
+            pos += 1
+        elif args[pos] == '--gaps':
+            gaps = float(args[pos+1])
+            pos += 1
+        else:
+            names.append(args[pos])
+        pos += 1
+    if not names:
+        names = ['KITH-2017', 'KITH-2018', 'KITH-2019']
+    for name in names:
+        bench_dataset(support.dataset_path(name), sample, gaps)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
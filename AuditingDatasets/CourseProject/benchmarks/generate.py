@@ -0,0 +1,521 @@
+"""
+Generator for synthetic flight school datasets.
+
+The sample datasets have only a few thousand lessons a year, which is too small to show
+how the auditor scales.  This script writes a complete dataset directory (every file
+read by an audit) at any scale: the number of students, instructors and planes, the
+years covered and the lessons flown per day are all options.  The lessons are streamed
+to disk, so millions of lessons take little memory.
+
+The data is random but deterministic: the same options and seed always produce the
+same files.  It is built to exercise every check of the audit.  Students progress
+through their certifications (and fly planes they are not endorsed for, or fly alone 
+when they may not), planes come due
+for inspections and go in for repairs, and the hourly weather has missing hours,
+'unavailable' measurements and mixed units (see support.synthetic_weather).  The
+sunrise and sunset times are computed for the location of the school, and can be
+written as JSON (like daycycle.json) or as a CSV table (see resolver.read_daycycle).
+
+For example, this writes a dataset of about 1.2 million lessons, and then benchmarks it:
+
+    python benchmarks/generate.py /tmp/big --years 2015-2020 --lessons-per-day 550 \\
+        --students 20000 --instructors 250 --fleet 300
+    python benchmarks/bench_audit.py --scales 1 /tmp/big
+
+Usage: python benchmarks/generate.py folder [--seed N] [--years Y1-Y2] [--lessons-per-day N]
+       [--students N] [--instructors N] [--fleet N] [--gaps F] [--daycycle json|csv]
+"""
+import os
+import os.path
+import sys
+import json
+import math
+import random
+import datetime
+
+import support
+import utils
+import violations
+import endorsements
+import inspections
+
+import pytz
+
+
+# THE SCHOOL
+# The location of the school (latitude and longitude in degrees, east is positive)
+LOCATION = ('Ithaca', 'New York', 42.44, -76.48)
+# The timezone of the school
+TIMEZONE = 'America/New_York'
+# The insurance minimums (the same policy as the sample datasets)
+MINIMUMS = [['CATEGORY', 'CONDITIONS', 'AREA', 'TIME', 'CEILING', 'VISIBILITY', 'WIND', 'CROSSWIND'],
+            ['Student', 'VMC', 'Pattern', 'Day', '2000', '5', '20', '8'],
+            ['Student', 'VMC', 'Practice Area', 'Day', '3000', '10', '20', '8'],
+            ['Student', 'VMC', 'Cross Country', 'Day', '3500', '10', '20', '8'],
+            ['Certified', 'VMC', 'Pattern', 'Day', '1500', '5', '20', '10'],
+            ['Certified', 'VMC', 'Practice Area', 'Day', '3000', '10', '20', '10'],
+            ['Certified', 'VMC', 'Cross Country', 'Day', '3000', '10', '20', '10'],
+            ['Certified', 'VMC', 'Local', 'Night', '3000', '10', '20', '10'],
+            ['Certified', 'VMC', 'Cross Country', 'Night', '5000', '10', '20', '10'],
+            ['50 Hours', 'VMC', 'Pattern', 'Day', '1500', '5', '25', '15'],
+            ['50 Hours', 'VMC', 'Practice Area', 'Day', '2000', '8', '25', '15'],
+            ['50 Hours', 'VMC', 'Cross Country', 'Day', '2500', '10', '25', '15'],
+            ['50 Hours', 'VMC', 'Local', 'Night', '3000', '10', '20', '10'],
+            ['50 Hours', 'VMC', 'Cross Country', 'Night', '5000', '10', '20', '10'],
+            ['Dual', 'VMC', 'Pattern', 'Day', '1500', '3', '30', '20'],
+            ['Dual', 'VMC', 'Practice Area', 'Day', '2000', '5', '30', '20'],
+            ['Dual', 'VMC', 'Cross Country', 'Day', '2000', '5', '30', '20'],
+            ['Dual', 'VMC', 'Local', 'Night', '3000', '10', '20', '10'],
+            ['Dual', 'VMC', 'Cross Country', 'Night', '5000', '10', '20', '10'],
+            ['Certified', 'IMC', 'Any', 'Day', '500', '1', '25', '15'],
+            ['Certified', 'IMC', 'Any', 'Night', '1000', '2', '25', '15'],
+            ['Dual', 'IMC', 'Any', 'Day', '500', '0.75', '30', '20'],
+            ['Dual', 'IMC', 'Any', 'Night', '1000', '2', '25', '15']]
+
+# THE FLEET
+# The plane types as (type, capability, advanced, multiengine, weight)
+PLANES = [('Cessna 152', 'VFR', 'No', 'No', 4), ('Piper Cherokee 161', 'VFR', 'No', 'No', 2),
+          ('Cessna 172', 'IFR', 'No', 'No', 4), ('Cessna 172S', 'IFR', 'No', 'No', 2),
+          ('Cessna 182', 'IFR', 'Yes', 'No', 1), ('Cessna 206', 'IFR', 'Yes', 'No', 1),
+          ('Cirrus SR22', 'IFR', 'Yes', 'No', 1), ('Piper Arrow 200', 'IFR', 'Yes', 'No', 1),
+          ('Piper Seneca 200T', 'IFR', 'Yes', 'Yes', 1)]
+# The repairs that are not inspections, as (description, days in the shop, chance per day)
+REPAIRS = [('minor repair', 2, 1/200), ('medium repair', 7, 1/1000), ('major repair', 30, 1/5000)]
+
+# THE LESSONS
+# The takeoff hours, with their weights
+HOURS = [(8, 3), (9, 10), (10, 3), (11, 9), (12, 5), (13, 8), (14, 7), (15, 7), (16, 3)]
+# The areas, with their weights
+AREAS = [('Pattern', 68), ('Practice Area', 27), ('Cross Country', 5)]
+# The chance that a student who has not soloed flies alone anyway
+NOVICE_SOLO = 0.01
+# The chance that a student alone without an instrument rating files IFR anyway
+UNRATED_IFR = 0.02
+
+# NAMES
+FIRST_NAMES = ('Ashley', 'Austin', 'Bruce', 'Doris', 'Howard', 'John', 'Katherine', 'Keith',
+               'Kelly', 'Pamela', 'Sean', 'Sharon', 'Tammy', 'Terry', 'Zachary', 'Alan')
+LAST_NAMES = ('Bailey', 'Bates', 'Cook', 'Fox', 'Graham', 'Jimenez', 'Jones', 'Kelley', 'Long',
+              'Marshall', 'Morgan', 'Ramos', 'Reed', 'Romero', 'Sullivan', 'Vasquez', 'Wilson')
+
+
+def weighted(rng, choices):
+    """
+    Returns a random item of choices, where the last element of each item is its weight.
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter choices: The items to choose from
+    Precondition: choices is a non-empty list of tuples ending in a number > 0
+    """
+    return rng.choices(choices, [choice[-1] for choice in choices])[0]
+
+
+def add_days(date, rng, low, high):
+    """
+    Returns the date a random number of days (in low..high) after date.
+
+    Parameter date: The start date
+    Precondition: date is a date object
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter low: The fewest days to add
+    Precondition: low is an int >= 0
+
+    Parameter high: The most days to add
+    Precondition: high is an int >= low
+    """
+    return date+datetime.timedelta(days=rng.randint(low, high))
+
+
+def make_students(rng, count, start, stop):
+    """
+    Returns the table of students (in the format of students.csv)
+
+    Students join from a year before start until stop, and progress through their
+    certifications at random speeds.  Many stop before earning them all, so every
+    certification has students on both sides of it.  Dates in the future are left out.
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter count: The number of students
+    Precondition: count is an int > 0
+
+    Parameter start: The first day of lessons
+    Precondition: start is a date object
+
+    Parameter stop: The last day of lessons
+    Precondition: stop is a date object after start
+    """
+    first = start-datetime.timedelta(days=365)
+    span = (stop-first).days
+    joined = sorted(first+datetime.timedelta(days=rng.randrange(span)) for pos in range(count))
+
+    table = [['ID', 'LAST NAME', 'FIRST NAME', 'JOINED', 'SOLO', 'LICENSE', '50 HOURS',
+              'INSTRUMENT', 'ADVANCED', 'MULTIENGINE']]
+    for pos in range(count):
+        dates = [joined[pos]]
+        solo = add_days(dates[0], rng, 30, 200)
+        dates.append(solo)
+        if rng.random() < 0.6:
+            dates.append(add_days(solo, rng, 60, 300))
+            if rng.random() < 0.6:
+                dates.append(add_days(dates[-1], rng, 60, 300))
+                for chance in (0.4, 0.3, 0.1):
+                    dates.append(add_days(dates[3], rng, 30, 400) if rng.random() < chance else None)
+        dates += [None]*(7-len(dates))
+        row = ['S%05d' % (pos+1), rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES)]
+        row += ['' if date is None or date > stop else date.isoformat() for date in dates]
+        table.append(row)
+    return table
+
+
+def make_instructors(rng, count):
+    """
+    Returns the table of instructors (in the format of instructors.csv)
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter count: The number of instructors
+    Precondition: count is an int > 0
+    """
+    table = [['ID', 'LAST', 'FIRST', 'CFI', 'CFII', 'MEI']]
+    for pos in range(count):
+        ratings = ['Yes', 'Yes' if rng.random() < 0.6 else 'No', 'Yes' if rng.random() < 0.4 else 'No']
+        table.append(['I%03d' % (pos+1), rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES)]+ratings)
+    return table
+
+
+def make_fleet(rng, count, start):
+    """
+    Returns the table of planes (in the format of fleet.csv)
+
+    Every plane had its last annual inspection in the year before start.
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter count: The number of planes
+    Precondition: count is an int > 0
+
+    Parameter start: The first day of lessons
+    Precondition: start is a date object
+    """
+    table = [['TAIL NO', 'TYPE', 'CAPABILITY', 'ADVANCED', 'MULTIENGINE', 'ANNUAL', 'HOURS']]
+    tails = set()
+    while len(tails) < count:
+        tails.add('%d%02d%s%s' % (rng.randint(1, 9), rng.randint(0, 99), chr(65+rng.randrange(26)),
+                                  chr(65+rng.randrange(26))))
+    tails = sorted(tails)
+    rng.shuffle(tails)
+    for tail in tails:
+        kind = weighted(rng, PLANES)
+        annual = start-datetime.timedelta(days=rng.randint(1, 365))
+        table.append([tail]+list(kind[:4])+[annual.isoformat(), str(rng.randint(0, 99))])
+    return table
+
+
+def make_repairs(rng, fleet, start, stop):
+    """
+    Returns the table of repairs (in the format of repairs.csv)
+
+    Each plane has a 100 hour inspection every few weeks, an annual inspection every year
+    (occasionally late), and random repairs.  The repairs are sorted by date in.
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter fleet: The planes
+    Precondition: fleet is a table returned by make_fleet
+
+    Parameter start: The first day of lessons
+    Precondition: start is a date object
+
+    Parameter stop: The last day of lessons
+    Precondition: stop is a date object after start
+    """
+    repairs = []
+    for plane in fleet[1:]:
+        annual = datetime.date.fromisoformat(plane[5])
+        inspection = add_days(start, rng, 0, 40)
+        day = start
+        while day <= stop:
+            if day >= annual.replace(year=annual.year+1)-datetime.timedelta(days=rng.randint(-3, 20)):
+                annual = day
+                repairs.append((day, add_days(day, rng, 1, 3), plane[0], 'annual inspection'))
+            elif day >= inspection:
+                inspection = add_days(day, rng, 20, 60)
+                repairs.append((day, add_days(day, rng, 1, 3), plane[0], '100 hour inspection'))
+            else:
+                for kind, days, chance in REPAIRS:
+                    if rng.random() < chance:
+                        repairs.append((day, add_days(day, rng, 1, days), plane[0], kind))
+                        break
+            day += datetime.timedelta(days=1)
+    repairs.sort()
+    table = [['TAIL NO', 'IN DATE', 'OUT DATE', 'DESCRIPTION']]
+    for timein, timeout, tail, kind in repairs:
+        table.append([tail, timein.isoformat(), timeout.isoformat(), kind])
+    return table
+
+
+def get_sun_times(date, zone, latitude, longitude):
+    """
+    Returns the pair (sunrise, sunset) of local times on date, as 'hh:mm' strings.
+
+    This uses the NOAA approximation of the solar position, which is accurate to a
+    minute or two (more than enough for a synthetic dataset).
+
+    Parameter date: The day
+    Precondition: date is a date object
+
+    Parameter zone: The local timezone
+    Precondition: zone is a pytz timezone object
+
+    Parameter latitude: The latitude in degrees
+    Precondition: latitude is a float in -60..60
+
+    Parameter longitude: The longitude in degrees (east is positive)
+    Precondition: longitude is a float in -180..180
+    """
+    angle = 2*math.pi/365*(date.timetuple().tm_yday-1)
+    eqtime = 229.18*(0.000075+0.001868*math.cos(angle)-0.032077*math.sin(angle)
+                     -0.014615*math.cos(2*angle)-0.040849*math.sin(2*angle))
+    decline = (0.006918-0.399912*math.cos(angle)+0.070257*math.sin(angle)-0.006758*math.cos(2*angle)
+               +0.000907*math.sin(2*angle)-0.002697*math.cos(3*angle)+0.00148*math.sin(3*angle))
+    lat = math.radians(latitude)
+    hour = math.degrees(math.acos(math.cos(math.radians(90.833))/(math.cos(lat)*math.cos(decline))
+                                  -math.tan(lat)*math.tan(decline)))
+    midnight = datetime.datetime(date.year, date.month, date.day, tzinfo=pytz.utc)
+    result = []
+    for minutes in (720-4*(longitude+hour)-eqtime, 720-4*(longitude-hour)-eqtime):
+        local = (midnight+datetime.timedelta(minutes=minutes)).astimezone(zone)
+        result.append(local.strftime('%H:%M'))
+    return tuple(result)
+
+
+def make_daycycle(years):
+    """
+    Returns the daycycle dictionary (in the format of daycycle.json) for the years.
+
+    Parameter years: The years to cover
+    Precondition: years is a list of ints
+    """
+    city, state, latitude, longitude = LOCATION
+    zone = pytz.timezone(TIMEZONE)
+    result = {'city': city, 'state': state, 'latitude': _degrees(latitude, 'NS'),
+              'longitude': _degrees(longitude, 'EW'), 'timezone': TIMEZONE}
+    for year in years:
+        days = {}
+        day = datetime.date(year, 1, 1)
+        while day.year == year:
+            sunrise, sunset = get_sun_times(day, zone, latitude, longitude)
+            days[day.strftime('%m-%d')] = {'sunrise': sunrise, 'sunset': sunset}
+            day += datetime.timedelta(days=1)
+        result[str(year)] = days
+    return result
+
+
+def _degrees(value, hemispheres):
+    """
+    Returns the angle value as a string like '42-26N'.
+
+    Parameter value: The angle in degrees
+    Precondition: value is a float
+
+    Parameter hemispheres: The suffixes for positive and negative angles
+    Precondition: hemispheres is a string of two characters
+    """
+    minutes = int(round(abs(value)*60))
+    return '%02d-%02d%s' % (minutes//60, minutes % 60, hemispheres[value < 0])
+
+
+def iter_lessons(rng, students, instructors, fleet, start, stop, per_day):
+    """
+    Returns an iterator over the lessons (in the format of lessons.csv), with the header.
+
+    Each day has about per_day lessons, sorted by takeoff.  A student only flies after
+    joining.  Students who have soloed fly solo about a third of the time, and the rest
+    only rarely (NOVICE_SOLO).  Only IFR planes are filed IFR, mostly with an instructor
+    or an instrument rating, and only rarely without (UNRATED_IFR).  There are no 
+    minimums for those rare lessons (a pilot who has not soloed, or a student pilot 
+    alone in instrument conditions), so the weather audit has to skip them, and the 
+    endorsement audit reports them instead.
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+
+    Parameter students: The students
+    Precondition: students is a table returned by make_students
+
+    Parameter instructors: The instructors
+    Precondition: instructors is a table returned by make_instructors
+
+    Parameter fleet: The planes
+    Precondition: fleet is a table returned by make_fleet
+
+    Parameter start: The first day of lessons
+    Precondition: start is a date object
+
+    Parameter stop: The last day of lessons
+    Precondition: stop is a date object after start
+
+    Parameter per_day: The average number of lessons each day
+    Precondition: per_day is an int > 0
+    """
+    yield ['STUDENT', 'AIRPLANE', 'INSTRUCTOR', 'TAKEOFF', 'LANDING', 'FILED', 'AREA']
+    zone = pytz.timezone(TIMEZONE)
+    joined = [row[3] for row in students[1:]]
+    solo = [row[4] for row in students[1:]]
+    rated = [row[7] for row in students[1:]]
+    hours = [hour for hour, weight in HOURS for copy in range(weight)]
+    areas = [area for area, weight in AREAS for copy in range(weight)]
+
+    day = start
+    active = 0
+    while day <= stop:
+        stamp = day.isoformat()
+        while active < len(joined) and joined[active] < stamp:
+            active += 1
+        offset = zone.utcoffset(datetime.datetime(day.year, day.month, day.day, 12))
+        offset = utils.str_to_time(stamp+'T12:00:00').replace(tzinfo=datetime.timezone(offset))
+        suffix = offset.isoformat()[19:]
+
+        lessons = []
+        for count in range(rng.randint(per_day*4//5, per_day*6//5) if active else 0):
+            student = rng.randrange(active)
+            plane = fleet[rng.randrange(1, len(fleet))]
+            soloed = solo[student] and solo[student] < stamp
+            if rng.random() < (0.35 if soloed else NOVICE_SOLO):
+                instructor = ''
+            else:
+                instructor = instructors[rng.randrange(1, len(instructors))][0]
+            takeoff = rng.choice(hours)
+            landing = takeoff+(2 if rng.random() < 0.8 else rng.choice((1, 3)))
+            # The minimums have no rows for a student pilot alone in instrument conditions
+            ifr = instructor != '' or (rated[student] and rated[student] < stamp)
+            chance = 0.12 if ifr else UNRATED_IFR
+            filed = 'IFR' if plane[2] == 'IFR' and rng.random() < chance else 'VFR'
+            lessons.append((takeoff, students[student+1][0], plane[0], instructor,
+                            '%sT%02d:00:00%s' % (stamp, takeoff, suffix),
+                            '%sT%02d:00:00%s' % (stamp, landing, suffix), filed, rng.choice(areas)))
+        lessons.sort(key=lambda lesson: lesson[0])
+        for lesson in lessons:
+            yield list(lesson[1:])
+        day += datetime.timedelta(days=1)
+
+
+def generate_dataset(folder, seed=0, years=(2017,), per_day=16, students=400, instructors=12,
+                     fleet=15, gaps=0.05, daycycle='json'):
+    """
+    Writes a synthetic dataset to folder, returning the number of lessons.
+
+    The defaults are about the size of one of the sample datasets.
+
+    Parameter folder: The directory to write (created if it does not exist)
+    Precondition: folder is a string that is a valid directory name
+
+    Parameter seed: The random seed
+    Precondition: seed is an int
+
+    Parameter years: The years of lessons
+    Precondition: years is a non-empty list of consecutive ints
+
+    Parameter per_day: The average number of lessons each day
+    Precondition: per_day is an int > 0
+
+    Parameter students: The number of students
+    Precondition: students is an int > 0
+
+    Parameter instructors: The number of instructors
+    Precondition: instructors is an int > 0
+
+    Parameter fleet: The number of planes
+    Precondition: fleet is an int > 0
+
+    Parameter gaps: The fraction of hours missing from the weather
+    Precondition: gaps is a float in [0,1)
+
+    Parameter daycycle: The format of the daycycle file
+    Precondition: daycycle is 'json' or 'csv'
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    start = datetime.date(min(years), 1, 1)
+    stop = datetime.date(max(years), 12, 31)
+
+    pupils = make_students(rng, students, start, stop)
+    teachers = make_instructors(rng, instructors)
+    planes = make_fleet(rng, fleet, start)
+    utils.write_csv(pupils, os.path.join(folder, violations.STUDENTS))
+    utils.write_csv(teachers, os.path.join(folder, endorsements.TEACHERS))
+    utils.write_csv(planes, os.path.join(folder, endorsements.PLANES))
+    utils.write_csv(make_repairs(rng, planes, start, stop), os.path.join(folder, inspections.REPAIRS))
+    utils.write_csv(MINIMUMS, os.path.join(folder, violations.MINIMUMS))
+
+    cycle = make_daycycle(list(years))
+    if daycycle == 'csv':
+        table = [['DATE', 'SUNRISE', 'SUNSET', 'TIMEZONE']]
+        for year in years:
+            for moday, times in cycle[str(year)].items():
+                table.append(['%d-%s' % (year, moday), times['sunrise'], times['sunset'], TIMEZONE])
+        utils.write_csv(table, os.path.join(folder, 'daycycle.csv'))
+    else:
+        with open(os.path.join(folder, violations.DAYCYCLE), 'w') as f:
+            json.dump(cycle, f, indent=4)
+
+    weather = support.synthetic_weather(list(years), TIMEZONE, gaps, rng.randrange(2**32))
+    with open(os.path.join(folder, violations.WEATHER), 'w') as f:
+        json.dump(weather, f, indent=1)
+    del weather
+
+    lessons = iter_lessons(rng, pupils, teachers, planes, start, stop, per_day)
+    with utils.CSVWriter(os.path.join(folder, violations.LESSONS)) as wrap:
+        wrap.writerows(lessons)
+        count = wrap.count-1
+    return count
+
+
+def main(args):
+    """
+    Generates the dataset described by args.
+
+    Parameter args: The command line arguments (minus the script name)
+    Precondition: args is a list of strings
+    """
+    options = {'--seed': ('seed', int), '--lessons-per-day': ('per_day', int),
+               '--students': ('students', int), '--instructors': ('instructors', int),
+               '--fleet': ('fleet', int), '--gaps': ('gaps', float), '--daycycle': ('daycycle', str)}
+    settings = {}
+    folder = None
+    pos = 0
+    while pos < len(args):
+        if args[pos] == '--years':
+            first, last = (args[pos+1].split('-')+[args[pos+1]])[:2]
+            settings['years'] = tuple(range(int(first), int(last)+1))
+            pos += 2
+        elif args[pos] in options and pos+1 < len(args):
+            name, kind = options[args[pos]]
+            settings[name] = kind(args[pos+1])
+            pos += 2
+        elif folder is None and not args[pos].startswith('--'):
+            folder = args[pos]
+            pos += 1
+        else:
+            folder = None
+            break
+    if folder is None or settings.get('daycycle', 'json') not in ('json', 'csv'):
+        print(__doc__.split('\n\n')[-2])
+        return
+
+    count, secs = support.timed(lambda: generate_dataset(folder, **settings))
+    print('Wrote %d lessons to %s in %.1f s' % (count, folder, secs))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,205 @@
+"""
+Helper functions for the auditor benchmarks.
+
+The benchmark scripts live outside of the application folder, so this module makes
+the auditor modules importable (the same way the unit tests do).  It also provides
+synthetic data for files that the sample datasets do not ship, such as the hourly
+weather.json observations.
+"""
+import os
+import os.path
+import sys
+import gc
+import json
+import time
+import random
+import shutil
+import datetime
+import tracemalloc
+
+# Make the application modules importable
+ROOT = os.path.split(os.path.split(os.path.abspath(__file__))[0])[0]
+AUDITOR = os.path.join(ROOT, 'auditor')
+if AUDITOR not in sys.path:
+    sys.path.insert(0, AUDITOR)
+
+import pytz
+import utils
+import violations
+
+
+def dataset_path(name):
+    """
+    Returns the path to the dataset name in the project folder.
+
+    If name is already a path to a directory, it is returned unchanged.
+
+    Parameter name: The dataset name (e.g. 'KITH-2017') or directory
+    Precondition: name is a string
+    """
+    if os.path.isdir(name):
+        return name
+    return os.path.join(ROOT, name)
+
+
+def timed(func, *args):
+    """
+    Returns the pair (result, seconds) for calling func on the given arguments.
+
+    Parameter func: The function to time
+    Precondition: func is callable with the arguments args
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return (result, time.perf_counter()-start)
+
+
+def measure(func, *args):
+    """
+    Returns the tuple (result, seconds, peak, retained) for calling func on args.
+
+    The values peak and retained are the bytes allocated at the peak of the call and
+    still allocated after it returns (the size of the result), according to tracemalloc.
+    Tracing slows the call down, so seconds is not comparable to the result of timed.
+
+    Parameter func: The function to measure
+    Precondition: func is callable with the arguments args
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result, secs = timed(func, *args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (result, secs, peak-base, current-base)
+
+
+def scale_dataset(directory, factor, folder):
+    """
+    Copies the dataset directory into folder, with every lesson repeated factor times.
+
+    The copies of the lessons are identical, so the dataset has the same mix of
+    violations, only more of them.  If the dataset has no weather.json (the samples do
+    not), a synthetic one is written for the years of the lessons.
+
+    Parameter directory: The dataset directory
+    Precondition: directory is a string naming a dataset directory
+
+    Parameter factor: The number of copies of each lesson
+    Precondition: factor is an int > 0
+
+    Parameter folder: The directory to copy into
+    Precondition: folder is a string naming an (empty) directory
+    """
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and not name.startswith('.'):
+            shutil.copy(path, os.path.join(folder, name))
+
+    lessons = utils.read_csv(os.path.join(directory, violations.LESSONS))
+    with utils.CSVWriter(os.path.join(folder, violations.LESSONS)) as wrap:
+        wrap.writerow(lessons[0])
+        for copy in range(factor):
+            wrap.writerows(lessons[1:])
+
+    weather = os.path.join(folder, violations.WEATHER)
+    if not os.path.isfile(weather):
+        years = sorted(set(int(lesson[3][:4]) for lesson in lessons[1:]))
+        with open(weather, 'w') as f:
+            json.dump(synthetic_weather(years, 'America/New_York'), f, indent=1)
+    return folder
+
+
+def synthetic_report(rng):
+    """
+    Returns a random weather report in the format of weather.json.
+
+    Roughly one report in fifty has an 'unavailable' measurement, and units are
+    mixed (FT/SM for visibility, KT/MPS for wind) as they are in real data.
+
+    Parameter rng: The random number generator
+    Precondition: rng is a random.Random object
+    """
+    report = {}
+    if rng.random() < 0.02:
+        report['visibility'] = 'unavailable'
+    elif rng.random() < 0.2:
+        prevailing = rng.choice([1400.0, 2640.0, 5280.0, 10560.0, 21120.0])
+        report['visibility'] = {'prevailing': prevailing, 'units': 'FT'}
+        if rng.random() < 0.5:
+            report['visibility']['minimum'] = prevailing/2
+            report['visibility']['maximum'] = prevailing
+    else:
+        report['visibility'] = {'prevailing': rng.choice([0.5, 1.0, 1.75, 3.0, 5.0, 10.0]),
+                                'units': 'SM'}
+
+    if rng.random() < 0.02:
+        report['wind'] = 'unavailable'
+    elif rng.random() < 0.1:
+        report['wind'] = 'calm'
+    else:
+        units = 'MPS' if rng.random() < 0.1 else 'KT'
+        scale = 1/1.94384 if units == 'MPS' else 1.0
+        speed = rng.randint(2, 25)
+        report['wind'] = {'speed': round(speed*scale, 1),
+                          'crosswind': round(rng.randint(0, speed)*scale, 1),
+                          'units': units}
+        if rng.random() < 0.2:
+            report['wind']['gusts'] = round((speed+rng.randint(3, 15))*scale, 1)
+
+    if rng.random() < 0.02:
+        report['sky'] = 'unavailable'
+    elif rng.random() < 0.3:
+        report['sky'] = 'clear'
+    else:
+        layers = []
+        height = 0.0
+        for kind in sorted(rng.sample(['a few', 'scattered', 'broken', 'overcast'], 2)):
+            height += rng.choice([300.0, 700.0, 1200.0, 2500.0, 4000.0])
+            layers.append({'type': kind, 'height': height, 'units': 'FT'})
+        report['sky'] = layers
+
+    report['temperature'] = {'value': round(rng.uniform(-20, 35), 1), 'units': 'C'}
+    return report
+
+
+def synthetic_weather(years, zone, gaps=0.05, seed=0):
+    """
+    Returns a synthetic hourly weather dictionary for the given years.
+
+    Keys are ISO timestamps in the local time of zone, newest first (matching the
+    order of real weather.json files).  A fraction gaps of the hours are left out so
+    that lookups must fall back to an earlier report.
+
+    Parameter years: The years to cover
+    Precondition: years is a list of ints
+
+    Parameter zone: The timezone name for the timestamps
+    Precondition: zone is a string naming a valid time zone
+
+    Parameter gaps: The fraction of missing hourly reports
+    Precondition: gaps is a float in [0,1)
+
+    Parameter seed: The random seed
+    Precondition: seed is an int
+    """
+    rng = random.Random(seed)
+    tz = pytz.timezone(zone)
+    start = datetime.datetime(min(years), 1, 1, tzinfo=pytz.utc)
+    stop = datetime.datetime(max(years)+1, 1, 2, tzinfo=pytz.utc)
+
+    keys = []
+    hour = start
+    while hour < stop:
+        if rng.random() >= gaps:
+            keys.append(hour.astimezone(tz).isoformat())
+        hour += datetime.timedelta(hours=1)
+
+    weather = {}
+    for key in reversed(keys):
+        report = synthetic_report(rng)
+        report['code'] = key[:13].replace('-', '').replace('T', '')+'56Z'
+        weather[key] = report
+    return weather